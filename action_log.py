@@ -0,0 +1,350 @@
+"""Compact binary log of everything that happens to a GameState, and a headless replayer.
+
+    log = ActionLog("logs/duel.ygolog")
+    log.attach(state)                  # before load_deck, so the decks are logged too
+    log.command("drawplay 2")          # console input is kept alongside the moves
+    ...
+    log.close()
+
+    python action_log.py logs/duel.ygolog --seek 500
+
+The log is a header followed by records, one per engine event (card
+created, moved, deck shuffled with its seed, life points changed, piles
+restored by undo/redo) or console command.  Replaying the events in order rebuilds the game exactly,
+without pygame.  Every SNAPSHOT_EVERY actions a snapshot of the whole
+state is written too (and at action 0 for a resumed game), so seeking to
+action n restores the nearest snapshot before it and replays only the rest.
+
+Records are packed on the caller's thread (a struct.pack per event) and
+written by a background thread, so the frame loop never waits on disk.
+"""
+import argparse
+import bisect
+import queue
+import struct
+import threading
+import time
+
+from engine import HIDDEN_LOCATIONS, LOCATIONS, OWNERS, GameState
+
+MAGIC = b"YGOLOG"
+VERSION = 1
+SNAPSHOT_EVERY = 256
+FLUSH_INTERVAL = 1.0  # seconds between flushes while actions keep coming
+
+OP_CREATE, OP_MOVE, OP_SHUFFLE, OP_LP, OP_COMMAND, OP_SNAPSHOT, OP_RESTORE = range(1, 8)
+TOP_FLAG = 0x80
+
+HEADER = struct.Struct("<6sB")
+CREATE = struct.Struct("<BIBBb")   # op, card id, owner, location, zone
+MOVE = struct.Struct("<BHBb")      # op, uid, location | TOP_FLAG, zone
+SHUFFLE = struct.Struct("<BBBQ")   # op, owner, location, seed
+LP = struct.Struct("<BBi")         # op, owner, change
+COMMAND = struct.Struct("<BH")     # op, byte length; utf-8 text follows
+SNAPSHOT = struct.Struct("<BII")   # op, actions before it, byte length; encode_state() follows
+RESTORE = struct.Struct("<BI")     # op, byte length; encode_state() after an undo/redo follows
+
+OWNER_CODES = {owner: i for i, owner in enumerate(OWNERS)}
+LOCATION_CODES = {location: i for i, location in enumerate(LOCATIONS)}
+
+STATE_HEAD = struct.Struct("<IIi")  # next uid, life points of each owner
+PILE_HEAD = struct.Struct("<H")     # cards in the pile
+PILE_CARD = struct.Struct("<HIb")   # uid, card id, zone
+
+
+# -----------------------------
+# Whole-state snapshots
+# -----------------------------
+def encode_state(state):
+    """Every pile in order, with each card's uid, id and zone, plus life points."""
+    parts = [STATE_HEAD.pack(state.next_uid, state.life_points[OWNERS[0]], state.life_points[OWNERS[1]])]
+    for owner in OWNERS:
+        for location in LOCATIONS:
+            pile = state.pile(owner, location)
+            parts.append(PILE_HEAD.pack(len(pile)))
+            for card in pile:
+                parts.append(PILE_CARD.pack(card.uid, card.card_id, -1 if card.zone is None else card.zone))
+    return b"".join(parts)
+
+
+def read_state(data, offset=0):
+    """Parse encode_state() bytes.
+
+    Returns (next uid, life points, {(owner, location): [(uid, card id, zone)]}, end offset).
+    """
+    next_uid, player_lp, opponent_lp = STATE_HEAD.unpack_from(data, offset)
+    offset += STATE_HEAD.size
+    piles = {}
+    for owner in OWNERS:
+        for location in LOCATIONS:
+            (count,) = PILE_HEAD.unpack_from(data, offset)
+            offset += PILE_HEAD.size
+            cards = []
+            for _ in range(count):
+                uid, card_id, zone = PILE_CARD.unpack_from(data, offset)
+                offset += PILE_CARD.size
+                cards.append((uid, card_id, None if zone < 0 else zone))
+            piles[(owner, location)] = cards
+    return next_uid, {OWNERS[0]: player_lp, OWNERS[1]: opponent_lp}, piles, offset
+
+
+def decode_state(data, offset=0, seed=None):
+    """Rebuild a GameState from encode_state() bytes; returns (state, offset after them)."""
+    state = GameState(seed)
+    next_uid, life_points, piles, offset = read_state(data, offset)
+    for (owner, location), cards in piles.items():
+        for uid, card_id, zone in cards:
+            state.restore_card(uid, card_id, owner, location, zone)
+    state.next_uid = next_uid
+    state.life_points.update(life_points)
+    return state, offset
+
+
+# -----------------------------
+# Single records
+# -----------------------------
+def encode_event(state, event, args):
+    """The record for one GameState event (see GameState), or None for events that aren't logged."""
+    if event == "move":
+        card = args[0]
+        flags = LOCATION_CODES[card.location]
+        # A card put on top of a deck (rather than the bottom) is the deck's top card now
+        if card.location in HIDDEN_LOCATIONS:
+            pile = state.pile(card.owner, card.location)
+            if len(pile) > 1 and pile.top() is card:
+                flags |= TOP_FLAG
+        return MOVE.pack(OP_MOVE, card.uid, flags, -1 if card.zone is None else card.zone)
+    if event == "shuffle":
+        owner, location, seed = args
+        return SHUFFLE.pack(OP_SHUFFLE, OWNER_CODES[owner], LOCATION_CODES[location], seed)
+    if event == "lp":
+        owner, old, new = args
+        return LP.pack(OP_LP, OWNER_CODES[owner], new - old)
+    if event == "restore":
+        # Undo/redo can change any number of piles at once, so the result is logged whole
+        data = encode_state(state)
+        return RESTORE.pack(OP_RESTORE, len(data)) + data
+    if event == "create":
+        card = args[0]
+        return CREATE.pack(OP_CREATE, card.card_id, OWNER_CODES[card.owner],
+                           LOCATION_CODES[card.location], -1 if card.zone is None else card.zone)
+    return None
+
+
+FIXED_SIZES = {OP_CREATE: CREATE.size, OP_MOVE: MOVE.size, OP_SHUFFLE: SHUFFLE.size, OP_LP: LP.size}
+
+
+def record_size(data, offset):
+    """Bytes taken by the record at offset (ValueError for an unknown op)."""
+    op = data[offset]
+    if op in FIXED_SIZES:
+        return FIXED_SIZES[op]
+    if op == OP_COMMAND:
+        return COMMAND.size + COMMAND.unpack_from(data, offset)[1]
+    if op == OP_SNAPSHOT:
+        return SNAPSHOT.size + SNAPSHOT.unpack_from(data, offset)[2]
+    if op == OP_RESTORE:
+        return RESTORE.size + RESTORE.unpack_from(data, offset)[1]
+    raise ValueError(f"unknown record {op} at byte {offset}")
+
+
+def apply_record(state, data, offset):
+    """Apply the record at offset to state (commands and snapshots change nothing)."""
+    op = data[offset]
+    if op == OP_MOVE:
+        _, uid, flags, zone = MOVE.unpack_from(data, offset)
+        state.move(uid, LOCATIONS[flags & ~TOP_FLAG], None if zone < 0 else zone, top=bool(flags & TOP_FLAG))
+    elif op == OP_SHUFFLE:
+        _, owner, location, seed = SHUFFLE.unpack_from(data, offset)
+        state.shuffle(OWNERS[owner], LOCATIONS[location], seed)
+    elif op == OP_LP:
+        _, owner, change = LP.unpack_from(data, offset)
+        state.adjust_life_points(OWNERS[owner], change)
+    elif op == OP_CREATE:
+        _, card_id, owner, location, zone = CREATE.unpack_from(data, offset)
+        state.new_card(card_id, OWNERS[owner], LOCATIONS[location], None if zone < 0 else zone)
+    elif op == OP_RESTORE:
+        _, life_points, piles, _ = read_state(data, offset + RESTORE.size)
+        state.restore({key: [(uid, zone) for uid, _, zone in cards] for key, cards in piles.items()},
+                      life_points)
+
+
+# -----------------------------
+# Writing
+# -----------------------------
+class ActionLog:
+    """Appends a GameState's events to a file from a background writer thread."""
+
+    def __init__(self, path, snapshot_every=SNAPSHOT_EVERY):
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.actions = 0
+        self.state = None
+        self._queue = queue.SimpleQueue()
+        self._file = open(path, "wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION))
+        self._writer = threading.Thread(target=self._write_loop, name="action-log", daemon=True)
+        self._writer.start()
+
+    def attach(self, state):
+        """Log state's events from now on (attach before loading decks to capture them).
+
+        A state that already has cards (a resumed game) is written as a
+        snapshot at action 0, which every replay then starts from.
+        """
+        self.state = state
+        if state.cards:
+            self._snapshot()
+        state.add_observer(self._on_game_event)
+
+    def _on_game_event(self, event, *args):
+        record = encode_event(self.state, event, args)
+        if record is not None:
+            self._append(record)
+
+    def command(self, text):
+        """Record a console command as typed (its effects are logged as they happen)."""
+        data = text.encode("utf-8")[:0xFFFF]
+        self._append(COMMAND.pack(OP_COMMAND, len(data)) + data)
+
+    def _append(self, record):
+        self._queue.put(record)
+        self.actions += 1
+        if self.state is not None and self.actions % self.snapshot_every == 0:
+            self._snapshot()
+
+    def _snapshot(self):
+        data = encode_state(self.state)
+        self._queue.put(SNAPSHOT.pack(OP_SNAPSHOT, self.actions, len(data)) + data)
+
+    def _write_loop(self):
+        last_flush = time.monotonic()
+        while True:
+            records = [self._queue.get()]
+            # Take everything that is already waiting and write it in one go
+            try:
+                while True:
+                    records.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            done = records[-1] is None
+            if done:
+                records.pop()
+            self._file.write(b"".join(records))
+            if done:
+                break
+            if time.monotonic() - last_flush >= FLUSH_INTERVAL:
+                self._file.flush()
+                last_flush = time.monotonic()
+        self._file.close()
+
+    def close(self):
+        """Write everything still queued and close the file."""
+        if self.state is not None:
+            self.state.remove_observer(self._on_game_event)
+            self.state = None
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+
+
+# -----------------------------
+# Reading and replaying
+# -----------------------------
+class Replayer:
+    """Rebuilds the game recorded in a log at any action number."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            raise ValueError(f"{path} is not an action log")
+        magic, version = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an action log")
+        if version != VERSION:
+            raise ValueError(f"{path} is action log version {version}, expected {VERSION}")
+        self.data = data
+        self.records = []        # (op, offset) of every action
+        self.snapshots = []      # (actions before it, offset of its state)
+        self._index(HEADER.size)
+
+    def _index(self, offset):
+        data, end = self.data, len(self.data)
+        while offset < end:
+            try:
+                size = record_size(data, offset)
+            except struct.error:
+                break
+            if offset + size > end:
+                break  # the game was still running (or crashed) mid-record
+            op = data[offset]
+            if op == OP_SNAPSHOT:
+                self.snapshots.append((SNAPSHOT.unpack_from(data, offset)[1], offset + SNAPSHOT.size))
+            else:
+                self.records.append((op, offset))
+            offset += size
+
+    def __len__(self):
+        return len(self.records)
+
+    def commands(self):
+        """[(action number, text)] for every logged console command."""
+        data = self.data
+        return [(i, data[offset + COMMAND.size:offset + COMMAND.size + COMMAND.unpack_from(data, offset)[1]].decode("utf-8"))
+                for i, (op, offset) in enumerate(self.records) if op == OP_COMMAND]
+
+    def state_at(self, actions=None, use_snapshots=True):
+        """GameState after the first `actions` actions (all of them by default)."""
+        actions = len(self.records) if actions is None else max(0, min(actions, len(self.records)))
+        state, start = GameState(), 0
+        if use_snapshots:
+            i = bisect.bisect_right(self.snapshots, (actions, float("inf"))) - 1
+        else:
+            i = 0 if self.snapshots and self.snapshots[0][0] == 0 else -1  # a resumed game's start
+        if i >= 0:
+            start, offset = self.snapshots[i]
+            state, _ = decode_state(self.data, offset)
+        self.apply(state, start, actions)
+        return state
+
+    def apply(self, state, start, stop):
+        """Apply actions [start, stop) to state."""
+        data = self.data
+        for _, offset in self.records[start:stop]:
+            apply_record(state, data, offset)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a simulator action log headlessly.")
+    parser.add_argument("log", help="a .ygolog file from logs/")
+    parser.add_argument("--seek", type=int, help="stop after this many actions")
+    parser.add_argument("--commands", action="store_true", help="list the console commands")
+    args = parser.parse_args()
+
+    try:
+        replayer = Replayer(args.log)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"[!] {e}")
+    print(f"[*] {args.log}: {len(replayer):,} actions, {len(replayer.snapshots)} snapshots, "
+          f"{len(replayer.data):,} bytes")
+    if args.commands:
+        for i, text in replayer.commands():
+            print(f"  {i:6d}  {text}")
+
+    target = len(replayer) if args.seek is None else args.seek
+    start = time.perf_counter()
+    state = replayer.state_at(target)
+    seek_time = time.perf_counter() - start
+    start = time.perf_counter()
+    replayer.state_at(target, use_snapshots=False)
+    full_time = time.perf_counter() - start
+    print(f"[*] Action {min(target, len(replayer)):,}: {seek_time * 1000:.2f} ms from the nearest snapshot, "
+          f"{full_time * 1000:.2f} ms from the start ({min(target, len(replayer)) / max(full_time, 1e-9):,.0f} actions/s)")
+    for owner in OWNERS:
+        piles = ", ".join(f"{location} {state.count(owner, location)}" for location in LOCATIONS if state.count(owner, location))
+        print(f"  {owner}: {state.life_points[owner]} LP, {piles}")
+
+
+if __name__ == "__main__":
+    main()
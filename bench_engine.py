@@ -0,0 +1,63 @@
+"""Micro-benchmark: headless GameState actions per second.
+
+Usage: python bench_engine.py [--actions N] [--seed N]
+
+Plays random draws, moves and life point changes against a fresh 40-card
+game for each pair of decks; no window, no images, no network.
+"""
+import argparse
+import random
+import time
+
+from engine import GameState
+
+DECK_SIZE = 40
+TABLE_LOCATIONS = ("hand", "field", "graveyard", "banished")
+
+
+def new_game(seed):
+    state = GameState(seed=seed)
+    for owner in ("player", "opponent"):
+        state.load_deck(owner, main=[1000 + i % 14 for i in range(DECK_SIZE)])
+        state.shuffle(owner)
+        state.draw(owner, 5)
+    return state
+
+
+def run(actions, seed):
+    rng = random.Random(seed)
+    state = new_game(seed)
+    games = 1
+    start = time.perf_counter()
+    for _ in range(actions):
+        owner = "player" if rng.random() < 0.5 else "opponent"
+        roll = rng.random()
+        if roll < 0.3:
+            if not state.draw(owner):
+                state = new_game(seed + games)
+                games += 1
+        elif roll < 0.9:
+            card = state.card(rng.randrange(len(state.cards)))
+            if card.location in TABLE_LOCATIONS:
+                try:
+                    state.move(card.uid, TABLE_LOCATIONS[rng.randrange(4)])
+                except ValueError:
+                    pass  # field full
+        else:
+            state.adjust_life_points(owner, rng.choice((-1000, -500, 500)))
+    elapsed = time.perf_counter() - start
+    return elapsed, games
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--actions", type=int, default=500_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    elapsed, games = run(args.actions, args.seed)
+    print(f"{args.actions} actions over {games} games in {elapsed:.2f}s: {args.actions / elapsed:,.0f} actions/s")
+
+
+if __name__ == "__main__":
+    main()
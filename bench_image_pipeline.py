@@ -0,0 +1,91 @@
+"""Micro-benchmark: per-card decode time of the old two-pass loader vs image_pipeline.
+
+Usage: python bench_image_pipeline.py [--cards N] [--repeat N]
+
+Uses JPEGs already in the image cache when there are any, otherwise a
+synthetic 421x614 card-sized JPEG, so it never touches the network.
+"""
+import argparse
+import os
+import time
+from io import BytesIO
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+from PIL import Image
+
+from image_cache import image_cache
+from image_pipeline import decode_card_surfaces, to_display_format
+
+CARD_SIZE = (68, 98)
+PREVIEW_SIZE = (375, 546)
+
+
+def legacy_fetch_surface(data, size):
+    # What sim.py did before: full decode + RGBA + LANCZOS + two pixel copies, once per size
+    img = Image.open(BytesIO(data)).convert("RGBA")
+    img = img.resize(size, Image.LANCZOS)
+    return pygame.image.fromstring(img.tobytes(), img.size, img.mode)
+
+
+def legacy_decode(data):
+    return legacy_fetch_surface(data, CARD_SIZE), legacy_fetch_surface(data, PREVIEW_SIZE)
+
+
+def pipeline_decode(data):
+    thumb, preview = decode_card_surfaces(data, [CARD_SIZE, PREVIEW_SIZE])
+    return to_display_format(thumb), to_display_format(preview)
+
+
+def pipeline_thumbnail_only(data):
+    thumb, = decode_card_surfaces(data, [CARD_SIZE])
+    return to_display_format(thumb)
+
+
+def sample_images(count):
+    images = []
+    stats = image_cache.stats()
+    if stats["entries"]:
+        for card_id in list(image_cache._index)[:count]:
+            data = image_cache.get_cached(card_id)
+            if data is not None:
+                images.append(data)
+    if not images:
+        buf = BytesIO()
+        Image.effect_noise((421, 614), 64).convert("RGB").save(buf, "JPEG", quality=90)
+        images.append(buf.getvalue())
+    return images
+
+
+def bench(label, fn, images, repeat):
+    fn(images[0])  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for data in images:
+            fn(data)
+    per_card = (time.perf_counter() - start) / (repeat * len(images))
+    print(f"{label:<28} {per_card * 1000:8.3f} ms/card")
+    return per_card
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=20, help="cached images to sample")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    images = sample_images(args.cards)
+    print(f"{len(images)} image(s) x {args.repeat} repeats")
+
+    before = bench("before (2 decodes, RGBA)", legacy_decode, images, args.repeat)
+    after = bench("after (1 decode, draft)", pipeline_decode, images, args.repeat)
+    bench("after, thumbnail only", pipeline_thumbnail_only, images, args.repeat)
+    print(f"speedup: {before / after:.2f}x")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
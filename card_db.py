@@ -0,0 +1,65 @@
+"""Card data from YGOProDeck_Card_Info.json, parsed once per process and shared.
+
+    from card_db import card_db
+    card_db.by_name["Sangan"]["type"]
+    card_db.names_by_id[26202165]
+    card_db.deck_ids({"Sangan": 3, "Witch of the Black Forest": 1})
+
+The card info file is large and every card dict in it is kept, so the
+simulator, the deck builder, netplay and every table a TableManager hosts
+read the same dicts instead of parsing and holding a copy each.  Nothing
+is loaded until the first lookup.
+"""
+import json
+import threading
+
+from engine import expand_deck
+
+CARD_INFO_PATH = "YGOProDeck_Card_Info.json"
+
+
+class CardDatabase:
+    """Lazily loaded card dicts by name, and names by card id."""
+
+    def __init__(self, path=CARD_INFO_PATH):
+        self.path = path
+        self._by_name = None
+        self._names_by_id = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._by_name is None:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    cards = json.load(f)["data"]
+                self._names_by_id = {c["id"]: c["name"] for c in cards}
+                self._by_name = {c["name"]: c for c in cards}
+
+    @property
+    def by_name(self):
+        if self._by_name is None:
+            self._load()
+        return self._by_name
+
+    @property
+    def names_by_id(self):
+        if self._names_by_id is None:
+            self._load()
+        return self._names_by_id
+
+    def __contains__(self, name):
+        return name in self.by_name
+
+    def card_id(self, name):
+        return self.by_name[name]["id"]
+
+    def name(self, card_id):
+        return self.names_by_id[card_id]
+
+    def deck_ids(self, deck_dict):
+        """Card ids for a {name: count} deck part, one per copy (KeyError for unknown names)."""
+        by_name = self.by_name
+        return [by_name[name]["id"] for name in expand_deck(deck_dict)]
+
+
+card_db = CardDatabase()
@@ -0,0 +1,337 @@
+"""Tune a deck's card counts for opening consistency with simulated annealing.
+
+    python deck_optimizer.py decks/goat.json --format Goat \\
+        --combo "Sangan | Witch of the Black Forest" --combo "Pot of Greed & Graceful Charity"
+
+Candidates are main decks reachable from the current one by swapping one
+copy for another card from the format's pool, adding a card or cutting
+one, always within 40-60 cards, the format's banlist and 3 copies a card.
+Each candidate is scored as the mean hit rate of the combos (same syntax
+as opening_hand_analyzer.py) over one fixed set of sampled hands per deck
+size, so candidates are compared on identical shuffles:
+
+  * a deck is a list of slots and every sampled hand is a set of slot
+    positions, so swapping one copy only updates the hands that contain
+    that slot (two columns of the count matrix);
+  * cards no combo mentions share one "other" column, and scores are
+    memoized by (deck size, counts of combo cards), so neighbours that
+    only trade filler for filler are free.
+
+The best deck is re-checked on fresh hands at the end, since a fixed
+sample slightly flatters whatever was tuned against it.
+"""
+import argparse
+import json
+import math
+import random
+import time
+
+import numpy as np
+
+from engine import expand_deck
+from opening_hand_analyzer import STARTING_HAND_SIZE, HandSampler, analyze, parse_combo, wilson_interval
+
+MIN_MAIN = 40
+MAX_MAIN = 60
+MAX_COPIES = 3
+DEFAULT_HANDS = 4096
+DEFAULT_ITERATIONS = 20000
+
+
+# -----------------------------
+# Format rules
+# -----------------------------
+def load_format(fmt, cards_path="cards_by_format_updated.json", banlists_path="banlists_by_format.json"):
+    """Return (main-deck card pool, {name: copies allowed}) for a format."""
+    with open(cards_path, "r", encoding="utf-8") as f:
+        formats = json.load(f)
+    if fmt not in formats:
+        raise SystemExit(f"Unknown format {fmt!r}")
+    pool = sorted(name for name, info in formats[fmt].items() if info.get("location", "main") == "main")
+    with open(banlists_path, "r", encoding="utf-8") as f:
+        banlist = json.load(f).get(fmt, {})
+    limits = {name: min(MAX_COPIES, banlist.get(name, MAX_COPIES)) for name in pool}
+    return pool, limits
+
+
+def deck_violations(counts, limits):
+    size = sum(counts.values())
+    problems = []
+    if not MIN_MAIN <= size <= MAX_MAIN:
+        problems.append(f"main deck has {size} cards (must be {MIN_MAIN}-{MAX_MAIN})")
+    for name, count in sorted(counts.items()):
+        limit = limits.get(name, MAX_COPIES)
+        if count > limit:
+            problems.append(f"{count} copies of {name} (limit {limit})")
+    return problems
+
+
+# -----------------------------
+# Batched evaluator with common random numbers
+# -----------------------------
+class ConsistencyEvaluator:
+    """Scores main decks on one fixed set of hands per deck size."""
+
+    def __init__(self, combos, pool, hands=DEFAULT_HANDS, hand_size=STARTING_HAND_SIZE, draws=0, seed=0):
+        self.combos = combos
+        self.hands = hands
+        self.cards_seen = hand_size + draws
+        self.seed = seed
+        mentioned = frozenset().union(*(combo.names for combo in combos))
+        if any(not combo.names for combo in combos):
+            mentioned = mentioned | frozenset(pool)  # a bare "pair" looks at every card
+        self.relevant = sorted(mentioned)
+        self.columns = {name: i for i, name in enumerate(self.relevant)}
+        self.other = len(self.relevant)  # shared column for everything else
+        self.memo = {}
+        self.evaluations = 0
+        self.memo_hits = 0
+        self._layouts = {}  # deck size -> (positions, rows containing each slot)
+
+    def column(self, name):
+        return self.columns.get(name, self.other)
+
+    def layout(self, size):
+        layout = self._layouts.get(size)
+        if layout is None:
+            sampler = HandSampler(["x"] * size, self.cards_seen, 0, seed=(self.seed, size))
+            positions = np.ascontiguousarray(sampler.positions(self.hands))
+            rows = [[] for _ in range(size)]
+            for row, slots in enumerate(positions.tolist()):
+                for slot in slots:
+                    rows[slot].append(row)
+            layout = (positions, [np.array(r, dtype=np.intp) for r in rows])
+            self._layouts[size] = layout
+        return layout
+
+    def count_matrix(self, codes):
+        positions, _ = self.layout(len(codes))
+        counts = np.zeros((self.hands, self.other + 1), dtype=np.uint8)
+        rows = np.arange(self.hands)
+        hand_codes = codes[positions]
+        for j in range(hand_codes.shape[1]):
+            counts[rows, hand_codes[:, j]] += 1
+        return counts
+
+    def score(self, key, counts):
+        """Mean combo hit rate of a hand count matrix, memoized by key.
+
+        The first matrix scored for a (size, combo card counts) key stands
+        for every deck with that key; other matrices for it only differ in
+        which slots the same cards landed in, i.e. an equally fair sample.
+        """
+        cached = self.memo.get(key)
+        if cached is not None:
+            self.memo_hits += 1
+            return cached
+        self.evaluations += 1
+        total = 0
+        for combo in self.combos:
+            total += np.count_nonzero(combo(counts, self.columns))
+        result = total / (self.hands * len(self.combos))
+        self.memo[key] = result
+        return result
+
+
+class Candidate:
+    """A main deck as slots, plus the hand count matrix for the evaluator's hands."""
+
+    def __init__(self, evaluator, counts):
+        self.evaluator = evaluator
+        self.counts = dict(counts)
+        names = expand_deck(self.counts)
+        self.slot_names = names
+        self.codes = np.array([evaluator.column(name) for name in names], dtype=np.intp)
+        self.slots_by_name = {}
+        for slot, name in enumerate(names):
+            self.slots_by_name.setdefault(name, []).append(slot)
+        self.matrix = evaluator.count_matrix(self.codes)
+        self.relevant = [0] * len(evaluator.relevant)
+        for name, count in self.counts.items():
+            if name in evaluator.columns:
+                self.relevant[evaluator.columns[name]] = count
+
+    @property
+    def size(self):
+        return len(self.slot_names)
+
+    def key(self):
+        return (self.size, tuple(self.relevant))
+
+    def score(self):
+        return self.evaluator.score(self.key(), self.matrix)
+
+    def _bump(self, name, delta):
+        count = self.counts.get(name, 0) + delta
+        if count:
+            self.counts[name] = count
+        else:
+            self.counts.pop(name, None)
+        col = self.evaluator.columns.get(name)
+        if col is not None:
+            self.relevant[col] += delta
+
+    def swap(self, out_name, in_name):
+        """Replace one copy of out_name with in_name, updating only the hands holding that slot."""
+        slot = self.slots_by_name[out_name].pop()
+        if not self.slots_by_name[out_name]:
+            del self.slots_by_name[out_name]
+        self.slots_by_name.setdefault(in_name, []).append(slot)
+        self.slot_names[slot] = in_name
+        old_col, new_col = self.codes[slot], self.evaluator.column(in_name)
+        if old_col != new_col:
+            self.codes[slot] = new_col
+            _, slot_rows = self.evaluator.layout(self.size)
+            rows = slot_rows[slot]
+            self.matrix[rows, old_col] -= 1
+            self.matrix[rows, new_col] += 1
+        self._bump(out_name, -1)
+        self._bump(in_name, 1)
+
+    def add(self, name):
+        self.slots_by_name.setdefault(name, []).append(self.size)
+        self.slot_names.append(name)
+        self.codes = np.append(self.codes, self.evaluator.column(name))
+        self._bump(name, 1)
+        self.matrix = self.evaluator.count_matrix(self.codes)
+
+    def remove(self, name):
+        # Move the last slot into the removed card's slot so slots stay contiguous
+        slot = self.slots_by_name[name].pop()
+        if not self.slots_by_name[name]:
+            del self.slots_by_name[name]
+        last = self.size - 1
+        if slot != last:
+            last_name = self.slot_names[last]
+            slots = self.slots_by_name[last_name]
+            slots[slots.index(last)] = slot
+            self.slot_names[slot] = last_name
+            self.codes[slot] = self.codes[last]
+        self.slot_names.pop()
+        self.codes = self.codes[:-1].copy()
+        self._bump(name, -1)
+        self.matrix = self.evaluator.count_matrix(self.codes)
+
+
+# -----------------------------
+# Simulated annealing
+# -----------------------------
+def optimize(deck_counts, pool, limits, evaluator, iterations=DEFAULT_ITERATIONS,
+             start_temp=0.02, end_temp=0.0005, seed=0, locked=()):
+    """Anneal from deck_counts; returns (best counts, best score, stats dict)."""
+    rng = random.Random(seed)
+    current = Candidate(evaluator, deck_counts)
+    current_score = current.score()
+    best_counts, best_score = dict(current.counts), current_score
+    combo_cards = [name for name in evaluator.relevant if name in limits]
+    locked = set(locked)
+    accepted = 0
+    start = time.perf_counter()
+
+    def addable(name):
+        return current.counts.get(name, 0) < limits.get(name, 0)
+
+    for step in range(iterations):
+        temp = start_temp * (end_temp / start_temp) ** (step / max(1, iterations - 1))
+        roll = rng.random()
+        # Propose: half the time bring in a combo card, otherwise more of the deck's own
+        # filler (or, rarely, anything from the pool) so the non-combo part doesn't churn
+        out_name = current.slot_names[rng.randrange(current.size)]
+        if combo_cards and rng.random() < 0.5:
+            in_name = rng.choice(combo_cards)
+        elif rng.random() < 0.9:
+            in_name = current.slot_names[rng.randrange(current.size)]
+        else:
+            in_name = rng.choice(pool)
+        if roll < 0.8:
+            if in_name == out_name or out_name in locked or not addable(in_name):
+                continue
+            if in_name not in evaluator.columns and out_name not in evaluator.columns:
+                continue  # filler for filler never changes the score
+            move, undo = (lambda: current.swap(out_name, in_name)), (lambda: current.swap(in_name, out_name))
+        elif roll < 0.9:
+            if current.size >= MAX_MAIN or not addable(in_name):
+                continue
+            move, undo = (lambda: current.add(in_name)), (lambda: current.remove(in_name))
+        else:
+            if current.size <= MIN_MAIN or out_name in locked:
+                continue
+            move, undo = (lambda: current.remove(out_name)), (lambda: current.add(out_name))
+
+        move()
+        score = current.score()
+        if score >= current_score or rng.random() < math.exp((score - current_score) / temp):
+            current_score = score
+            accepted += 1
+            if score > best_score:
+                best_counts, best_score = dict(current.counts), score
+        else:
+            undo()
+
+    elapsed = time.perf_counter() - start
+    candidates = evaluator.evaluations + evaluator.memo_hits
+    return best_counts, best_score, {
+        "iterations": iterations,
+        "accepted": accepted,
+        "candidates": candidates,
+        "evaluations": evaluator.evaluations,
+        "memo_hits": evaluator.memo_hits,
+        "seconds": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune main deck card counts for opening consistency.")
+    parser.add_argument("deck", help="deck JSON from decks/")
+    parser.add_argument("--format", required=True, help="format name in cards_by_format_updated.json")
+    parser.add_argument("--combo", action="append", required=True, help="combo spec (repeatable)")
+    parser.add_argument("--draws", type=int, default=0)
+    parser.add_argument("--hands", type=int, default=DEFAULT_HANDS, help="fixed hands per deck size")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--lock", action="append", default=[], help="card whose count must not drop")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the best deck here (extra and side decks are kept)")
+    args = parser.parse_args()
+
+    with open(args.deck, "r", encoding="utf-8") as f:
+        deck = json.load(f)
+    pool, limits = load_format(args.format)
+    main_counts = {name: count for name, count in deck.get("main", {}).items() if count}
+    problems = deck_violations(main_counts, limits)
+    if problems:
+        raise SystemExit("[!] " + "\n[!] ".join(problems))
+    for name in main_counts:
+        limits.setdefault(name, 0)  # off-format cards may stay or go, but never come back
+
+    combos = [parse_combo(spec) for spec in args.combo]
+    evaluator = ConsistencyEvaluator(combos, pool, args.hands, STARTING_HAND_SIZE, args.draws, args.seed)
+    start_score = Candidate(evaluator, main_counts).score()
+    best, best_score, stats = optimize(main_counts, pool, limits, evaluator, args.iterations,
+                                       seed=args.seed, locked=args.lock)
+
+    print(f"[*] {stats['candidates']:,} candidates in {stats['seconds']:.2f}s "
+          f"({stats['candidates'] / stats['seconds']:,.0f}/s, {stats['evaluations']:,} evaluated, "
+          f"{stats['memo_hits']:,} memoized), {stats['accepted']:,} accepted")
+    print(f"[*] Score on the fixed hands: {start_score:.4f} -> {best_score:.4f}")
+    for name in sorted(set(main_counts) | set(best)):
+        before, after = main_counts.get(name, 0), best.get(name, 0)
+        if before != after:
+            print(f"  {after - before:+d} {name} ({before} -> {after})")
+    print(f"[*] Main deck: {sum(main_counts.values())} -> {sum(best.values())} cards")
+
+    # Fresh hands, so the report isn't biased towards the sample that was tuned on
+    for label, counts in (("before", main_counts), ("after", best)):
+        hits, hands, _ = analyze(expand_deck(counts), combos, hands=200_000, draws=args.draws, seed=args.seed + 1)
+        rates = ", ".join(f"{h / hands:.4f}" for h in hits)
+        low, high = wilson_interval(sum(hits), hands * len(combos))
+        print(f"  {label}: {sum(hits) / (hands * len(combos)):.4f} [{low:.4f}, {high:.4f}]  ({rates})")
+
+    if args.out:
+        deck["main"] = dict(sorted(best.items()))
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(deck, f, ensure_ascii=False, indent=2)
+        print(f"[+] Saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
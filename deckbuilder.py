@@ -2,10 +2,11 @@ import tkinter as tk
 from tkinter import simpledialog, messagebox, filedialog
 import json
 import os
-import requests
 from io import BytesIO
 from PIL import Image, ImageTk
 from collections import Counter
+from card_db import card_db
+from image_cache import get_card_image_bytes
 
 DECKS_DIR = "decks"
 os.makedirs(DECKS_DIR, exist_ok=True)
@@ -16,10 +17,8 @@ EXTRA_DECK_TYPES = [
     "Synchro Pendulum Effect Monster"
 ]
 
-# Load card info and format library
-with open("YGOProDeck_Card_Info.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
-YGOProDeck_Card_Info = {c["name"]: c for c in data["data"]}
+# Load card info (the process-wide copy) and format library
+YGOProDeck_Card_Info = card_db.by_name
 
 with open("cards_by_format_updated.json", "r", encoding="utf-8") as f:
     format_data = json.load(f)
@@ -29,10 +28,7 @@ def show_card_preview(card_name):
     """Show a popup with a card image from ygoprodeck."""
     try:
         card_id = YGOProDeck_Card_Info[card_name]["id"]
-        url = f"https://images.ygoprodeck.com/images/cards/{card_id}.jpg"
-        resp = requests.get(url)
-        resp.raise_for_status()
-        pil_img = Image.open(BytesIO(resp.content))
+        pil_img = Image.open(BytesIO(get_card_image_bytes(card_id)))
         pil_img.thumbnail((400, 600))
         preview_win = tk.Toplevel()
         preview_win.title(card_name)
@@ -0,0 +1,440 @@
+"""Headless game state: decks, hands, field, graveyard, banish zone and life points.
+
+Nothing here imports pygame, Tk or requests.  The simulator (or a batch job)
+drives a GameState through its methods and renders by observing the events
+it emits:
+
+    state = GameState(seed=1)
+    state.add_observer(lambda event, *args: print(event, args))
+    state.load_deck("player", main=[89631139] * 3)
+    state.shuffle("player")
+    state.draw("player", 5)
+"""
+import heapq
+import random
+from collections import deque
+
+OWNERS = ("player", "opponent")
+LOCATIONS = ("deck", "extra", "side", "hand", "field", "graveyard", "banished")
+HIDDEN_LOCATIONS = ("deck", "extra", "side")
+STARTING_LP = 8000
+DECK_POSITIONS = ("top", "bottom", "shuffle")
+FIELD_ZONES = 10  # two rows of five per player
+HAND_SLOTS = 17
+FULL_FIELD = (1 << FIELD_ZONES) - 1
+
+
+def expand_deck(deck_dict):
+    """{"Dark Magician": 3, "Blue-Eyes": 2} -> ["Dark Magician"] * 3 + ["Blue-Eyes"] * 2"""
+    deck_list = []
+    for name, count in deck_dict.items():
+        deck_list.extend([name] * count)
+    return deck_list
+
+
+class Card:
+    """One physical card: its database id and where it currently is."""
+    __slots__ = ("uid", "card_id", "owner", "location", "zone")
+
+    def __init__(self, uid, card_id, owner, location, zone=None):
+        self.uid = uid
+        self.card_id = card_id
+        self.owner = owner
+        self.location = location
+        self.zone = zone
+
+    def __repr__(self):
+        return f"Card(uid={self.uid}, card_id={self.card_id}, owner={self.owner!r}, location={self.location!r}, zone={self.zone})"
+
+
+class Deck:
+    """Ordered hidden pile (main, extra or side deck), top first.
+
+    Draws from the top are deque pops.  Taking one copy of a card id out of
+    the middle uses a card_id -> copies index and leaves a tombstone in the
+    deque, which is skipped when it reaches the top and dropped on the next
+    shuffle or compaction.
+    """
+
+    def __init__(self):
+        self._entries = deque()  # [card] lists, [None] once removed
+        self._live = {}          # uid -> entry
+        self._by_id = {}         # card_id -> {uid: Card}, insertion ordered
+        self._dead = 0
+
+    def __len__(self):
+        return len(self._live)
+
+    def __iter__(self):
+        for entry in self._entries:
+            if entry[0] is not None:
+                yield entry[0]
+
+    def __contains__(self, card):
+        return card.uid in self._live
+
+    def _index(self, card):
+        entry = [card]
+        self._live[card.uid] = entry
+        self._by_id.setdefault(card.card_id, {})[card.uid] = card
+        return entry
+
+    def append(self, card):
+        """Put card on the bottom."""
+        self._entries.append(self._index(card))
+
+    def appendleft(self, card):
+        """Put card on top."""
+        self._entries.appendleft(self._index(card))
+
+    def remove(self, card):
+        entry = self._live.pop(card.uid)
+        entry[0] = None
+        copies = self._by_id[card.card_id]
+        del copies[card.uid]
+        if not copies:
+            del self._by_id[card.card_id]
+        self._dead += 1
+        # Trim tombstones off both ends so top() stays O(1)
+        entries = self._entries
+        while entries and entries[0][0] is None:
+            entries.popleft()
+            self._dead -= 1
+        while entries and entries[-1][0] is None:
+            entries.pop()
+            self._dead -= 1
+        if self._dead > 32 and self._dead > len(self._live):
+            self._compact()
+
+    def _compact(self):
+        self._entries = deque(entry for entry in self._entries if entry[0] is not None)
+        self._dead = 0
+
+    def top(self):
+        """Top card, or None when empty."""
+        return self._entries[0][0] if self._entries else None
+
+    def first(self, card_id):
+        """Some copy of card_id in this pile, or None."""
+        copies = self._by_id.get(card_id)
+        return next(iter(copies.values())) if copies else None
+
+    def count(self, card_id):
+        return len(self._by_id.get(card_id, ()))
+
+    def counts(self):
+        """{card_id: copies} for every card still in the pile."""
+        return {card_id: len(copies) for card_id, copies in self._by_id.items()}
+
+    def shuffle(self, rng):
+        cards = list(self)
+        rng.shuffle(cards)
+        self._entries = deque(self._live[card.uid] for card in cards)
+        self._dead = 0
+
+
+class Pile:
+    """Face-up pile (hand, field, graveyard, banished): an ordered set of cards.
+
+    Cards keep their arrival order; membership, append and removal are O(1).
+    """
+    __slots__ = ("_cards",)
+
+    def __init__(self):
+        self._cards = {}  # uid -> Card
+
+    def __len__(self):
+        return len(self._cards)
+
+    def __iter__(self):
+        return iter(self._cards.values())
+
+    def __contains__(self, card):
+        return card.uid in self._cards
+
+    def append(self, card):
+        self._cards[card.uid] = card
+
+    def appendleft(self, card):
+        self._cards = {card.uid: card, **self._cards}
+
+    def remove(self, card):
+        del self._cards[card.uid]
+
+    def last(self):
+        """Most recent arrival (the top of a graveyard), or None."""
+        return next(reversed(self._cards.values()), None)
+
+    def first(self, card_id):
+        """Earliest arrival with card_id, or None."""
+        return next((card for card in self._cards.values() if card.card_id == card_id), None)
+
+
+class ZoneAllocator:
+    """Which of one owner's field zones and hand slots are taken.
+
+    Field zones are bits in a 10-bit mask; the lowest free one is found with
+    bit arithmetic.  Hand slots come from a min-heap free list, so a new card
+    lands in the leftmost gap.  A hand slot taken out of turn (a drop onto a
+    specific slot) leaves a stale heap entry that is skipped when popped;
+    the heap is rebuilt from hand_mask before stale entries pile up.
+    """
+    __slots__ = ("field_mask", "hand_mask", "_hand_free")
+
+    def __init__(self):
+        self.field_mask = 0
+        self.hand_mask = 0
+        self._hand_free = list(range(HAND_SLOTS))  # sorted, so already a heap
+
+    def field_free(self, zone):
+        return 0 <= zone < FIELD_ZONES and not self.field_mask >> zone & 1
+
+    def free_field_zones(self):
+        return [zone for zone in range(FIELD_ZONES) if not self.field_mask >> zone & 1]
+
+    def allocate_field(self, zone=None):
+        """Claim zone (or the lowest free zone); ValueError if it is taken or the field is full."""
+        if zone is None:
+            free = ~self.field_mask & FULL_FIELD
+            if not free:
+                raise ValueError("no free field zone")
+            zone = (free & -free).bit_length() - 1
+        elif not self.field_free(zone):
+            raise ValueError(f"field zone {zone + 1} is already occupied")
+        self.field_mask |= 1 << zone
+        return zone
+
+    def free_field(self, zone):
+        self.field_mask &= ~(1 << zone)
+
+    def hand_free(self, slot):
+        return 0 <= slot < HAND_SLOTS and not self.hand_mask >> slot & 1
+
+    def free_hand_slots(self):
+        return [slot for slot in range(HAND_SLOTS) if not self.hand_mask >> slot & 1]
+
+    def allocate_hand(self, slot=None):
+        """Claim slot if it is free, else the leftmost free slot; None when all 17 are taken."""
+        if slot is None or not self.hand_free(slot):
+            heap = self._hand_free
+            while heap:
+                slot = heapq.heappop(heap)
+                if self.hand_free(slot):
+                    break
+            else:
+                return None
+        self.hand_mask |= 1 << slot
+        return slot
+
+    def free_hand(self, slot):
+        if slot is None or not self.hand_mask >> slot & 1:
+            return  # already free, and so already in the heap
+        self.hand_mask &= ~(1 << slot)
+        if len(self._hand_free) >= 2 * HAND_SLOTS:
+            self.rebuild_hand_heap()
+        else:
+            heapq.heappush(self._hand_free, slot)
+
+    def rebuild_hand_heap(self):
+        """Reset the free list to exactly the free slots, dropping stale and duplicate entries."""
+        self._hand_free = self.free_hand_slots()  # sorted, so already a heap
+
+
+class GameState:
+    """Complete state of one duel.
+
+    Observers are called as ``observer(event, *args)`` after every change:
+
+        ("create", card)                       card added to a pile during setup
+        ("move", card, old_location, old_zone) card changed location and/or zone
+        ("shuffle", owner, location, seed)     a deck was reordered with random.Random(seed)
+        ("lp", owner, old_value, new_value)    life points changed
+        ("restore", moved)                     piles were put back wholesale (undo/redo);
+                                               moved lists (card, old_location, old_zone)
+                                               for every card whose place changed
+    """
+
+    def __init__(self, seed=None):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.cards = {}  # uid -> Card
+        # (owner, location) -> Deck or Pile; with self.cards every lookup and move is O(1)
+        self.piles = {(owner, location): Deck() if location in HIDDEN_LOCATIONS else Pile()
+                      for owner in OWNERS for location in LOCATIONS}
+        self.zones = {owner: ZoneAllocator() for owner in OWNERS}
+        self.life_points = {owner: STARTING_LP for owner in OWNERS}
+        self.next_uid = 0
+        self._observers = []
+
+    # -----------------------------
+    # Observers
+    # -----------------------------
+    def add_observer(self, observer):
+        self._observers.append(observer)
+
+    def remove_observer(self, observer):
+        self._observers.remove(observer)
+
+    def _emit(self, event, *args):
+        for observer in self._observers:
+            observer(event, *args)
+
+    # -----------------------------
+    # Setup
+    # -----------------------------
+    def new_card(self, card_id, owner, location="deck", zone=None):
+        card = Card(self.next_uid, card_id, owner, location, self._claim_zone(owner, location, zone))
+        self.next_uid += 1
+        self.cards[card.uid] = card
+        self.piles[(owner, location)].append(card)
+        self._emit("create", card)
+        return card
+
+    def restore_card(self, uid, card_id, owner, location, zone=None):
+        """Put a saved card back at the end of its pile exactly as it was (no event).
+
+        Unlike new_card, a hand card without a slot stays without one.
+        """
+        if zone is not None:
+            self._claim_zone(owner, location, zone)
+        card = Card(uid, card_id, owner, location, zone)
+        self.cards[uid] = card
+        self.piles[(owner, location)].append(card)
+        self.next_uid = max(self.next_uid, uid + 1)
+        return card
+
+    def load_deck(self, owner, main=(), extra=(), side=()):
+        """Add card ids to an owner's main, extra and side decks (top of deck first)."""
+        for location, card_ids in (("deck", main), ("extra", extra), ("side", side)):
+            for card_id in card_ids:
+                self.new_card(card_id, owner, location)
+
+    def shuffle(self, owner, location="deck", seed=None):
+        """Reorder a pile with a fresh seed from the game's RNG (or the given one)."""
+        if seed is None:
+            seed = self.rng.getrandbits(64)
+        self.piles[(owner, location)].shuffle(random.Random(seed))
+        self._emit("shuffle", owner, location, seed)
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def card(self, uid):
+        return self.cards[uid]
+
+    def pile(self, owner, location):
+        """Cards at (owner, location) in pile order: a Deck (top first) for hidden piles, else a Pile."""
+        return self.piles[(owner, location)]
+
+    def count(self, owner, location):
+        return len(self.piles[(owner, location)])
+
+    # -----------------------------
+    # Zones
+    # -----------------------------
+    def _claim_zone(self, owner, location, zone):
+        if location == "field":
+            return self.zones[owner].allocate_field(zone)
+        if location == "hand":
+            return self.zones[owner].allocate_hand(zone)
+        return None
+
+    def _release_zone(self, card):
+        if card.location == "field":
+            self.zones[card.owner].free_field(card.zone)
+        elif card.location == "hand":
+            self.zones[card.owner].free_hand(card.zone)
+
+    # -----------------------------
+    # Actions
+    # -----------------------------
+    def move(self, uid, location, zone=None, top=False):
+        """Move a card to the end of location's pile (the top of a deck if top is set).
+
+        zone picks a field zone (ValueError if it is occupied) or hand slot
+        (falls back to the leftmost free one); without it the lowest free
+        zone or slot is used.
+        """
+        card = self.cards[uid]
+        old_location, old_zone = card.location, card.zone
+        # Free the old zone first so a card can be dropped back where it was;
+        # take it back if the new zone can't be claimed
+        self._release_zone(card)
+        try:
+            zone = self._claim_zone(card.owner, location, zone)
+        except ValueError:
+            if old_zone is not None:
+                self._claim_zone(card.owner, old_location, old_zone)
+            raise
+        self.piles[(card.owner, old_location)].remove(card)
+        card.location = location
+        card.zone = zone
+        pile = self.piles[(card.owner, location)]
+        if top:
+            pile.appendleft(card)
+        else:
+            pile.append(card)
+        self._emit("move", card, old_location, old_zone)
+        return card
+
+    def draw(self, owner, count=1):
+        """Move up to count cards from the top of owner's deck to their hand."""
+        deck = self.piles[(owner, "deck")]
+        drawn = []
+        for _ in range(min(count, len(deck))):
+            drawn.append(self.move(deck.top().uid, "hand"))
+        return drawn
+
+    def take(self, owner, card_id, source="deck", location="hand", zone=None):
+        """Move one copy of card_id in owner's source pile to location (None if absent)."""
+        card = self.piles[(owner, source)].first(card_id)
+        if card is None:
+            return None
+        return self.move(card.uid, location, zone)
+
+    def return_to_deck(self, uid, position="shuffle", location="deck"):
+        """Add a card back to its owner's deck on top, on the bottom, or shuffled in."""
+        if position not in DECK_POSITIONS:
+            raise ValueError(f"position must be one of {DECK_POSITIONS}, not {position!r}")
+        card = self.move(uid, location, top=position == "top")
+        if position == "shuffle":
+            self.shuffle(card.owner, location)
+        return card
+
+    def restore(self, piles, life_points=None):
+        """Replace whole piles, e.g. to undo back to an earlier snapshot.
+
+        piles maps (owner, location) -> [(uid, zone), ...] in pile order for
+        each pile that differs; a card taken out of one of them must be in
+        another.  Emits one "restore" event instead of a move per card.
+        """
+        before = {}
+        for key in piles:
+            for card in self.piles[key]:
+                before[card.uid] = (card.location, card.zone)
+                self._release_zone(card)
+            self.piles[key] = Deck() if key[1] in HIDDEN_LOCATIONS else Pile()
+        for (owner, location), entries in piles.items():
+            pile = self.piles[(owner, location)]
+            for uid, zone in entries:
+                card = self.cards[uid]
+                card.location, card.zone = location, zone
+                if zone is not None:
+                    self._claim_zone(owner, location, zone)
+                pile.append(card)
+        for owner in {owner for owner, location in piles if location == "hand"}:
+            self.zones[owner].rebuild_hand_heap()  # every slot above was claimed out of turn
+        if life_points is not None:
+            self.life_points.update(life_points)
+        moved = [(self.cards[uid], old_location, old_zone)
+                 for uid, (old_location, old_zone) in before.items()
+                 if (self.cards[uid].location, self.cards[uid].zone) != (old_location, old_zone)]
+        self._emit("restore", moved)
+        return moved
+
+    def adjust_life_points(self, owner, amount):
+        old = self.life_points[owner]
+        new = max(0, old + amount)
+        self.life_points[owner] = new
+        self._emit("lp", owner, old, new)
+        return new
@@ -0,0 +1,191 @@
+"""Goldfish (solitaire) games for every deck in decks/, spread over all CPU cores.
+
+    python goldfish.py --games 20000 --key Sangan --key "Pot of Greed"
+    python goldfish.py decks/goat.json --turns 6 --workers 2
+    python goldfish.py --bench            # 1..all cores on the same batch
+
+Each game is a headless GameState: shuffle, draw 5, then every turn draw
+(except the first turn when going first) and set the first card in hand
+to the field.  The turn each key card is first available (in hand) is
+recorded; without --key every card in the main deck is a key card.
+Deck and key card names are turned into card ids with card_db before the
+games start, so workers only ever handle ids.
+
+Game i of deck d is always seeded from (--seed, deck file name, i), so the
+results don't depend on how the games are split between workers.  Workers
+take chunks of games and send back a small keys x turns histogram per
+chunk rather than one record per game.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from array import array
+from multiprocessing import Pool
+
+from card_db import card_db
+from engine import FIELD_ZONES, GameState
+
+STARTING_HAND_SIZE = 5
+DEFAULT_GAMES = 10_000
+DEFAULT_TURNS = 5
+CHUNK_GAMES = 500
+
+_decks = None  # per-worker: [(name, main deck card ids, key card ids)]
+
+
+# -----------------------------
+# One game
+# -----------------------------
+def play_game(main, keys, turns, seed, going_first=True):
+    """Return the turn each key card is first in hand (0 if never) for one game."""
+    state = GameState(seed)
+    state.load_deck("player", main=main)
+    state.shuffle("player")
+    first_seen = dict.fromkeys(keys, 0)
+    hand = state.piles[("player", "hand")]
+    played = 0
+
+    def note(cards, turn):
+        for card in cards:
+            if first_seen.get(card.card_id) == 0:
+                first_seen[card.card_id] = turn
+
+    note(state.draw("player", STARTING_HAND_SIZE), 1)
+    for turn in range(1, turns + 1):
+        if turn > 1 or not going_first:
+            note(state.draw("player"), turn)
+        if played < FIELD_ZONES and len(hand):
+            state.move(next(iter(hand)).uid, "field")
+            played += 1
+    return [first_seen[key] for key in keys]
+
+
+# -----------------------------
+# Worker side
+# -----------------------------
+def _init_worker(decks):
+    global _decks
+    _decks = decks
+
+
+def game_seed(base_seed, deck_name, game):
+    return f"{base_seed}:{deck_name}:{game}"
+
+
+def run_chunk(job):
+    """Play games [start, start + count) of one deck; returns (deck index, games, histogram).
+
+    The histogram is a flat array('I') of len(keys) x (turns + 1) counters,
+    column 0 counting games where the key card never showed up.
+    """
+    deck_index, start, count, turns, base_seed, going_first = job
+    name, main, keys = _decks[deck_index]
+    width = turns + 1
+    histogram = array("I", bytes(4 * len(keys) * width))
+    for game in range(start, start + count):
+        seen = play_game(main, keys, turns, game_seed(base_seed, name, game), going_first)
+        for k, turn in enumerate(seen):
+            histogram[k * width + turn] += 1
+    return deck_index, count, histogram
+
+
+def load_decks(paths, keys=()):
+    """[(deck file name, main deck card ids, key card ids)] for the deck JSONs at paths."""
+    try:
+        key_ids = [card_db.card_id(key) for key in keys]
+    except KeyError as e:
+        raise SystemExit(f"[!] Unknown key card: {e}")
+    decks = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            main_dict = json.load(f).get("main", {})
+        try:
+            main = card_db.deck_ids(main_dict)
+        except KeyError as e:
+            print(f"[!] Skipping {path}: unknown card {e}")
+            continue
+        if len(main) < STARTING_HAND_SIZE:
+            print(f"[!] Skipping {path}: only {len(main)} main deck cards")
+            continue
+        deck_keys = key_ids if key_ids else sorted(set(main), key=card_db.name)
+        decks.append((os.path.basename(path), main, deck_keys))
+    return decks
+
+
+def run_batch(decks, games, turns, seed=0, workers=None, going_first=True, chunk=CHUNK_GAMES):
+    """Play games per deck over a process pool; returns ([(games, histogram)] per deck, seconds)."""
+    jobs = [(d, start, min(chunk, games - start), turns, seed, going_first)
+            for d in range(len(decks)) for start in range(0, games, chunk)]
+    totals = [[0, array("I", bytes(4 * len(keys) * (turns + 1)))] for _, _, keys in decks]
+    start_time = time.perf_counter()
+    with Pool(workers, initializer=_init_worker, initargs=(decks,)) as pool:
+        for deck_index, count, histogram in pool.imap_unordered(run_chunk, jobs):
+            total = totals[deck_index]
+            total[0] += count
+            for i, value in enumerate(histogram):
+                total[1][i] += value
+    return totals, time.perf_counter() - start_time
+
+
+# -----------------------------
+# Reporting
+# -----------------------------
+def report(decks, totals, turns):
+    width = turns + 1
+    header = "".join(f"  T{t:<5}" for t in range(1, width))
+    for (name, main, keys), (games, histogram) in zip(decks, totals):
+        print(f"[*] {name}: {len(main)} cards, {games:,} games, % with the card in hand by turn")
+        print(f"    {'':32}{header}  avg turn")
+        for k, key in enumerate(keys):
+            row = histogram[k * width:(k + 1) * width]
+            cumulative, weighted, cells = 0, 0, []
+            for turn in range(1, width):
+                cumulative += row[turn]
+                weighted += turn * row[turn]
+                cells.append(f"  {100 * cumulative / games:5.1f}%")
+            avg = f"{weighted / cumulative:.2f}" if cumulative else "-"
+            print(f"    {card_db.name(key)[:32]:32}{''.join(cells)}  {avg:>8}")
+
+
+def bench(decks, games, turns, seed, going_first):
+    cores = os.cpu_count() or 1
+    counts = sorted({1, *range(2, cores + 1, max(1, cores // 8)), cores})
+    total_games = games * len(decks)
+    baseline = None
+    for workers in counts:
+        _, elapsed = run_batch(decks, games, turns, seed, workers, going_first)
+        baseline = baseline or elapsed
+        print(f"  {workers:3d} workers: {elapsed:7.2f}s  {total_games / elapsed:10,.0f} games/s  "
+              f"x{baseline / elapsed:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless goldfish games for deck JSONs.")
+    parser.add_argument("decks", nargs="*", help="deck JSONs (default: every deck in decks/)")
+    parser.add_argument("--games", type=int, default=DEFAULT_GAMES, help="games per deck")
+    parser.add_argument("--turns", type=int, default=DEFAULT_TURNS)
+    parser.add_argument("--key", action="append", default=[], help="key card to track (repeatable)")
+    parser.add_argument("--second", action="store_true", help="go second (draw on turn 1)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bench", action="store_true", help="time the batch on 1..all cores")
+    args = parser.parse_args()
+
+    paths = args.decks or sorted(glob.glob(os.path.join("decks", "*.json")))
+    decks = load_decks(paths, args.key)
+    if not decks:
+        raise SystemExit("[!] No decks to play")
+
+    if args.bench:
+        bench(decks, args.games, args.turns, args.seed, not args.second)
+        return
+    totals, elapsed = run_batch(decks, args.games, args.turns, args.seed, args.workers, not args.second)
+    report(decks, totals, args.turns)
+    played = sum(games for games, _ in totals)
+    print(f"[*] {played:,} games in {elapsed:.2f}s ({played / elapsed:,.0f} games/s)")
+
+
+if __name__ == "__main__":
+    main()
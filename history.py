@@ -0,0 +1,106 @@
+"""Unlimited undo/redo for a GameState from snapshots that share structure.
+
+    history = History(state)
+    ...                  # any number of engine calls make up one step
+    history.checkpoint()
+    history.undo()       # back to the previous checkpoint
+    history.redo()
+
+A snapshot is a tuple with one tuple of (uid, zone) entries per pile plus
+the life points.  A checkpoint rebuilds only the piles that changed since
+the previous one and reuses the rest (and the entries, which are interned),
+so a step that moves a card from hand to field costs the new hand and
+field tuples: a few hundred bytes, however long the game.  Undo compares
+two snapshots pile by pile and hands only the differing piles to
+GameState.restore.
+"""
+from engine import LOCATIONS, OWNERS
+
+PILE_KEYS = tuple((owner, location) for owner in OWNERS for location in LOCATIONS)
+PILE_INDEX = {key: i for i, key in enumerate(PILE_KEYS)}
+
+
+class Snapshot:
+    __slots__ = ("piles", "life_points")
+
+    def __init__(self, piles, life_points):
+        self.piles = piles              # tuple of tuples of (uid, zone), in PILE_KEYS order
+        self.life_points = life_points  # tuple, in OWNERS order
+
+
+class History:
+    """Checkpoints of one GameState, with undo and redo between them."""
+
+    def __init__(self, state):
+        self.state = state
+        self._entries = {}  # (uid, zone) -> the one tuple shared by every snapshot
+        self._dirty = set(PILE_KEYS)
+        self._lp_dirty = True
+        self.past = []      # snapshots up to and including the current one
+        self.future = []    # undone snapshots, most recent last
+        state.add_observer(self._on_game_event)
+        self.checkpoint()
+
+    def _on_game_event(self, event, *args):
+        if event == "move":
+            card, old_location, _ = args
+            self._dirty.add((card.owner, old_location))
+            self._dirty.add((card.owner, card.location))
+        elif event == "shuffle":
+            self._dirty.add((args[0], args[1]))
+        elif event == "create":
+            self._dirty.add((args[0].owner, args[0].location))
+        elif event == "lp":
+            self._lp_dirty = True
+        # "restore" comes from undo/redo itself, which leaves the state matching a snapshot
+
+    def _entry(self, card):
+        key = (card.uid, card.zone)
+        return self._entries.setdefault(key, key)
+
+    def checkpoint(self):
+        """End the current step; returns False if nothing changed since the last one."""
+        if not self._dirty and not self._lp_dirty:
+            return False
+        previous = self.past[-1] if self.past else None
+        piles = list(previous.piles) if previous else [()] * len(PILE_KEYS)
+        for key in self._dirty:
+            pile = tuple(self._entry(card) for card in self.state.pile(*key))
+            i = PILE_INDEX[key]
+            if pile != piles[i]:
+                piles[i] = pile
+        life_points = tuple(self.state.life_points[owner] for owner in OWNERS)
+        if previous and previous.life_points == life_points:
+            life_points = previous.life_points
+        self._dirty.clear()
+        self._lp_dirty = False
+        if previous and all(a is b for a, b in zip(piles, previous.piles)) and life_points is previous.life_points:
+            return False
+        self.past.append(Snapshot(tuple(piles), life_points))
+        self.future.clear()
+        return True
+
+    def undo(self):
+        """Go back one step (unsaved changes count as a step); False if there is none."""
+        self.checkpoint()
+        if len(self.past) < 2:
+            return False
+        self.future.append(self.past.pop())
+        self._restore(self.future[-1], self.past[-1])
+        return True
+
+    def redo(self):
+        """Go forward one undone step; False if there is none (or the game moved on since)."""
+        self.checkpoint()  # a new step since the undo clears the redo list
+        if not self.future:
+            return False
+        self.past.append(self.future.pop())
+        self._restore(self.past[-2], self.past[-1])
+        return True
+
+    def _restore(self, current, target):
+        piles = {PILE_KEYS[i]: list(pile)
+                 for i, (pile, now) in enumerate(zip(target.piles, current.piles)) if pile is not now}
+        self.state.restore(piles, dict(zip(OWNERS, target.life_points)))
+        self._dirty.clear()
+        self._lp_dirty = False
@@ -0,0 +1,153 @@
+"""Exact draw probabilities (multivariate hypergeometric) for the cards left in a deck.
+
+    odds = DrawOdds(card_ids_in_deck)
+    odds.add_query("1+ Sangan in 1", groups=[{SANGAN}], minimums=[1], draws=1)
+    odds.remove(SANGAN)        # a card left the deck
+    odds.results()             # [("1+ Sangan in 1", 0.05), ...]
+
+Probabilities are summed from binomial coefficients that are memoized,
+and DrawOdds keeps each query's group sizes up to date one card at a
+time, so re-asking after a draw costs a few cached lookups.
+"""
+import math
+from collections import Counter, defaultdict
+from fractions import Fraction
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def comb(n, k):
+    if k < 0 or k > n:
+        return 0
+    return math.comb(n, k)
+
+
+@lru_cache(maxsize=65536)
+def ways_at_least(group_sizes, minimums, rest, draws):
+    """Number of draws-card subsets with at least minimums[j] cards from each group j.
+
+    group_sizes are disjoint groups of matching cards; rest is every other card.
+    """
+    if not group_sizes:
+        return comb(rest, draws)
+    size, minimum = group_sizes[0], minimums[0]
+    tail_sizes, tail_minimums = group_sizes[1:], minimums[1:]
+    total = 0
+    for i in range(minimum, min(size, draws) + 1):
+        total += comb(size, i) * ways_at_least(tail_sizes, tail_minimums, rest, draws - i)
+    return total
+
+
+def prob_at_least(deck_size, group_sizes, minimums, draws, exact=False):
+    """P(at least minimums[j] cards from each disjoint group j in the next draws cards)."""
+    group_sizes, minimums = tuple(group_sizes), tuple(minimums)
+    rest = deck_size - sum(group_sizes)
+    if rest < 0:
+        raise ValueError("groups hold more cards than the deck")
+    draws = min(draws, deck_size)
+    p = Fraction(ways_at_least(group_sizes, minimums, rest, draws), comb(deck_size, draws))
+    return p if exact else float(p)
+
+
+# -----------------------------
+# Queries kept current as cards leave (or return to) a deck
+# -----------------------------
+class OddsQuery:
+    __slots__ = ("label", "groups", "minimums", "draws", "sizes")
+
+    def __init__(self, label, groups, minimums, draws):
+        self.label = label
+        self.groups = [frozenset(group) for group in groups]
+        self.minimums = tuple(minimums)
+        self.draws = draws
+        self.sizes = [0] * len(self.groups)
+
+
+class DrawOdds:
+    """Live answers to "at least these cards in the next k draws" for one deck."""
+
+    def __init__(self, cards=()):
+        self.counts = Counter(cards)
+        self.deck_size = sum(self.counts.values())
+        self.queries = []
+        self._members = defaultdict(list)  # card -> [(query, group index)]
+        self._results = None
+
+    def add_query(self, label, groups, minimums, draws):
+        query = OddsQuery(label, groups, minimums, draws)
+        seen = set()
+        for j, group in enumerate(query.groups):
+            if seen & group:
+                raise ValueError("a card can only be in one group of a query")
+            seen |= group
+            query.sizes[j] = sum(self.counts[card] for card in group)
+            for card in group:
+                self._members[card].append((query, j))
+        self.queries.append(query)
+        self._results = None
+        return query
+
+    def clear(self):
+        self.queries.clear()
+        self._members.clear()
+        self._results = None
+
+    def _adjust(self, card, delta):
+        self.counts[card] += delta
+        self.deck_size += delta
+        for query, j in self._members.get(card, ()):
+            query.sizes[j] += delta
+        self._results = None
+
+    def remove(self, card):
+        self._adjust(card, -1)
+
+    def add(self, card):
+        self._adjust(card, 1)
+
+    def results(self):
+        """[(label, probability)] for every query; cached until the deck changes."""
+        if self._results is None:
+            self._results = [(query.label, prob_at_least(self.deck_size, query.sizes, query.minimums, query.draws))
+                             for query in self.queries]
+        return self._results
+
+    def watch(self, state, owner, location="deck"):
+        """Follow a GameState pile: start from its contents and track moves in and out."""
+        self.counts = Counter(card.card_id for card in state.pile(owner, location))
+        self.deck_size = sum(self.counts.values())
+        for query in self.queries:
+            query.sizes = [sum(self.counts[card] for card in group) for group in query.groups]
+        self._results = None
+
+        def on_move(card, old_location):
+            if card.owner != owner:
+                return
+            if old_location == location:
+                self.remove(card.card_id)
+            if card.location == location:
+                self.add(card.card_id)
+
+        def on_event(event, *args):
+            if event == "move":
+                on_move(args[0], args[1])
+            elif event == "restore":
+                for card, old_location, _ in args[0]:
+                    on_move(card, old_location)
+
+        state.add_observer(on_event)
+        return on_event
+
+
+def parse_query(spec):
+    """Split "A | B & 2 of C" into ([[A, B], [C]], [1, 2]) (names are left as written)."""
+    groups, minimums = [], []
+    for part in spec.split(" & "):
+        part = part.strip()
+        n = 1
+        head, sep, rest = part.partition(" of ")
+        if sep and head.isdigit():
+            n, part = int(head), rest
+        groups.append([name.strip() for name in part.split("|") if name.strip()])
+        minimums.append(n)
+    return groups, minimums
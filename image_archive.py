@@ -0,0 +1,253 @@
+"""Packed, memory-mapped archive of pre-resized card images.
+
+Build one before an event so the simulator never needs the network:
+
+    python image_archive.py build --format Goat
+    python image_archive.py build --decks decks
+    python image_archive.py info card_images.ygoarc
+
+Layout (little endian):
+    header   32 bytes   magic, version, entry count, capacity, thumbnail and preview size
+    index    capacity * 24 bytes, sorted by card id: card_id u32, pad u32,
+             thumbnail offset u64, preview offset u64 (unused slots are zero)
+    blobs    raw RGB pixels, thumbnail then preview per card, 16-byte aligned
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pygame
+import requests
+from requests.adapters import HTTPAdapter
+
+from image_cache import CACHE_DIR, IMAGE_URL, ImageCache
+from image_pipeline import decode_card_image
+
+ARCHIVE_MAGIC = b"YGOARC\x00\x01"
+ARCHIVE_VERSION = 1
+IMAGE_ARCHIVE_PATH = "card_images.ygoarc"
+THUMB_SIZE = (68, 98)
+PREVIEW_SIZE = (375, 546)
+
+HEADER = struct.Struct("<8sIIIHHHH")
+HEADER_SIZE = 32
+INDEX_ENTRY = struct.Struct("<IIQQ")
+BLOB_ALIGN = 16
+DOWNLOAD_WORKERS = 16
+
+
+# -----------------------------
+# Reader
+# -----------------------------
+class ImageArchive:
+    """Memory-mapped archive; surfaces wrap the mapped pixels without copying them."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        # ACCESS_COPY keeps the mapping private, so nothing can write through to the file
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_COPY)
+        self._view = memoryview(self._map)
+
+        magic, version, count, capacity, tw, th, pw, ph = HEADER.unpack_from(self._map, 0)
+        if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {ARCHIVE_VERSION} image archive")
+        self.thumb_size = (tw, th)
+        self.preview_size = (pw, ph)
+        self._thumb_len = tw * th * 3
+        self._preview_len = pw * ph * 3
+
+        self._offsets = {}
+        for card_id, _, thumb_off, preview_off in INDEX_ENTRY.iter_unpack(
+                self._view[HEADER_SIZE:HEADER_SIZE + count * INDEX_ENTRY.size]):
+            self._offsets[card_id] = (thumb_off, preview_off)
+
+    def __contains__(self, card_id):
+        return card_id in self._offsets
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def card_ids(self):
+        return self._offsets.keys()
+
+    def pixels(self, card_id):
+        """Return (thumbnail, preview) memoryviews into the mapping, or None."""
+        offsets = self._offsets.get(card_id)
+        if offsets is None:
+            return None
+        thumb_off, preview_off = offsets
+        return (self._view[thumb_off:thumb_off + self._thumb_len],
+                self._view[preview_off:preview_off + self._preview_len])
+
+    def surfaces(self, card_id):
+        """Return (thumbnail, preview) pygame surfaces backed by the mapping, or None."""
+        pixels = self.pixels(card_id)
+        if pixels is None:
+            return None
+        return (pygame.image.frombuffer(pixels[0], self.thumb_size, "RGB"),
+                pygame.image.frombuffer(pixels[1], self.preview_size, "RGB"))
+
+    def close(self):
+        self._offsets = {}
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+
+_default_archive = None
+
+
+def open_default_archive(path=IMAGE_ARCHIVE_PATH):
+    """Open the archive at path once per process; None if it doesn't exist."""
+    global _default_archive
+    if _default_archive is None and os.path.exists(path):
+        try:
+            _default_archive = ImageArchive(path)
+        except (OSError, ValueError) as e:
+            print(f"[image_archive] Ignoring {path}: {e}")
+    return _default_archive
+
+
+# -----------------------------
+# Builder
+# -----------------------------
+def _pad(n):
+    return (-n) % BLOB_ALIGN
+
+
+def build_archive(card_ids, out_path, cache=None, workers=DOWNLOAD_WORKERS,
+                  thumb_size=THUMB_SIZE, preview_size=PREVIEW_SIZE):
+    """Download (through the disk cache), resize and pack every card id into out_path.
+
+    Returns the list of card ids that could not be fetched.
+    """
+    card_ids = sorted(set(card_ids))
+    cache = cache or ImageCache()
+    capacity = len(card_ids)
+    blob_start = HEADER_SIZE + capacity * INDEX_ENTRY.size
+    blob_start += _pad(blob_start)
+
+    def fetch(card_id):
+        images = decode_card_image(cache.get(card_id), [thumb_size, preview_size])
+        return images[thumb_size].tobytes(), images[preview_size].tobytes()
+
+    entries = {}
+    failed = []
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    fd, tmp_path = tempfile.mkstemp(dir=out_dir, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"\0" * blob_start)
+            offset = blob_start
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(fetch, card_id): card_id for card_id in card_ids}
+                for done, future in enumerate(as_completed(futures), 1):
+                    card_id = futures[future]
+                    try:
+                        thumb, preview = future.result()
+                    except Exception as e:
+                        print(f"[!] {card_id}: {e}")
+                        failed.append(card_id)
+                        continue
+                    thumb_off = offset
+                    f.write(thumb + b"\0" * _pad(len(thumb)))
+                    offset += len(thumb) + _pad(len(thumb))
+                    entries[card_id] = (thumb_off, offset)
+                    f.write(preview + b"\0" * _pad(len(preview)))
+                    offset += len(preview) + _pad(len(preview))
+                    if done % 100 == 0:
+                        print(f"[*] {done}/{len(card_ids)}")
+
+            f.seek(0)
+            f.write(HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, len(entries), capacity, *thumb_size, *preview_size))
+            f.seek(HEADER_SIZE)
+            for card_id in sorted(entries):
+                f.write(INDEX_ENTRY.pack(card_id, 0, *entries[card_id]))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    finally:
+        cache.flush()
+    return failed
+
+
+def pooled_session(workers=DOWNLOAD_WORKERS):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def card_names_for_format(fmt, path="cards_by_format_updated.json"):
+    with open(path, "r", encoding="utf-8") as f:
+        formats = json.load(f)
+    if fmt not in formats:
+        raise SystemExit(f"Unknown format {fmt!r}")
+    return set(formats[fmt])
+
+
+def card_names_for_decks(decks_dir="decks"):
+    names = set()
+    for entry in sorted(os.listdir(decks_dir)):
+        if not entry.endswith(".json"):
+            continue
+        with open(os.path.join(decks_dir, entry), "r", encoding="utf-8") as f:
+            deck = json.load(f)
+        for section in ("main", "extra", "side"):
+            names.update(deck.get(section, {}))
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect a packed card image archive.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="prefetch images into an archive")
+    source = build.add_mutually_exclusive_group(required=True)
+    source.add_argument("--format", help="format name in cards_by_format_updated.json")
+    source.add_argument("--decks", metavar="DIR", help="every deck JSON in DIR")
+    build.add_argument("--out", default=IMAGE_ARCHIVE_PATH)
+    build.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS)
+    build.add_argument("--url-template", default=IMAGE_URL,
+                       help="image URL with {card_id}, e.g. a local stand-in server")
+    build.add_argument("--cache-dir", default=CACHE_DIR)
+    build.add_argument("--card-info", default="YGOProDeck_Card_Info.json")
+
+    info = sub.add_parser("info", help="print archive contents summary")
+    info.add_argument("path", nargs="?", default=IMAGE_ARCHIVE_PATH)
+
+    args = parser.parse_args()
+
+    if args.command == "info":
+        archive = ImageArchive(args.path)
+        print(f"{args.path}: {len(archive)} cards, thumbnail {archive.thumb_size}, preview {archive.preview_size}, "
+              f"{os.path.getsize(args.path) / 1e6:.1f} MB")
+        archive.close()
+        return
+
+    names = card_names_for_format(args.format) if args.format else card_names_for_decks(args.decks)
+    with open(args.card_info, "r", encoding="utf-8") as f:
+        card_info = {c["name"]: c["id"] for c in json.load(f)["data"]}
+    unknown = sorted(n for n in names if n not in card_info)
+    for name in unknown:
+        print(f"[!] No card id for {name}")
+    card_ids = [card_info[n] for n in names if n in card_info]
+
+    print(f"[*] Packing {len(card_ids)} cards into {args.out}")
+    cache = ImageCache(args.cache_dir, url_template=args.url_template, session=pooled_session(args.workers))
+    failed = build_archive(card_ids, args.out, cache=cache, workers=args.workers)
+    print(f"[+] Done: {len(card_ids) - len(failed)} packed, {len(failed)} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import atexit
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+IMAGE_URL = "https://images.ygoprodeck.com/images/cards/{card_id}.jpg"
+CACHE_DIR = "image_cache"
+CACHE_BUDGET_BYTES = 512 * 1024 * 1024  # ~10k full-size card JPEGs
+INDEX_FILE = "index.json"
+INDEX_FLUSH_EVERY = 64  # puts between index rewrites during bulk downloads
+
+
+def _atomic_write(path, data):
+    """Write bytes to path so readers only ever see the old or the new file."""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+# -----------------------------
+# Content-addressed card image cache
+# -----------------------------
+class ImageCache:
+    """Disk cache of card JPEGs keyed by card id.
+
+    Blobs are stored under their SHA-256 digest and the index maps card id ->
+    digest, so identical artwork is only stored once.  Entries are evicted in
+    least-recently-used order once the total size exceeds ``budget_bytes``.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, budget_bytes=CACHE_BUDGET_BYTES, url_template=IMAGE_URL, session=None):
+        self.cache_dir = cache_dir
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self.index_path = os.path.join(cache_dir, INDEX_FILE)
+        self.budget_bytes = budget_bytes
+        self.url_template = url_template
+        self.session = session or requests
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index = None          # card_id -> {"sha256", "size", "atime"}, oldest first
+        self._blob_refs = {}        # sha256 -> number of card ids pointing at it
+        self._total_bytes = 0
+        self._index_dirty = False
+        self._puts_since_flush = 0
+
+    # -----------------------------
+    # Index handling
+    # -----------------------------
+    def _load_index(self):
+        if self._index is not None:
+            return
+        os.makedirs(self.blob_dir, exist_ok=True)
+        entries = {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+
+        self._index = OrderedDict()
+        for key, entry in sorted(entries.items(), key=lambda kv: kv[1].get("atime", 0)):
+            if not os.path.exists(self._blob_path(entry["sha256"])):
+                self._index_dirty = True
+                continue
+            self._add_entry(int(key), entry)
+
+    def _add_entry(self, card_id, entry):
+        self._index[card_id] = entry
+        self._index.move_to_end(card_id)
+        refs = self._blob_refs.get(entry["sha256"], 0)
+        if refs == 0:
+            self._total_bytes += entry["size"]
+        self._blob_refs[entry["sha256"]] = refs + 1
+
+    def _drop_entry(self, card_id):
+        entry = self._index.pop(card_id)
+        refs = self._blob_refs[entry["sha256"]] - 1
+        if refs == 0:
+            del self._blob_refs[entry["sha256"]]
+            self._total_bytes -= entry["size"]
+            try:
+                os.unlink(self._blob_path(entry["sha256"]))
+            except OSError:
+                pass
+        else:
+            self._blob_refs[entry["sha256"]] = refs
+        self._index_dirty = True
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest + ".jpg")
+
+    def flush(self):
+        """Persist the index (LRU order and access times) to disk."""
+        with self._lock:
+            if self._index is None or not self._index_dirty:
+                return
+            data = json.dumps({str(k): v for k, v in self._index.items()}).encode("utf-8")
+            _atomic_write(self.index_path, data)
+            self._index_dirty = False
+            self._puts_since_flush = 0
+
+    # -----------------------------
+    # Lookup / store
+    # -----------------------------
+    def _read_verified(self, card_id):
+        """Return cached bytes for card_id, or None if missing or corrupt."""
+        entry = self._index.get(card_id)
+        if entry is None:
+            return None
+        try:
+            with open(self._blob_path(entry["sha256"]), "rb") as f:
+                data = f.read()
+        except OSError:
+            data = None
+        if data is None or hashlib.sha256(data).hexdigest() != entry["sha256"]:
+            print(f"[image_cache] Dropping corrupt entry for card {card_id}")
+            self._drop_entry(card_id)
+            return None
+        entry["atime"] = time.time()
+        self._index.move_to_end(card_id)
+        self._index_dirty = True
+        return data
+
+    def get_cached(self, card_id):
+        """Return cached image bytes without touching the network (None on miss)."""
+        with self._lock:
+            self._load_index()
+            return self._read_verified(card_id)
+
+    def __contains__(self, card_id):
+        with self._lock:
+            self._load_index()
+            return card_id in self._index
+
+    def get(self, card_id):
+        """Return the JPEG bytes for card_id, downloading them on a cache miss."""
+        with self._lock:
+            self._load_index()
+            data = self._read_verified(card_id)
+            if data is not None:
+                self.hits += 1
+                return data
+            self.misses += 1
+
+        # Download outside the lock so other threads can keep hitting the cache
+        resp = self.session.get(self.url_template.format(card_id=card_id), timeout=30)
+        resp.raise_for_status()
+        data = resp.content
+        self.put(card_id, data)
+        return data
+
+    def put(self, card_id, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        with self._lock:
+            self._load_index()
+            if card_id in self._index:
+                self._drop_entry(card_id)
+            if digest not in self._blob_refs:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                _atomic_write(path, data)
+            self._add_entry(card_id, {"sha256": digest, "size": len(data), "atime": time.time()})
+            self._index_dirty = True
+            self._evict()
+            self._puts_since_flush += 1
+            flush = self._puts_since_flush >= INDEX_FLUSH_EVERY
+        if flush:
+            self.flush()
+
+    def _evict(self):
+        # Never evict the entry that was just added
+        while self._total_bytes > self.budget_bytes and len(self._index) > 1:
+            oldest = next(iter(self._index))
+            self._drop_entry(oldest)
+
+    def stats(self):
+        with self._lock:
+            self._load_index()
+            return {
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Shared by sim.py and deckbuilder.py
+image_cache = ImageCache()
+atexit.register(image_cache.flush)
+
+
+def get_card_image_bytes(card_id):
+    return image_cache.get(card_id)
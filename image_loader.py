@@ -0,0 +1,77 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+LOADER_WORKERS = 8
+
+
+# -----------------------------
+# Background image loader
+# -----------------------------
+class AsyncImageLoader:
+    """Runs ``load(key)`` on a worker pool and hands results back to the main thread.
+
+    ``request`` never blocks: it queues the work and returns immediately.  The
+    pygame loop calls ``poll`` once per frame, which runs the callbacks of every
+    finished load on the main thread (where it is safe to touch surfaces and
+    card dicts).  Concurrent requests for the same key share one load.
+    """
+
+    def __init__(self, load, max_workers=LOADER_WORKERS):
+        self.load = load
+        self.max_workers = max_workers
+        self._pool = None
+        self._done = queue.SimpleQueue()
+        self._pending = {}  # key -> [callback, ...]
+
+    def request(self, key, callback):
+        callbacks = self._pending.get(key)
+        if callbacks is not None:
+            callbacks.append(callback)
+            return
+        self._pending[key] = [callback]
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="image-loader")
+        self._pool.submit(self._work, key)
+
+    def _work(self, key):
+        try:
+            self._done.put((key, self.load(key), None))
+        except Exception as e:  # reported on the main thread
+            self._done.put((key, None, e))
+
+    def is_pending(self, key):
+        return key in self._pending
+
+    @property
+    def pending_count(self):
+        return len(self._pending)
+
+    def poll(self, max_results=None):
+        """Deliver finished loads; returns the number of keys completed."""
+        completed = 0
+        while max_results is None or completed < max_results:
+            try:
+                key, result, error = self._done.get_nowait()
+            except queue.Empty:
+                break
+            callbacks = self._pending.pop(key, [])
+            completed += 1
+            if error is not None:
+                print(f"[image_loader] Failed to load {key}: {error}")
+                continue
+            for callback in callbacks:
+                callback(result)
+        return completed
+
+    def wait_idle(self):
+        """Block until every requested key has been delivered (for scripts and batch jobs)."""
+        while self._pending:
+            key, result, error = self._done.get()
+            self._done.put((key, result, error))
+            self.poll()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        self._pending.clear()
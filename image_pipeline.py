@@ -0,0 +1,53 @@
+from io import BytesIO
+
+import pygame
+from PIL import Image
+
+
+def _area(size):
+    return size[0] * size[1]
+
+
+# -----------------------------
+# Single-decode JPEG -> pygame pipeline
+# -----------------------------
+def decode_card_image(data, sizes):
+    """Decode JPEG bytes once and return {(width, height): PIL image} for every size.
+
+    ``Image.draft`` lets libjpeg decode straight at a reduced DCT scale (1/2,
+    1/4, 1/8) when the largest requested size allows it, so a thumbnail-only
+    decode never materialises the full-resolution image.  Every other size is
+    derived from that single decoded image.
+    """
+    img = Image.open(BytesIO(data))
+    largest = max(sizes, key=_area)
+    img.draft("RGB", largest)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    images = {}
+    for size in sorted(set(sizes), key=_area, reverse=True):
+        if img.size == tuple(size):
+            images[size] = img
+        else:
+            # reducing_gap does a cheap integer box reduction before LANCZOS
+            images[size] = img.resize(size, Image.LANCZOS, reducing_gap=2.0)
+    return images
+
+
+def image_to_surface(img):
+    """Wrap a PIL image's pixels in a pygame surface without a second copy."""
+    return pygame.image.frombuffer(img.tobytes(), img.size, img.mode)
+
+
+def to_display_format(surface):
+    """Convert to the display's pixel format for fast blits (no-op without a display)."""
+    if pygame.display.get_surface() is None:
+        return surface
+    return surface.convert()
+
+
+def decode_card_surfaces(data, sizes):
+    """Decode once and return a pygame surface per size, in the order given."""
+    images = decode_card_image(data, sizes)
+    return tuple(image_to_surface(images[size]) for size in sizes)
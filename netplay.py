@@ -0,0 +1,527 @@
+"""Two-player games over TCP: an asyncio server holds the duel, each client plays one side.
+
+    python netplay.py serve decks/a.json decks/b.json --port 7777
+    python sim.py --connect 192.168.1.5:7777 --side opp
+    python netplay.py bench                   # two local clients, round trips and resync
+
+Messages are length-prefixed frames.  Clients never send or receive the
+whole table except to join or to resync: a client's own moves are applied
+locally, sent as action log records (action_log.encode_event: card uid,
+location, zone, top flag; shuffle seed; life point change) and checked
+against the server's copy, which broadcasts what it accepted with a
+sequence number and a hash of its state.  A client that skips a sequence
+number, sees a different hash while none of its own moves are in flight,
+or sends a move that the server rejects gets a fresh snapshot.
+
+Everything a client queues before its network thread next runs goes out
+as one frame, and card drags in between are coalesced to the latest
+position per card.  Drag positions are fractions of the screen size, as
+the two players' screens need not match; a dropped card is laid out by
+each client itself.
+"""
+import argparse
+import asyncio
+import json
+import queue
+import socket
+import struct
+import threading
+import time
+import zlib
+
+from action_log import (OP_LP, OP_MOVE, OP_SHUFFLE, OWNER_CODES, apply_record, decode_state, encode_event,
+                        encode_state, read_state, record_size)
+from card_db import card_db
+from engine import OWNERS, GameState
+
+DEFAULT_PORT = 7777
+STARTING_HAND_SIZE = 5
+
+FRAME = struct.Struct("<I")              # payload length
+MSG_HELLO, MSG_SNAPSHOT, MSG_PROPOSE, MSG_EVENTS, MSG_RESYNC, MSG_DRAG = range(1, 7)
+HELLO = struct.Struct("<BB")             # type, owner
+SNAPSHOT = struct.Struct("<BIII")        # type, seq, last batch applied from this client, state hash; state follows
+PROPOSE = struct.Struct("<BI")           # type, batch number; records follow
+EVENTS = struct.Struct("<BIHBII")        # type, seq after, records, origin owner, origin batch, state hash; records follow
+RESYNC = struct.Struct("<B")
+DRAG_HEAD = struct.Struct("<BB")         # type, count
+DRAG = struct.Struct("<HHH")             # uid, x, y in DRAG_SCALE-ths of the screen (x = DRAG_RELEASED once dropped)
+DRAG_SCALE = 0xFFFE
+DRAG_RELEASED = 0xFFFF
+
+CLIENT_OPS = (OP_MOVE, OP_SHUFFLE, OP_LP)  # what a player may change (no undo, no new cards)
+
+
+def state_hash(state):
+    return zlib.crc32(encode_state(state))
+
+
+def _drag_coord(fraction):
+    return min(max(round(fraction * DRAG_SCALE), 0), DRAG_SCALE)
+
+
+def frame(*parts):
+    payload = b"".join(parts)
+    return FRAME.pack(len(payload)) + payload
+
+
+async def read_frame(reader):
+    (length,) = FRAME.unpack(await reader.readexactly(FRAME.size))
+    return await reader.readexactly(length)
+
+
+def split_records(data, offset=0):
+    """Offsets of the action log records packed in data[offset:]."""
+    offsets = []
+    while offset < len(data):
+        offsets.append(offset)
+        offset += record_size(data, offset)
+    if offset != len(data):
+        raise ValueError("truncated record")
+    return offsets
+
+
+def _no_delay(writer):
+    sock = writer.get_extra_info("socket")
+    if sock is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+# -----------------------------
+# Server
+# -----------------------------
+class DuelServer:
+    """Owns the authoritative GameState and relays accepted changes to both players."""
+
+    def __init__(self, state):
+        self.state = state
+        self.seq = 0             # records accepted so far
+        self.clients = {}        # owner -> StreamWriter
+        self.last_batch = {}     # owner -> last batch number handled
+        self.rejected = 0
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        for writer in self.clients.values():
+            writer.close()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    @staticmethod
+    def _well_formed(payload):
+        """Whether a frame from a player has a known type and the length that type needs."""
+        if not payload:
+            return False
+        kind = payload[0]
+        if kind == MSG_PROPOSE:
+            return len(payload) >= PROPOSE.size
+        if kind == MSG_RESYNC:
+            return len(payload) == RESYNC.size
+        if kind == MSG_DRAG:
+            return len(payload) >= DRAG_HEAD.size and len(payload) == DRAG_HEAD.size + payload[1] * DRAG.size
+        return False
+
+    def snapshot_frame(self, owner):
+        data = encode_state(self.state)
+        return frame(SNAPSHOT.pack(MSG_SNAPSHOT, self.seq, self.last_batch.get(owner, 0), zlib.crc32(data)), data)
+
+    async def _handle(self, reader, writer):
+        _no_delay(writer)
+        owner = None
+        try:
+            payload = await read_frame(reader)
+            if len(payload) != HELLO.size or payload[0] != MSG_HELLO or payload[1] >= len(OWNERS):
+                print("[!] Closing a connection that did not start with a valid hello")
+                return
+            owner = OWNERS[payload[1]]
+            if owner in self.clients:
+                print(f"[!] {owner} is already connected")
+                owner = None
+                return
+            self.clients[owner] = writer
+            self.last_batch[owner] = 0
+            writer.write(self.snapshot_frame(owner))
+            while True:
+                payload = await read_frame(reader)
+                if not self._well_formed(payload):
+                    print(f"[!] Malformed frame from {owner}, closing the connection")
+                    return
+                kind = payload[0]
+                if kind == MSG_PROPOSE:
+                    self._on_propose(owner, payload)
+                elif kind == MSG_RESYNC:
+                    writer.write(self.snapshot_frame(owner))
+                elif kind == MSG_DRAG:
+                    for other, other_writer in self.clients.items():
+                        if other != owner:
+                            other_writer.write(frame(payload))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if owner is not None:
+                del self.clients[owner]
+            writer.close()
+
+    def _allowed(self, owner, data, offset):
+        op = data[offset]
+        if op == OP_MOVE:
+            card = self.state.cards.get(struct.unpack_from("<H", data, offset + 1)[0])
+            return card is not None and card.owner == owner
+        if op == OP_SHUFFLE:
+            return data[offset + 1] == OWNER_CODES[owner]
+        return op == OP_LP
+
+    def _on_propose(self, owner, payload):
+        _, batch = PROPOSE.unpack_from(payload)
+        self.last_batch[owner] = batch
+        accepted = []
+        try:
+            offsets = split_records(payload, PROPOSE.size)
+        except (ValueError, struct.error):
+            offsets, ok = [], False
+        else:
+            ok = True
+        for offset in offsets:
+            if not self._allowed(owner, payload, offset):
+                ok = False
+                break
+            try:
+                apply_record(self.state, payload, offset)
+            except (ValueError, KeyError, IndexError):
+                ok = False  # e.g. a field zone the other copy of the game had free
+                break
+            accepted.append(payload[offset:offset + record_size(payload, offset)])
+        if accepted:
+            self.seq += len(accepted)
+            message = frame(EVENTS.pack(MSG_EVENTS, self.seq, len(accepted), OWNER_CODES[owner], batch,
+                                        state_hash(self.state)), *accepted)
+            for writer in self.clients.values():
+                writer.write(message)
+        if not ok:
+            self.rejected += 1
+            self.clients[owner].write(self.snapshot_frame(owner))
+
+
+def new_duel(player_ids, opponent_ids, seed=None):
+    """A shuffled GameState with opening hands drawn, like a fresh YGOSimulator."""
+    state = GameState(seed)
+    for owner, (main, extra, side) in (("player", player_ids), ("opponent", opponent_ids)):
+        state.load_deck(owner, main=main, extra=extra, side=side)
+        state.shuffle(owner)
+    for owner in OWNERS:
+        state.draw(owner, STARTING_HAND_SIZE)
+    return state
+
+
+# -----------------------------
+# Client
+# -----------------------------
+class NetClient:
+    """One player's copy of a networked duel.
+
+    Local engine calls on ``state`` are sent to the server as they happen;
+    ``poll()`` (on the thread that owns ``state``) applies what arrived.
+    """
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.state = None
+        self.seq = 0                 # server records applied
+        self.sent = 0                # last batch number sent
+        self.acked = 0               # last batch number the server has handled
+        self.replay_until = None     # last own batch in flight when a snapshot replaced the table
+        self.resyncs = 0
+        self.resync_pending = False
+        self.frames_sent = 0
+        self.remote_drags = {}       # uid -> (x, y) screen fractions of the other player's drags, None once dropped
+        self.inbox = queue.SimpleQueue()
+        self.loop = None
+        self.frame_arrived = None
+        self._writer = None
+        self._outbox = []
+        self._drags = {}
+        self._lock = threading.Lock()
+        self._flush_scheduled = False
+        self._applying = False
+
+    async def connect(self, host, port):
+        self.loop = asyncio.get_running_loop()
+        self.frame_arrived = asyncio.Event()
+        reader, self._writer = await asyncio.open_connection(host, port)
+        _no_delay(self._writer)
+        self._writer.write(frame(HELLO.pack(MSG_HELLO, OWNER_CODES[self.owner])))
+        payload = await read_frame(reader)
+        if payload[0] != MSG_SNAPSHOT:
+            raise ConnectionError("server did not send the table")
+        _, self.seq, _, _ = SNAPSHOT.unpack_from(payload)
+        self.state, _ = decode_state(payload, SNAPSHOT.size)
+        self.state.add_observer(self._on_game_event)
+        self._reader_task = asyncio.create_task(self._read_loop(reader))
+
+    def start(self, host, port, timeout=10):
+        """Connect from a background thread that keeps the network loop running (for the simulator)."""
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name="netplay", daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self.connect(host, port), loop).result(timeout)
+
+    async def _read_loop(self, reader):
+        try:
+            while True:
+                self.inbox.put(await read_frame(reader))
+                self.frame_arrived.set()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self.inbox.put(None)
+            self.frame_arrived.set()
+
+    def close(self):
+        if self._writer is not None:
+            self.loop.call_soon_threadsafe(self._writer.close)
+
+    # Outgoing
+    def _on_game_event(self, event, *args):
+        if self._applying:
+            return
+        record = encode_event(self.state, event, args)
+        if record is None or record[0] not in CLIENT_OPS:
+            return
+        with self._lock:
+            self._outbox.append(record)
+            self._schedule_flush()
+
+    def drag(self, uid, x, y):
+        """Show a drag at (x, y), as fractions of the screen size, to the other player.
+
+        Only the latest position per card is sent.
+        """
+        with self._lock:
+            self._drags[uid] = (x, y)
+            self._schedule_flush()
+
+    def release(self, uid):
+        """End a drag: the other player puts its copy of the card back in its place."""
+        with self._lock:
+            self._drags[uid] = None
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.loop.call_soon_threadsafe(self._flush)
+
+    def _flush(self):
+        with self._lock:
+            records, drags = self._outbox, self._drags
+            self._outbox, self._drags = [], {}
+            self._flush_scheduled = False
+        if records:
+            self.sent += 1
+            self._writer.write(frame(PROPOSE.pack(MSG_PROPOSE, self.sent), *records))
+            self.frames_sent += 1
+        if drags:
+            self._writer.write(frame(DRAG_HEAD.pack(MSG_DRAG, len(drags)),
+                                     *(DRAG.pack(uid, DRAG_RELEASED, 0) if pos is None else
+                                       DRAG.pack(uid, _drag_coord(pos[0]), _drag_coord(pos[1]))
+                                       for uid, pos in drags.items())))
+            self.frames_sent += 1
+
+    def _request_resync(self):
+        if self.resync_pending:
+            return
+        self.resync_pending = True
+        self.resyncs += 1
+        self.loop.call_soon_threadsafe(self._writer.write, frame(RESYNC.pack(MSG_RESYNC)))
+
+    def in_flight(self):
+        return self.sent != self.acked or self._flush_scheduled
+
+    # Incoming
+    def poll(self):
+        """Apply every frame received so far; returns how many there were (False once disconnected)."""
+        handled = 0
+        while True:
+            try:
+                payload = self.inbox.get_nowait()
+            except queue.Empty:
+                return handled
+            if payload is None:
+                return False
+            handled += 1
+            kind = payload[0]
+            if kind == MSG_EVENTS:
+                self._on_events(payload)
+            elif kind == MSG_SNAPSHOT:
+                self._on_snapshot(payload)
+            elif kind == MSG_DRAG:
+                (count,) = DRAG_HEAD.unpack_from(payload)[1:]
+                for i in range(count):
+                    uid, x, y = DRAG.unpack_from(payload, DRAG_HEAD.size + i * DRAG.size)
+                    self.remote_drags[uid] = None if x == DRAG_RELEASED else (x / DRAG_SCALE, y / DRAG_SCALE)
+
+    def _apply(self, data, offsets):
+        self._applying = True
+        try:
+            for offset in offsets:
+                apply_record(self.state, data, offset)
+        finally:
+            self._applying = False
+
+    def _on_events(self, payload):
+        _, seq, count, origin, batch, server_hash = EVENTS.unpack_from(payload)
+        if seq - count != self.seq:
+            self._request_resync()  # missed something; the snapshot will catch up
+            return
+        self.seq = seq
+        offsets = split_records(payload, EVENTS.size)
+        if OWNERS[origin] == self.owner:
+            self.acked = batch
+            # Already applied locally, unless a snapshot that didn't include it replaced the table
+            if self.replay_until is not None:
+                self._apply(payload, offsets)
+                if batch >= self.replay_until:
+                    self.replay_until = None
+        else:
+            try:
+                self._apply(payload, offsets)
+            except (ValueError, KeyError):
+                self._request_resync()
+                return
+        if not self.in_flight() and not self.resync_pending and state_hash(self.state) != server_hash:
+            self._request_resync()
+
+    def _on_snapshot(self, payload):
+        _, self.seq, self.acked, _ = SNAPSHOT.unpack_from(payload)
+        _, life_points, piles, _ = read_state(payload, SNAPSHOT.size)
+        with self._lock:
+            unsent = list(self._outbox)  # applied locally, not in any batch yet
+        self._applying = True
+        try:
+            self.state.restore({key: [(uid, zone) for uid, _, zone in cards] for key, cards in piles.items()},
+                               life_points)
+            # Batches (acked, sent] come back as events and are replayed then; unsent moves are redone now
+            self.replay_until = self.sent if self.sent > self.acked else None
+            for record in unsent:
+                apply_record(self.state, record, 0)
+        except (ValueError, KeyError):
+            self.resync_pending = False
+            self._request_resync()
+            return
+        finally:
+            self._applying = False
+        self.resync_pending = False
+
+
+# -----------------------------
+# CLI: serve a duel, or benchmark two local clients
+# -----------------------------
+def load_deck_ids(path):
+    with open(path, "r", encoding="utf-8") as f:
+        deck = json.load(f)
+    return tuple(card_db.deck_ids(deck.get(part, {})) for part in ("main", "extra", "side"))
+
+
+async def serve(args):
+    try:
+        decks = [load_deck_ids(path) for path in (args.player_deck, args.opponent_deck)]
+    except (OSError, KeyError, ValueError) as e:
+        raise SystemExit(f"[!] Could not load decks: {e}")
+    server = DuelServer(new_duel(*decks, seed=args.seed))
+    port = await server.start(args.host, args.port)
+    print(f"[*] Serving on {args.host}:{port}; connect with python sim.py --connect HOST:{port} --side play|opp")
+    await asyncio.Event().wait()
+
+
+async def wait_until(client, done):
+    while not done():
+        await client.frame_arrived.wait()
+        client.frame_arrived.clear()
+        client.poll()
+
+
+async def bench(args):
+    deck = ([1000 + i % 14 for i in range(40)], [], [])
+    server = DuelServer(new_duel(deck, deck, seed=args.seed))
+    port = await server.start("127.0.0.1", 0)
+    a, b = NetClient("player"), NetClient("opponent")
+    await a.connect("127.0.0.1", port)
+    await b.connect("127.0.0.1", port)
+    b_task = asyncio.create_task(wait_until(b, lambda: False))
+
+    # Round trips: one move at a time, each waiting for the server's answer
+    hand = a.state.pile("player", "hand")
+    start = time.perf_counter()
+    for i in range(args.actions):
+        card = next(iter(hand))
+        a.state.move(card.uid, "graveyard" if i % 2 else "banished")
+        a.state.move(card.uid, "hand")
+        await wait_until(a, lambda: not a.in_flight())
+    elapsed = time.perf_counter() - start
+    print(f"[*] {args.actions:,} round trips: {elapsed / args.actions * 1e6:.0f} us each "
+          f"({2 * args.actions:,} moves, {a.frames_sent:,} frames)")
+
+    # Batching: a burst of moves and drag updates in one go
+    frames = a.frames_sent
+    a.state.draw("player", 5)
+    for x in range(500):
+        a.drag(card.uid, x / 500, x / 500)
+    await wait_until(a, lambda: not a.in_flight())
+    print(f"[*] 5 draws + 500 drag updates went out as {a.frames_sent - frames} frames")
+
+    # Desync: damage b's copy behind the server's back, then let the next move expose it
+    b._applying = True
+    b.state.adjust_life_points("player", -1234)
+    b._applying = False
+    a.state.adjust_life_points("player", -100)
+    await wait_until(a, lambda: not a.in_flight())
+    await asyncio.sleep(0.05)
+    b.poll()
+    hashes = {state_hash(server.state), state_hash(a.state), state_hash(b.state)}
+    print(f"[*] Resyncs: a {a.resyncs}, b {b.resyncs}; all copies match: {len(hashes) == 1}")
+
+    # Rejection: a moves b's card (rejected, so a gets a snapshot) while its next change is in flight;
+    # that change is replayed once when it comes back, and a later one is not replayed at all
+    a.state.move(next(iter(a.state.pile("opponent", "hand"))).uid, "graveyard")
+    await asyncio.sleep(0)  # let the rejected move go out as its own batch
+    a.state.adjust_life_points("player", -100)
+    await wait_until(a, lambda: not a.in_flight() and a.replay_until is None)
+    a.state.adjust_life_points("player", -500)
+    await wait_until(a, lambda: not a.in_flight())
+    await asyncio.sleep(0.05)
+    b.poll()
+    hashes = {state_hash(server.state), state_hash(a.state), state_hash(b.state)}
+    print(f"[*] After a rejected move: {server.rejected} rejected, all copies match: {len(hashes) == 1}")
+    if len(hashes) != 1:
+        raise SystemExit("[!] client and server disagree after a rejected move")
+
+    b_task.cancel()
+    a.close()
+    b.close()
+    await asyncio.sleep(0.05)  # let the server see both disconnects
+    await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Networked two-player duels.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="host a duel")
+    serve_parser.add_argument("player_deck")
+    serve_parser.add_argument("opponent_deck")
+    serve_parser.add_argument("--host", default="0.0.0.0")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--seed", type=int)
+    bench_parser = commands.add_parser("bench", help="two local clients against a local server")
+    bench_parser.add_argument("--actions", type=int, default=2000)
+    bench_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args) if args.command == "serve" else bench(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Monte Carlo opening-hand odds for a deck in decks/.
+
+    python opening_hand_analyzer.py decks/goat.json --combo "Sangan | Witch of the Black Forest"
+    python opening_hand_analyzer.py decks/goat.json --draws 2 --combo "2 of Sangan | Sinister Serpent" --combo pair
+
+Each hand is the first 5 cards of a shuffled main deck (the simulator's
+starting hand) plus --draws more.  Hands are sampled in batches as NumPy
+integer arrays: a random key per card, argpartition for the first N cards,
+then a hands x distinct-cards count matrix that the combos test in bulk.
+
+Combo syntax (repeat --combo for several):
+    "A | B | C"           at least one of A, B or C
+    "2 of A | B"          at least two cards among A and B
+    "pair" / "pair of A | B"
+                          two copies of the same card (optionally among A, B)
+    "X & Y"               both X and Y, each written as above
+"""
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+
+from engine import expand_deck
+
+STARTING_HAND_SIZE = 5
+DEFAULT_HANDS = 1_000_000
+BATCH_SIZE = 65536
+
+
+# -----------------------------
+# Combos: predicates over a (hands x cards) count matrix
+# -----------------------------
+class Combo:
+    """A labelled test mapping a count matrix to one bool per hand.
+
+    ``test(counts, columns)`` gets the uint8 count matrix and the name ->
+    column mapping of the deck being sampled; cards missing from the deck
+    simply never count.
+    """
+
+    def __init__(self, label, test, names=()):
+        self.label = label
+        self.test = test
+        self.names = frozenset(names)  # cards the combo mentions
+
+    def __call__(self, counts, columns):
+        return self.test(counts, columns)
+
+    def __repr__(self):
+        return f"Combo({self.label!r})"
+
+
+def _columns_for(columns, names):
+    return [columns[name] for name in names if name in columns]
+
+
+def at_least(names, n=1):
+    names = list(names)
+
+    def test(counts, columns):
+        cols = _columns_for(columns, names)
+        if not cols:
+            return np.zeros(len(counts), dtype=bool)
+        return counts[:, cols].sum(axis=1, dtype=np.int16) >= n
+
+    return Combo(f"{n}+ of {' | '.join(names)}", test, names)
+
+
+def pair(names=None):
+    names = None if names is None else list(names)
+
+    def test(counts, columns):
+        cols = list(columns.values()) if names is None else _columns_for(columns, names)
+        if not cols:
+            return np.zeros(len(counts), dtype=bool)
+        return counts[:, cols].max(axis=1) >= 2
+
+    return Combo("pair" if names is None else f"pair of {' | '.join(names)}", test, names or ())
+
+
+def all_of(*combos):
+    def test(counts, columns):
+        return np.logical_and.reduce([combo(counts, columns) for combo in combos])
+
+    return Combo(" & ".join(combo.label for combo in combos), test,
+                 frozenset().union(*(combo.names for combo in combos)))
+
+
+def parse_combo(spec):
+    """Build a Combo from the CLI syntax described in the module docstring."""
+    parts = []
+    for part in spec.split(" & "):
+        part = part.strip()
+        if part == "pair":
+            parts.append(pair())
+            continue
+        if part.startswith("pair of "):
+            parts.append(pair(name.strip() for name in part[len("pair of "):].split("|")))
+            continue
+        n = 1
+        head, sep, rest = part.partition(" of ")
+        if sep and head.isdigit():
+            n, part = int(head), rest
+        parts.append(at_least((name.strip() for name in part.split("|")), n))
+    return parts[0] if len(parts) == 1 else all_of(*parts)
+
+
+# -----------------------------
+# Vectorized hand sampling
+# -----------------------------
+class HandSampler:
+    """Samples the first hand_size + draws cards of shuffled copies of a deck."""
+
+    def __init__(self, deck_names, hand_size=STARTING_HAND_SIZE, draws=0, seed=None):
+        self.names = sorted(set(deck_names))
+        self.columns = {name: i for i, name in enumerate(self.names)}
+        self.codes = np.array([self.columns[name] for name in deck_names], dtype=np.intp)
+        self.cards_seen = hand_size + draws
+        if not 0 < self.cards_seen <= len(self.codes):
+            raise ValueError(f"can't see {self.cards_seen} cards of a {len(self.codes)}-card deck")
+        self.rng = np.random.default_rng(seed)
+
+    def positions(self, batch):
+        """(batch, cards_seen) deck positions of each hand; any order within a hand."""
+        keys = self.rng.random((batch, len(self.codes)), dtype=np.float32)
+        if self.cards_seen == len(self.codes):
+            return np.broadcast_to(np.arange(len(self.codes)), keys.shape)
+        return np.argpartition(keys, self.cards_seen - 1, axis=1)[:, :self.cards_seen]
+
+    def counts(self, positions, codes=None):
+        """(batch, distinct cards) copies of each card per hand."""
+        codes = (self.codes if codes is None else codes)[positions]
+        batch = len(codes)
+        counts = np.zeros((batch, len(self.names)), dtype=np.uint8)
+        rows = np.arange(batch)
+        for j in range(codes.shape[1]):
+            counts[rows, codes[:, j]] += 1
+        return counts
+
+    def sample(self, batch):
+        return self.counts(self.positions(batch))
+
+
+def wilson_interval(successes, trials, z=1.96):
+    """Wilson score interval for a binomial proportion (95% by default)."""
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denom = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denom
+    half = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denom
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+def analyze(deck_names, combos, hands=DEFAULT_HANDS, hand_size=STARTING_HAND_SIZE, draws=0,
+            seed=None, batch_size=BATCH_SIZE):
+    """Sample hands and count how many satisfy each combo.
+
+    Returns (successes per combo, hands sampled, seconds taken).
+    """
+    sampler = HandSampler(deck_names, hand_size, draws, seed)
+    successes = [0] * len(combos)
+    done = 0
+    start = time.perf_counter()
+    while done < hands:
+        batch = min(batch_size, hands - done)
+        counts = sampler.sample(batch)
+        for i, combo in enumerate(combos):
+            successes[i] += int(np.count_nonzero(combo(counts, sampler.columns)))
+        done += batch
+    return successes, done, time.perf_counter() - start
+
+
+def load_main_deck(path):
+    with open(path, "r", encoding="utf-8") as f:
+        deck = json.load(f)
+    return expand_deck(deck.get("main", {}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo opening-hand odds for a deck JSON.")
+    parser.add_argument("deck", help="deck JSON from decks/")
+    parser.add_argument("--combo", action="append", default=[], help="combo spec (repeatable)")
+    parser.add_argument("--hands", type=int, default=DEFAULT_HANDS)
+    parser.add_argument("--hand-size", type=int, default=STARTING_HAND_SIZE)
+    parser.add_argument("--draws", type=int, default=0, help="extra cards drawn after the opening hand")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    deck_names = load_main_deck(args.deck)
+    combos = [parse_combo(spec) for spec in args.combo]
+    for name in sorted(frozenset().union(*(combo.names for combo in combos)) - set(deck_names)):
+        print(f"[!] {name} is not in the main deck")
+
+    successes, hands, elapsed = analyze(deck_names, combos, args.hands, args.hand_size, args.draws,
+                                        args.seed, args.batch_size)
+    print(f"[*] {args.deck}: {len(deck_names)} cards, {args.hand_size}-card hand + {args.draws} draws, "
+          f"{hands:,} hands")
+    for combo, hits in zip(combos, successes):
+        low, high = wilson_interval(hits, hands)
+        print(f"  {hits / hands:.4f}  [{low:.4f}, {high:.4f}]  {combo.label}")
+    print(f"[*] {hands / elapsed:,.0f} hands/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Save an in-progress duel to a small binary file and load it back.
+
+    save_game("saves/duel.ygosave", state, console_history)
+    state, console_history = load_game("saves/duel.ygosave")
+
+A save holds card ids only (no names or images): every pile of both
+players in order with each card's uid and zone, life points, the RNG
+state (so later shuffles continue as they would have) and the console
+history.  Layout, all little-endian:
+
+    header   "YGOSAVE", version
+    state    length, then action_log.encode_state() bytes
+    rng      Random.getstate(): version, 625 words, has-gauss flag, gauss
+    console  line count, then length + utf-8 text per line
+"""
+import struct
+
+from action_log import decode_state, encode_state
+
+MAGIC = b"YGOSAVE"
+VERSION = 1
+
+HEADER = struct.Struct("<7sB")
+LENGTH = struct.Struct("<I")
+RNG_STATE = struct.Struct("<B625IBd")
+LINE_COUNT = struct.Struct("<H")
+LINE_LENGTH = struct.Struct("<H")
+
+
+def encode_game(state, console_history=()):
+    version, words, gauss = state.rng.getstate()
+    state_bytes = encode_state(state)
+    parts = [HEADER.pack(MAGIC, VERSION),
+             LENGTH.pack(len(state_bytes)), state_bytes,
+             RNG_STATE.pack(version, *words, gauss is not None, gauss or 0.0)]
+    lines = [line.encode("utf-8")[:0xFFFF] for line in console_history]
+    parts.append(LINE_COUNT.pack(len(lines)))
+    for line in lines:
+        parts.append(LINE_LENGTH.pack(len(line)))
+        parts.append(line)
+    return b"".join(parts)
+
+
+def decode_game(data):
+    """Rebuild (GameState, console history lines) from encode_game() bytes."""
+    if len(data) < HEADER.size:
+        raise ValueError("not a saved game")
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a saved game")
+    if version != VERSION:
+        raise ValueError(f"saved game version {version} is not supported (expected {VERSION})")
+    try:
+        offset = HEADER.size
+        (length,) = LENGTH.unpack_from(data, offset)
+        offset += LENGTH.size
+        state, _ = decode_state(data[offset:offset + length])
+        offset += length
+
+        rng_version, *words, has_gauss, gauss = RNG_STATE.unpack_from(data, offset)
+        offset += RNG_STATE.size
+        state.rng.setstate((rng_version, tuple(words), gauss if has_gauss else None))
+
+        (count,) = LINE_COUNT.unpack_from(data, offset)
+        offset += LINE_COUNT.size
+        lines = []
+        for _ in range(count):
+            (length,) = LINE_LENGTH.unpack_from(data, offset)
+            offset += LINE_LENGTH.size
+            lines.append(data[offset:offset + length].decode("utf-8"))
+            offset += length
+    except struct.error as e:
+        raise ValueError(f"saved game is truncated ({e})")
+    return state, lines
+
+
+def save_game(path, state, console_history=()):
+    data = encode_game(state, console_history)
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def load_game(path):
+    with open(path, "rb") as f:
+        return decode_game(f.read())
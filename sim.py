@@ -1,9 +1,6 @@
 import pygame
 import tkinter as tk
 from tkinter import messagebox
-from PIL import Image
-from io import BytesIO
-import requests
 import json
 import random
 import json
@@ -11,14 +8,33 @@ import os
 from tkinter import filedialog, messagebox
 import subprocess
 import pathlib
+import time
+import argparse
+from collections import deque
+from itertools import islice
+from card_db import card_db
+from image_cache import get_card_image_bytes
+from surface_cache import surface_cache
+from image_loader import AsyncImageLoader
+from image_pipeline import decode_card_surfaces, to_display_format
+from image_archive import open_default_archive
+from texture_atlas import TextureAtlas
+from text_cache import FittedLine, TextCache, get_font
+from spatial_index import SpatialGrid
+from hypergeometric import DrawOdds, parse_query
+from action_log import ActionLog
+from history import History
+from savegame import load_game, save_game
+from netplay import NetClient
+from engine import DECK_POSITIONS, FIELD_ZONES, HAND_SLOTS, GameState, HIDDEN_LOCATIONS, LOCATIONS, OWNERS, expand_deck
+from deckbuilder import EXTRA_DECK_TYPES
 
 # -----------------------------
 # Load card data
 # -----------------------------
-with open('YGOProDeck_Card_Info.json', 'r', encoding='utf-8') as f:
-    data = json.load(f)
-
-YGOProDeck_Card_Info = {c['name']: c for c in data['data']}
+# One parsed copy per process, shared with the deck builder and any other tables
+YGOProDeck_Card_Info = card_db.by_name
+CARD_NAMES_BY_ID = card_db.names_by_id
 
 CARD_WIDTH, CARD_HEIGHT = 68, 98
 SPACING = 10
@@ -31,6 +47,13 @@ padding_x = 773
 padding_y = 109
 gap_x = 35
 gap_y = 15
+CONSOLE_HISTORY_LIMIT = 200
+DIRTY_MARGIN = 3  # covers outline strokes drawn just outside a rect
+MAX_DIRTY_RECTS = 16  # beyond this, push one bounding rect instead
+OWNER_ARGS = {"play": "player", "opp": "opponent"}  # console play/opp -> engine owners
+ACTION_LOG_DIR = "logs"  # one .ygolog per game, replayable with action_log.py
+SAVE_DIR = "saves"
+AUTOSAVE_NAME = "autosave"  # written on quit; resume with: python sim.py --resume saves/autosave.ygosave
 
 # -----------------------------
 # Tkinter Card Selection Window
@@ -161,82 +184,110 @@ class DrawCardWindow(tk.Toplevel):
 # Pygame Simulator
 # -----------------------------
 class YGOSimulator:
-    def __init__(self, player_deck_data, opponent_deck_data):
+    def __init__(self, player_deck_data, opponent_deck_data, seed=None, resume=None, net=None):
         pygame.init()
         self.screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
         pygame.display.set_caption("Yu-Gi-Oh! Simulator")
         self.screen_width, self.screen_height = self.screen.get_size()
         
-        # Expand the deck dicts into flat lists for easier draw/remove logic
-        self.player_deck = self._expand_deck(player_deck_data["main"])
-        self.player_extra = self._expand_deck(player_deck_data["extra"])
-        self.player_side = self._expand_deck(player_deck_data["side"])
-
-        self.opponent_deck = self._expand_deck(opponent_deck_data["main"])
-        self.opponent_extra = self._expand_deck(opponent_deck_data["extra"])
-        self.opponent_side = self._expand_deck(opponent_deck_data["side"])
+        # Decks, locations and life points live in the headless engine; this
+        # class renders it (as an observer) and turns input into engine calls.
+        # A fixed seed replays the same shuffles.  A saved game (resume) brings
+        # its own piles, life points, RNG state and console history instead, and
+        # a network game (net, a connected netplay.NetClient) the server's table.
+        self.net = net
+        saved_console = ()
+        if net is not None:
+            self.state = net.state
+        elif resume is not None:
+            try:
+                self.state, saved_console = load_game(resume)
+            except (OSError, ValueError) as e:
+                pygame.quit()
+                raise SystemExit(f"Could not resume {resume}: {e}")
+        else:
+            self.state = GameState(seed)
+        # Everything from the decks on is logged (console commands too, see run)
+        os.makedirs(ACTION_LOG_DIR, exist_ok=True)
+        self.action_log = ActionLog(os.path.join(ACTION_LOG_DIR, time.strftime("%Y%m%d-%H%M%S") + ".ygolog"))
+        self.action_log.attach(self.state)
+        restored = resume is not None or net is not None
+        if not restored:
+            for owner, deck_data in (("player", player_deck_data), ("opponent", opponent_deck_data)):
+                self.state.load_deck(owner,
+                                     main=self._deck_ids(deck_data["main"]),
+                                     extra=self._deck_ids(deck_data["extra"]),
+                                     side=self._deck_ids(deck_data["side"]))
         self.player_deck_pos = (self.screen_width-CARD_WIDTH-14, self.screen_height//2 - CARD_HEIGHT//2 + CARD_HEIGHT*2 + gap_y*2)
         self.player_extra_deck_pos = (self.screen_width-CARD_WIDTH-14-205, self.screen_height//2 - CARD_HEIGHT//2)
         self.opponent_deck_pos = (padding_x-CARD_WIDTH-gap_x, self.screen_height//2 - CARD_HEIGHT//2 - CARD_HEIGHT*2 - gap_y*2)
         self.opponent_extra_deck_pos = (padding_x-CARD_WIDTH-gap_x+205, self.screen_height//2 - CARD_HEIGHT//2)
+        # Deck stacks are redrawn when their counts change (the 0.5px offsets stay within DIRTY_MARGIN)
+        self.deck_stack_rects = {
+            ("player", "deck"): pygame.Rect(self.player_deck_pos, (CARD_WIDTH, CARD_HEIGHT)),
+            ("player", "extra"): pygame.Rect(self.player_extra_deck_pos, (CARD_WIDTH, CARD_HEIGHT)),
+            ("opponent", "deck"): pygame.Rect(self.opponent_deck_pos, (CARD_WIDTH, CARD_HEIGHT)),
+            ("opponent", "extra"): pygame.Rect(self.opponent_extra_deck_pos, (CARD_WIDTH, CARD_HEIGHT)),
+        }
 
         # Hand slot positions (17 slots)
         self.player_hand_slots = [(i*(CARD_WIDTH + SPACING),
-                                self.screen_height - CARD_HEIGHT) for i in range(17)]
+                                self.screen_height - CARD_HEIGHT) for i in range(HAND_SLOTS)]
         self.opponent_hand_slots = [(i*(CARD_WIDTH + SPACING),
-                                    0) for i in range(17)]
+                                    0) for i in range(HAND_SLOTS)]
 
-        self.next_uid = 0
+        # Fixed screen regions (also used as dirty rects)
+        self.preview_rect = pygame.Rect(0, (self.screen_height - PREVIEW_HEIGHT)//2, PREVIEW_WIDTH, PREVIEW_HEIGHT)
+        self.lp_rects = {
+            "player": pygame.Rect(self.screen_width - 700, self.screen_height//2 + 35, 80, 20),
+            "opponent": pygame.Rect(self.screen_width - 115, self.screen_height//2 - 50, 80, 20),
+        }
 
-        # Cards: dicts with name, owner, location
-        self.cards = []
+        # Card views: dicts with name, owner, location and surfaces, one per
+        # engine card that is face up on the table (hand, field, GY, banished),
+        # keyed by uid in draw order
+        self.cards = {}
 
         self.context_menu = None
 
-        # Shuffle decks so draw works randomly like in YGO
-        import random
-        random.shuffle(self.player_deck)
-        random.shuffle(self.opponent_deck)
+        # Load mat (composited with the zone outlines in get_background)
+        self.mat_surface = pygame.image.load("mat.jpg").convert()
+        self.background_cache = {}  # screen size -> background surface
 
-        # Draw 5 random cards from each deck as starting hand
-        self.starting_hand_size = 5
-        self.player_starting_hand = [self.player_deck.pop(0) for _ in range(self.starting_hand_size)]
-        self.opponent_starting_hand = [self.opponent_deck.pop(0) for _ in range(self.starting_hand_size)]
+        # Load card back (also the placeholder while a card's image loads)
+        self.card_back_surface = pygame.image.load("card_back.png").convert_alpha()
+        self.card_back_surface = pygame.transform.scale(self.card_back_surface, (CARD_WIDTH, CARD_HEIGHT))
+        self.card_back_banished = pygame.transform.rotate(self.card_back_surface, 90)
+        self.card_back_preview = None
 
-        for name in self.player_starting_hand:
-            inst = self._create_card_instance(name, owner="player", location="hand")
-            self.cards.append(inst)
+        # Card images come from the prebuilt archive when there is one,
+        # otherwise they are fetched and decoded off the main thread
+        self.image_archive = open_default_archive()
+        self.image_loader = AsyncImageLoader(self._load_card_surfaces)
+
+        # Every distinct card either player can bring out, plus the card backs,
+        # gets a slot in one atlas surface that all card blits read from
+        self._build_atlas()
 
-        for name in self.opponent_starting_hand:
-            inst = self._create_card_instance(name, owner="opponent", location="hand")
-            self.cards.append(inst)
-        
         self.dragged_card_uid = None
         self.dragged_card_pos = (0,0)
         self.drag_offset = (0,0)
 
-        # Life Points
-        self.life_points = {"play": 8000, "opp": 8000}
-
-        # Card surfaces
-        self.card_surfaces = []
-        self.card_rects = []
-        self.card_preview_surfaces = []
+        # Fonts are looked up once; rendered strings are cached by text
+        self.text_cache = TextCache()
+        self.lp_font = get_font(None, 24)
+        self.menu_font = get_font(None, 24)
 
         # Console
-        self.console_font = pygame.font.SysFont(None, 16)
-        self.console_text = ""
-        self.console_history = []
+        self.console_font = get_font(None, 16)
+        self.console_history = deque(saved_console, maxlen=CONSOLE_HISTORY_LIMIT)
         console_width, console_height = 275, 100
         self.console_rect = pygame.Rect(380, (self.screen_height - console_height)//2, console_width, console_height)
+        self.console_line = FittedLine(self.console_font, console_width - 10, self.text_cache)
 
-        # Load mat
-        self.mat_surface = pygame.image.load("mat.jpg").convert()
-        self.mat_surface = pygame.transform.scale(self.mat_surface, (self.screen_width, self.screen_height))
-
-        # Load card back
-        self.card_back_surface = pygame.image.load("card_back.png").convert_alpha()
-        self.card_back_surface = pygame.transform.scale(self.card_back_surface, (CARD_WIDTH, CARD_HEIGHT))
+        # Draw odds overlay under the console (see the odds command)
+        self.odds_rect = pygame.Rect(self.console_rect.x, self.console_rect.bottom + 5,
+                                     console_width, self.console_font.get_height() * 5 + 8)
 
         # Zones
         self.zones = self.create_zones()
@@ -253,26 +304,98 @@ class YGOSimulator:
         self.dragged_card_index = None
         self.dragged_card_pos = (0,0)
         self.drag_offset = (0,0)
+        self.highlight_zone = None
+
+        # Dirty-rectangle rendering: only regions marked here are redrawn
+        self.dirty_rects = []
+        self.full_redraw = True
+        self.hover_uid = None
+
+        # Hit testing: cards in draw order, plus the drop targets
+        self.card_index = SpatialGrid()
+        self.drop_index = SpatialGrid()
+        self._build_drop_index()
+
+        # Shuffle decks so draw works randomly like in YGO
+        if not restored:
+            self.state.shuffle("player")
+            self.state.shuffle("opponent")
+
+        # Exact draw odds follow the player's deck one card at a time
+        self.draw_odds = DrawOdds()
+        self.draw_odds.watch(self.state, "player")
+
+        # From here on every engine change updates only the cards it touched
+        self.state.add_observer(self._on_game_event)
 
-        self.load_cards()
-        self.run()
+        # Draw 5 random cards from each deck as starting hand
+        self.starting_hand_size = 5
+        if not restored:
+            self.state.draw("player", self.starting_hand_size)
+            self.state.draw("opponent", self.starting_hand_size)
+        else:
+            # Views for the restored table; their images load in the background as
+            # usual, so the game is playable while they still show card backs
+            for owner in OWNERS:
+                for location in LOCATIONS:
+                    if location not in HIDDEN_LOCATIONS:
+                        for card in self.state.pile(owner, location):
+                            self._sync_view(card)
+            self._relayout_all()
+
+        # Undo/redo steps: one per frame that changed the game (see run)
+        self.history = History(self.state)
     
+    def _build_atlas(self):
+        self.atlas = TextureAtlas()
+        self.atlas.reserve("back", (CARD_WIDTH, CARD_HEIGHT))
+        self.atlas.reserve("back_banished", (CARD_HEIGHT, CARD_WIDTH))
+        card_ids = sorted({card.card_id for card in self.state.cards.values()})
+        for card_id in card_ids:
+            self.atlas.reserve(("face", card_id), (CARD_WIDTH, CARD_HEIGHT))
+        for card_id in card_ids:
+            self.atlas.reserve(("banished", card_id), (CARD_HEIGHT, CARD_WIDTH))
+        self.atlas.build()
+        self.atlas.store("back", self.card_back_surface)
+        self.atlas.store("back_banished", self.card_back_banished)
+
+        # Start loading the whole pool now so later draws are instant
+        for card_id in card_ids:
+            thumb = surface_cache.get((card_id, CARD_WIDTH, CARD_HEIGHT, "face"))
+            if thumb is None and self.image_archive is not None:
+                thumb, _ = self._archive_card_surfaces(card_id)
+            if thumb is not None:
+                self._atlas_store(card_id, thumb)
+            else:
+                self.image_loader.request(card_id, lambda surfaces, card_id=card_id: self._store_card_surfaces(card_id, surfaces))
+
     def _expand_deck(self, deck_dict):
         # turns {"Dark Magician": 3, "Blue-Eyes": 2} into
         # ["Dark Magician", "Dark Magician", "Dark Magician", "Blue-Eyes", "Blue-Eyes"]
-        deck_list = []
-        for name, count in deck_dict.items():
-            deck_list.extend([name] * count)
-        return deck_list
+        return expand_deck(deck_dict)
+
+    def _deck_ids(self, deck_dict):
+        return card_db.deck_ids(deck_dict)
+
+    def deck_names(self, owner, location="deck"):
+        """Names of the cards in one of owner's hidden piles, top first."""
+        return [CARD_NAMES_BY_ID[card.card_id] for card in self.state.pile(owner, location)]
     
     def open_context_menu(self, card, pos):
         """Opens a simple right-click menu at pos for the given card."""
+        self.close_context_menu()
         menu_width, menu_height = 120, 60
         self.context_menu = {
             "card": card,
             "rect": pygame.Rect(pos[0], pos[1], menu_width, menu_height),
             "options": ["Declare", "Close"]
         }
+        self.mark_dirty(self.context_menu["rect"])
+
+    def close_context_menu(self):
+        if self.context_menu:
+            self.mark_dirty(self.context_menu["rect"])
+            self.context_menu = None
     
     def load_decks(self):
         """Load or build decks for both players."""
@@ -350,92 +473,247 @@ class YGOSimulator:
         y = PLAYER_HAND_Y if owner == "player" else OPPONENT_HAND_Y
         return [(HAND_START_X + i*(CARD_WIDTH + SPACING), y) for i in range(MAX_HAND)]
 
+    def controls(self, owner):
+        """In a network game each client only moves its own side's cards."""
+        return self.net is None or owner == self.net.owner
+
+    def _allow(self, owner):
+        """controls(owner), with a console note when the side belongs to the other client."""
+        if self.controls(owner):
+            return True
+        self.console_history.append(f"Only the {owner} can change the {owner}'s cards")
+        self.mark_dirty(self.console_rect)
+        return False
+
     def drawplay(self, count=1):
+        if not self._allow("player"):
+            return
         # Clamp count to available cards
-        actual_count = min(count, len(self.player_deck))
+        actual_count = min(count, self.state.count("player", "deck"))
         if actual_count < count:
             print(f"Player tried to draw {count}, but only {actual_count} available.")
 
-        for _ in range(actual_count):
-            card_name = self.player_deck.pop(0)
-            inst = self._create_card_instance(card_name, owner="player", location="hand")
-            self.cards.append(inst)
-
-        self.load_cards()
+        self.state.draw("player", actual_count)
 
     def drawopp(self, count=1):
-        actual_count = min(count, len(self.opponent_deck))
+        if not self._allow("opponent"):
+            return
+        actual_count = min(count, self.state.count("opponent", "deck"))
         if actual_count < count:
             print(f"Opponent tried to draw {count}, but only {actual_count} available.")
 
-        for _ in range(actual_count):
-            card_name = self.opponent_deck.pop(0)
-            inst = self._create_card_instance(card_name, owner="opponent", location="hand")
-            self.cards.append(inst)
+        self.state.draw("opponent", actual_count)
 
-        self.load_cards()
+    def cards_at(self, owner, location):
+        """Views of owner's face-up cards at location, in arrival order."""
+        return [self.cards[card.uid] for card in self.state.pile(owner, location)]
 
     # -----------------------------
-    # Helper: create a unique card instance (fetch images once)
+    # Game state observer: keeps the card views in step with the engine
     # -----------------------------
-    def _create_card_instance(self, card_name, owner="player", location="hand"):
-        if not hasattr(self, "next_uid"):
-            self.next_uid = 0
-        uid = self.next_uid
-        self.next_uid += 1
-
-        card_id = YGOProDeck_Card_Info[card_name]["id"]
-
-        # Fetch surfaces
-        surface_orig = self._fetch_surface_from_id(card_id, CARD_WIDTH, CARD_HEIGHT)
-        preview = self._fetch_surface_from_id(card_id, PREVIEW_WIDTH, PREVIEW_HEIGHT)
+    def _on_game_event(self, event, *args):
+        if event == "move":
+            self._on_card_moved(args[0], args[1])
+        elif event == "lp":
+            self.mark_dirty(self.lp_rects[args[0]])
+        elif event == "restore":
+            # Undo/redo: bring every moved card's view in line, then re-place all groups
+            # (cards can also have been reordered within one)
+            for card, old_location, _ in args[0]:
+                self._sync_view(card)
+            self._relayout_all()
+
+    def _on_card_moved(self, card, old_location):
+        if old_location in HIDDEN_LOCATIONS or card.location in HIDDEN_LOCATIONS:
+            self.mark_dirty(self.deck_stack_rects.get((card.owner, old_location)),
+                            self.deck_stack_rects.get((card.owner, card.location)))
+        self._sync_view(card)
+
+        # Only the groups the card left and joined can change position
+        if old_location not in HIDDEN_LOCATIONS:
+            self._relayout(card.owner, old_location)
+        if card.location not in HIDDEN_LOCATIONS:
+            self._relayout(card.owner, card.location)
+            self.card_index.raise_to_top(card.uid)
+        if card.owner == "player" and "deck" in (old_location, card.location) and self.draw_odds.queries:
+            self.mark_dirty(self.odds_rect)
+
+    def _sync_view(self, card):
+        """Create, update or drop the view of a card that changed location or zone."""
+        view = self.cards.get(card.uid)
+        if view is not None:
+            self.mark_dirty(self._card_draw_rect(view))
+        if card.location in HIDDEN_LOCATIONS:
+            if view is not None:
+                del self.cards[card.uid]
+                self.card_index.remove(card.uid)
+        elif view is None:
+            self.cards[card.uid] = self._create_card_instance(card)
+        else:
+            view["location"] = card.location
+            view["zone"] = card.zone
+            # Rotate if moving to banished, reset to normal otherwise
+            self._refresh_card_surface(view)
+            # Last moved is drawn (and hit-tested) on top, e.g. the newest graveyard card
+            self.cards[card.uid] = self.cards.pop(card.uid)
+
+    def _relayout_all(self):
+        for owner in OWNERS:
+            for location in LOCATIONS:
+                if location not in HIDDEN_LOCATIONS:
+                    self._relayout(owner, location)
+        self.mark_dirty(*self.lp_rects.values(), *self.deck_stack_rects.values(), self.odds_rect)
+
+    def _relayout(self, owner, location):
+        """Re-place one group (a hand, a field, a pile) and mark what moved."""
+        for view in self.cards_at(owner, location):
+            rect = self._layout_rect(view)
+            if rect != view["rect"] or view["uid"] not in self.card_index:
+                self.mark_dirty(self._card_draw_rect(view))
+                view["rect"] = rect
+                self.mark_dirty(self._card_draw_rect(view))
+            self._index_card(view)
 
-        # Initial rect at 0,0 (will be repositioned in load_cards)
+    # -----------------------------
+    # Helper: create a unique card instance (images load in the background)
+    # -----------------------------
+    def _create_card_instance(self, card):
+        card_id = card.card_id
+
+        # Shared surfaces from the process-wide cache (no per-instance copies);
+        # on a miss the card back stands in until the loader delivers them
+        surface_orig = surface_cache.get((card_id, CARD_WIDTH, CARD_HEIGHT, "face"))
+        preview = surface_cache.get((card_id, PREVIEW_WIDTH, PREVIEW_HEIGHT, "face"))
+        if (surface_orig is None or preview is None) and self.image_archive is not None:
+            surface_orig, preview = self._archive_card_surfaces(card_id)
+        loaded = surface_orig is not None and preview is not None
+        if loaded:
+            self._atlas_store(card_id, surface_orig)
+        else:
+            surface_orig = self.card_back_surface
+            preview = self._card_back_preview()
+
+        # Initial rect at 0,0 (placed by _relayout once the view is registered)
         rect = surface_orig.get_rect(topleft=(0,0))
 
         instance = {
-            "uid": uid,
-            "name": card_name,
+            "uid": card.uid,
+            "name": CARD_NAMES_BY_ID[card_id],
             "id": card_id,
-            "owner": owner,
-            "location": location,
+            "owner": card.owner,
+            "location": card.location,
+            "zone": card.zone,
             "surface_orig": surface_orig,
             "surface": surface_orig,   # may rotate later if banished
             "preview": preview,
             "rect": rect,
+            "loaded": loaded,
         }
 
         # Rotate surface if banished
-        if location == "banished":
-            instance["surface"] = pygame.transform.rotate(surface_orig, 90)
+        self._refresh_card_surface(instance)
+
+        if not loaded:
+            self.image_loader.request(card_id, lambda surfaces: self._on_card_surfaces_loaded(instance, surfaces))
 
         return instance
 
+    def _card_back_preview(self):
+        if self.card_back_preview is None:
+            self.card_back_preview = pygame.transform.smoothscale(self.card_back_surface, (PREVIEW_WIDTH, PREVIEW_HEIGHT))
+        return self.card_back_preview
+
+    def _archive_card_surfaces(self, card_id):
+        """Zero-copy surfaces straight from the mapped archive, or (None, None)."""
+        if self.image_archive.thumb_size != (CARD_WIDTH, CARD_HEIGHT) or \
+                self.image_archive.preview_size != (PREVIEW_WIDTH, PREVIEW_HEIGHT):
+            return None, None
+        surfaces = self.image_archive.surfaces(card_id)
+        if surfaces is None:
+            return None, None
+        return (surface_cache.put((card_id, CARD_WIDTH, CARD_HEIGHT, "face"), surfaces[0]),
+                surface_cache.put((card_id, PREVIEW_WIDTH, PREVIEW_HEIGHT, "face"), surfaces[1]))
+
+    def _card_surface(self, card_id, width, height):
+        """Return the shared face surface for card_id at width x height (blocking)."""
+        key = (card_id, width, height, "face")
+        surface = surface_cache.get(key)
+        if surface is None and self.image_archive is not None and card_id in self.image_archive:
+            thumb, preview = self._archive_card_surfaces(card_id)
+            surface = {(CARD_WIDTH, CARD_HEIGHT): thumb, (PREVIEW_WIDTH, PREVIEW_HEIGHT): preview}.get((width, height))
+        if surface is None:
+            surface = surface_cache.put(key, self._fetch_surface_from_id(card_id, width, height))
+        return surface
+
+    def _load_card_surfaces(self, card_id):
+        # Runs on a loader worker thread: no card dicts or display calls here.
+        # One fetch, one decode, both sizes.
+        return decode_card_surfaces(get_card_image_bytes(card_id),
+                                    [(CARD_WIDTH, CARD_HEIGHT), (PREVIEW_WIDTH, PREVIEW_HEIGHT)])
+
+    def _store_card_surfaces(self, card_id, surfaces):
+        """Register decoded surfaces in the surface cache and atlas; returns the shared pair."""
+        surface_orig, preview = surfaces
+        surface_orig = surface_cache.get((card_id, CARD_WIDTH, CARD_HEIGHT, "face")) or \
+            surface_cache.put((card_id, CARD_WIDTH, CARD_HEIGHT, "face"), to_display_format(surface_orig))
+        preview = surface_cache.get((card_id, PREVIEW_WIDTH, PREVIEW_HEIGHT, "face")) or \
+            surface_cache.put((card_id, PREVIEW_WIDTH, PREVIEW_HEIGHT, "face"), to_display_format(preview))
+        self._atlas_store(card_id, surface_orig)
+        return surface_orig, preview
+
+    def _atlas_store(self, card_id, surface_orig):
+        if not self.atlas.is_filled(("face", card_id)):
+            self.atlas.store(("face", card_id), surface_orig)
+            self.atlas.store(("banished", card_id), pygame.transform.rotate(surface_orig, 90))
+
+    def _on_card_surfaces_loaded(self, card, surfaces):
+        card["surface_orig"], card["preview"] = self._store_card_surfaces(card["id"], surfaces)
+        card["loaded"] = True
+        self._refresh_card_surface(card)
+        self.mark_dirty(self._card_draw_rect(card), self.preview_rect)
+
+    def _refresh_card_surface(self, card):
+        """Pick the thumbnail (and atlas region) matching the card's location, rotated when banished."""
+        if card["location"] != "banished":
+            card["surface"] = card["surface_orig"]
+            card["atlas_key"] = ("face", card["id"]) if card["loaded"] else "back"
+        elif not card["loaded"]:
+            card["surface"] = self.card_back_banished
+            card["atlas_key"] = "back_banished"
+        else:
+            key = (card["id"], CARD_WIDTH, CARD_HEIGHT, "banished")
+            card["surface"] = surface_cache.get_or_create(key, lambda: pygame.transform.rotate(card["surface_orig"], 90))
+            card["atlas_key"] = ("banished", card["id"])
+
+    def _blit_card(self, card, pos):
+        """Blit a card from its atlas region (falls back to its own surface)."""
+        key = card.get("atlas_key")
+        if key is not None and self.atlas.is_filled(key):
+            self.screen.blit(self.atlas.surface, pos, self.atlas.region(key))
+        else:
+            self.screen.blit(card["surface"], pos)
+
     def _fetch_surface_from_id(self, card_id, width, height):
-        url = f"https://images.ygoprodeck.com/images/cards/{card_id}.jpg"
-        resp = requests.get(url)
-        img = Image.open(BytesIO(resp.content)).convert("RGBA")
-        img = img.resize((width, height), Image.LANCZOS)
-        mode = img.mode
-        size = img.size
-        data = img.tobytes()
-        return pygame.image.fromstring(data, size, mode)
+        surface, = decode_card_surfaces(get_card_image_bytes(card_id), [(width, height)])
+        return to_display_format(surface)
 
     # -----------------------------
     # Life points helper
     # -----------------------------
     def adjust_life_points(self, target, amount):
-        if target not in self.life_points:
+        if target not in OWNER_ARGS:
             print(f"Invalid LP target: {target}")
             return
-        self.life_points[target] += amount
-        if self.life_points[target] < 0:
-            self.life_points[target] = 0
+        if not self._allow(OWNER_ARGS[target]):
+            return
+        self.state.adjust_life_points(OWNER_ARGS[target], amount)
 
     # -----------------------------
     # Create 20 zones (2 rows of 5 per side)
     # -----------------------------
     def create_zones(self):
+        if hasattr(self, "background_cache"):
+            self.background_cache.clear()
         self.player_field_zones = []
         self.opponent_field_zones = []
 
@@ -457,187 +735,239 @@ class YGOSimulator:
 
         return self.player_field_zones + self.opponent_field_zones  # old full list
 
+    def _build_drop_index(self):
+        # Later inserts win when targets overlap: field < graveyard < banish.
+        # Values are (location, rect, zone index, owner of the zone)
+        self.drop_index.clear()
+        for i, zone in enumerate(self.zones):
+            owner = "player" if i < FIELD_ZONES else "opponent"
+            self.drop_index.insert(("field", i), zone, value=("field", zone, i % FIELD_ZONES, owner))
+        for i, gy in enumerate(self.graveyard_zones):
+            self.drop_index.insert(("graveyard", i), gy, value=("graveyard", gy, None, None))
+        for i, bz in enumerate(self.banish_zones):
+            self.drop_index.insert(("banished", i), bz, value=("banished", bz, None, None))
+
+    def _drop_target(self, card, pos):
+        """Drop target under pos for card, skipping field zones it can't go to (the
+        other player's side, or occupied by another card)."""
+        target = self.drop_index.hit(pos)
+        if target is not None and target[0] == "field":
+            location, zone, zone_index, owner = target
+            own_zone = card["location"] == "field" and card["zone"] == zone_index
+            if owner != card["owner"] or not (own_zone or self.state.zones[owner].field_free(zone_index)):
+                return None
+        return target
+
+    def _index_card(self, card):
+        """Keep the hit-test grid in sync after a card's rect changes."""
+        if card["uid"] in self.card_index:
+            self.card_index.update(card["uid"], card["rect"])
+        else:
+            self.card_index.insert(card["uid"], card["rect"], value=card)
+
     # -----------------------------
     # Fetch card surface wrapper (by name)
     # -----------------------------
     def fetch_card_surface(self, card_name, width, height):
         card_id = YGOProDeck_Card_Info[card_name]["id"]
-        return self._fetch_surface_from_id(card_id, width, height)
+        return self._card_surface(card_id, width, height)
 
     # -----------------------------
     # Load card surfaces
     # -----------------------------
     def load_cards(self):
-        self.card_surfaces.clear()
-        self.card_rects.clear()
-        self.card_preview_surfaces.clear()
-
-        # Starting positions for new hand cards
-        player_x, player_y = 0, self.screen_height - CARD_HEIGHT
-        opponent_x, opponent_y = 0, 0
-
-        field_positions = self.zones
-
-        for card in self.cards:
-            # Always recalc rect if card is in graveyard or banished
-            if card.get("rect") is not None and card.get("placed", False) and card["location"] in ("hand", "field"):
-                self.card_surfaces.append(card["surface"])
-                self.card_preview_surfaces.append(card["preview"])
-                self.card_rects.append(card["rect"])
-                continue
-
-            surface = card.get("surface") or self.fetch_card_surface(card["name"], CARD_WIDTH, CARD_HEIGHT)
-            preview = card.get("preview") or self.fetch_card_surface(card["name"], PREVIEW_WIDTH, PREVIEW_HEIGHT)
-
-            if card["location"] == "hand":
-                if card["owner"] == "player":
-                    rect = surface.get_rect(topleft=(player_x, player_y))
-                    player_x += CARD_WIDTH + SPACING
-                else:
-                    rect = surface.get_rect(topleft=(opponent_x, opponent_y))
-                    opponent_x += CARD_WIDTH + SPACING
-            elif card["location"] == "field":
-                rect = pygame.Rect(0, 0, CARD_WIDTH, CARD_HEIGHT)
-                
-                # Select which zones to use based on owner
-                if card["owner"] == "player":
-                    zones_to_check = self.player_field_zones  # top/bottom depends on your layout
-                else:
-                    zones_to_check = self.opponent_field_zones
-
-                # Iterate through the zones to find a free slot
-                for zone in zones_to_check:
-                    if not any(c["rect"].colliderect(zone) for c in self.cards if c["location"]=="field" and c["owner"]==card["owner"]):
-                        rect.topleft = (zone.x, zone.y)
-                        card["placed"] = True
-                        break
-            elif card["location"] == "graveyard":
-                rect = surface.get_rect(
-                    topleft=(self.graveyard_zones[0].x, self.graveyard_zones[0].y)
-                    if card["owner"]=="player" else
-                    (self.graveyard_zones[1].x, self.graveyard_zones[1].y)
-                )
-            elif card["location"] == "banished":
-                rect = surface.get_rect(
-                    topleft=(self.banish_zones[0].x, self.banish_zones[0].y)
-                    if card["owner"]=="player" else
-                    (self.banish_zones[1].x, self.banish_zones[1].y)
-                )
-                # Do NOT rotate here; rotation already handled on move
-            else:
-                # assign a default rect
-                rect = pygame.Rect(0, 0, CARD_WIDTH, CARD_HEIGHT)
+        """Re-place every card, e.g. after the zones moved.  Game moves don't need
+        this: _on_game_event re-places only the groups a move touched."""
+        self.mark_all_dirty()
+        for card in self.cards.values():
+            card["rect"] = self._layout_rect(card)
+            self._index_card(card)
+
+    def _layout_rect(self, card):
+        """Screen rect for a card from its owner, location and zone (hand slot / field zone)."""
+        owner_index = 0 if card["owner"] == "player" else 1
+        if card["location"] == "hand":
+            slots = self.player_hand_slots if card["owner"] == "player" else self.opponent_hand_slots
+            # Cards beyond the 17th have no slot and stack on the last one
+            slot = HAND_SLOTS - 1 if card["zone"] is None else card["zone"]
+            return pygame.Rect(slots[slot], (CARD_WIDTH, CARD_HEIGHT))
+        if card["location"] == "field":
+            zones = self.player_field_zones if card["owner"] == "player" else self.opponent_field_zones
+            return zones[card["zone"]].copy()
+        if card["location"] == "graveyard":
+            return card["surface"].get_rect(topleft=self.graveyard_zones[owner_index].topleft)
+        if card["location"] == "banished":
+            # Do NOT rotate here; rotation already handled on move
+            return card["surface"].get_rect(topleft=self.banish_zones[owner_index].topleft)
+        return pygame.Rect(0, 0, CARD_WIDTH, CARD_HEIGHT)
 
-            card["rect"] = rect
-            card["surface"] = surface
-            card["preview"] = preview
-
-            # Mark as placed only for hand/field cards
-            if card["location"] in ("hand", "field"):
-                card["placed"] = True
-
-            self.card_surfaces.append(surface)
-            self.card_preview_surfaces.append(preview)
-            self.card_rects.append(rect)
-        
-        # Reposition hand cards in order
-        for owner in ("player", "opponent"):
-            hand_slots = self.player_hand_slots if owner=="player" else self.opponent_hand_slots
-            hand_cards = [c for c in self.cards if c["owner"]==owner and c["location"]=="hand"]
-            for i, card in enumerate(hand_cards):
-                card["rect"].topleft = hand_slots[i]
+    # -----------------------------
+    # Dirty-rectangle tracking
+    # -----------------------------
+    def mark_dirty(self, *rects):
+        for rect in rects:
+            if rect is not None:
+                self.dirty_rects.append(pygame.Rect(rect).inflate(DIRTY_MARGIN*2, DIRTY_MARGIN*2))
+
+    def mark_all_dirty(self):
+        self.full_redraw = True
+
+    def _card_draw_rect(self, card, pos=None):
+        """Screen area a card covers (its surface may be rotated relative to its rect)."""
+        if pos is None:
+            pos = card["rect"].topleft
+        rect = pygame.Rect(pos, card["surface"].get_size())
+        return rect.union(pygame.Rect(pos, card["rect"].size))
+
+    def _merge_dirty_rects(self):
+        screen_rect = self.screen.get_rect()
+        merged = []
+        for rect in self.dirty_rects:
+            rect = rect.clip(screen_rect)
+            if rect.width == 0 or rect.height == 0:
+                continue
+            # Fold into any overlapping rect so no pixel is drawn twice
+            i = rect.collidelist(merged)
+            while i != -1:
+                rect.union_ip(merged.pop(i))
+                i = rect.collidelist(merged)
+            merged.append(rect)
+        if len(merged) > MAX_DIRTY_RECTS:
+            merged = [merged[0].unionall(merged[1:])]
+        return merged
 
     # -----------------------------
     # Draw everything
     # -----------------------------
-    def draw_field(self, hover_index=None):
-        self.screen.blit(self.mat_surface, (0,0))
+    def draw_field(self, hover_card=None):
+        """Redraw the regions marked dirty since the last frame and push only those."""
+        if self.full_redraw:
+            regions = [self.screen.get_rect()]
+        elif self.dirty_rects:
+            regions = self._merge_dirty_rects()
+        else:
+            return  # idle table: nothing changed, nothing to draw
+        full = self.full_redraw
+        self.full_redraw = False
+        self.dirty_rects = []
+
+        for region in regions:
+            self.screen.set_clip(region)
+            self._draw_scene(hover_card)
+        self.screen.set_clip(None)
+
+        if full:
+            pygame.display.flip()
+        else:
+            pygame.display.update(regions)
 
-        # Draw player hand slots
+    # -----------------------------
+    # Static background layer (mat + zone and hand slot outlines)
+    # -----------------------------
+    def invalidate_background(self):
+        """Call whenever zones or hand slots move; the next frame rebuilds the layer."""
+        self.background_cache.clear()
+        self.mark_all_dirty()
+
+    def get_background(self):
+        size = self.screen.get_size()
+        background = self.background_cache.get(size)
+        if background is None:
+            background = self._build_background(size)
+            self.background_cache[size] = background
+        return background
+
+    def _build_background(self, size):
+        background = pygame.transform.scale(self.mat_surface, size).convert()
+
+        # Hand slots
         for pos in self.player_hand_slots:
-            pygame.draw.rect(self.screen, (50,50,50), (*pos, CARD_WIDTH, CARD_HEIGHT), 2)
-        # Draw opponent hand slots
+            pygame.draw.rect(background, (50,50,50), (*pos, CARD_WIDTH, CARD_HEIGHT), 2)
         for pos in self.opponent_hand_slots:
-            pygame.draw.rect(self.screen, (50,50,50), (*pos, CARD_WIDTH, CARD_HEIGHT), 2)
+            pygame.draw.rect(background, (50,50,50), (*pos, CARD_WIDTH, CARD_HEIGHT), 2)
 
-        # Draw zones
+        # Zones
         for zone in self.zones:
-            pygame.draw.rect(self.screen, (100,100,100), zone, 2)
+            pygame.draw.rect(background, (100,100,100), zone, 2)
         for gy in self.graveyard_zones:
-            pygame.draw.rect(self.screen, (150,0,0), gy, 2)
+            pygame.draw.rect(background, (150,0,0), gy, 2)
         for bz in self.banish_zones:
-            pygame.draw.rect(self.screen, (0,0,150), bz, 2)
+            pygame.draw.rect(background, (0,0,150), bz, 2)
+        return background
+
+    def _draw_scene(self, hover_card=None):
+        # Mat, zones and hand slots never change during a game: one blit
+        self.screen.blit(self.get_background(), (0,0))
 
         # Highlight dragged over zone
-        if self.dragged_card_uid is not None:
-            for zone in self.zones:
-                if zone.collidepoint(pygame.mouse.get_pos()):
-                    pygame.draw.rect(self.screen, (255,255,0), zone, 3)
+        if self.dragged_card_uid is not None and self.highlight_zone is not None:
+            pygame.draw.rect(self.screen, (255,255,0), self.highlight_zone, 3)
 
         # Draw decks
         # Only show top 5 cards stacked slightly offset
-        for i in range(min(5, len(self.player_deck))):
+        for i in range(min(5, self.state.count("player", "deck"))):
             offset = i * 0.5
             pos = (self.player_deck_pos[0] + offset, self.player_deck_pos[1] - offset)
-            self.screen.blit(self.card_back_surface, pos)
+            self.screen.blit(self.atlas.surface, pos, self.atlas.region("back"))
 
-        for i in range(min(5, len(self.player_extra))):
+        for i in range(min(5, self.state.count("player", "extra"))):
             offset = i * 0.5
             pos = (self.player_extra_deck_pos[0] + offset, self.player_extra_deck_pos[1] - offset)
-            self.screen.blit(self.card_back_surface, pos)
+            self.screen.blit(self.atlas.surface, pos, self.atlas.region("back"))
 
-        for i in range(min(5, len(self.opponent_deck))):
+        for i in range(min(5, self.state.count("opponent", "deck"))):
             offset = i * 0.5
             pos = (self.opponent_deck_pos[0] + offset, self.opponent_deck_pos[1] + offset)
-            self.screen.blit(self.card_back_surface, pos)
+            self.screen.blit(self.atlas.surface, pos, self.atlas.region("back"))
 
-        for i in range(min(5, len(self.opponent_extra))):
+        for i in range(min(5, self.state.count("opponent", "extra"))):
             offset = i * 0.5
             pos = (self.opponent_extra_deck_pos[0] + offset, self.opponent_extra_deck_pos[1] - offset)
-            self.screen.blit(self.card_back_surface, pos)
+            self.screen.blit(self.atlas.surface, pos, self.atlas.region("back"))
 
         # Draw cards (non-dragged)
-        for card in self.cards:
+        for card in self.cards.values():
             if card.get("surface") is None or card.get("rect") is None:
                 continue  # skip cards not fully initialized yet
             if card["uid"] != self.dragged_card_uid:
-                self.screen.blit(card["surface"], card["rect"].topleft)
+                self._blit_card(card, card["rect"].topleft)
 
         # Draw dragged card on top
         if self.dragged_card_uid is not None:
-            card = next((c for c in self.cards if c["uid"] == self.dragged_card_uid), None)
+            card = self.cards.get(self.dragged_card_uid)
             if card is not None and card.get("surface") is not None:
-                self.screen.blit(card["surface"], self.dragged_card_pos)
+                self._blit_card(card, self.dragged_card_pos)
 
         # Card preview
-        if hover_index is not None and hover_index < len(self.cards):
-            preview_surface = self.cards[hover_index].get("preview")
+        if hover_card is not None:
+            preview_surface = hover_card.get("preview")
             if preview_surface:
-                preview_x = 0
-                preview_y = (self.screen_height - PREVIEW_HEIGHT)//2
-                self.screen.blit(preview_surface, (preview_x, preview_y))
+                self.screen.blit(preview_surface, self.preview_rect.topleft)
 
         # Console
         pygame.draw.rect(self.screen, (50,50,50), self.console_rect)
         pygame.draw.rect(self.screen, (200,200,200), self.console_rect, 2)
         line_height = self.console_font.get_height()
         max_history = self.console_rect.height // line_height - 1
-        display_text = self.console_text
-        max_width = self.console_rect.width - 10
-        while self.console_font.size(display_text)[0] > max_width and len(display_text) > 0:
-            display_text = display_text[1:]
-        for i, cmd in enumerate(self.console_history[-max_history:]):
-            txt_surf = self.console_font.render(cmd, True, (0,255,0))
+        visible_history = islice(self.console_history, max(0, len(self.console_history) - max_history), None)
+        for i, cmd in enumerate(visible_history):
+            txt_surf = self.text_cache.render(self.console_font, cmd, (0,255,0))
             self.screen.blit(txt_surf, (self.console_rect.x+5, self.console_rect.y + i*line_height+4))
-        txt_surf = self.console_font.render(display_text, True, (255,255,255))
+        txt_surf = self.text_cache.render(self.console_font, self.console_line.visible, (255,255,255))
         self.screen.blit(txt_surf, (self.console_rect.x+5, self.console_rect.y + self.console_rect.height - line_height))
 
+        # Draw odds
+        if self.draw_odds.queries:
+            pygame.draw.rect(self.screen, (30,30,30), self.odds_rect)
+            for i, (label, p) in enumerate(self.draw_odds.results()[:5]):
+                txt_surf = self.text_cache.render(self.console_font, f"{p:6.1%}  {label}", (255,220,0))
+                self.screen.blit(txt_surf, (self.odds_rect.x+5, self.odds_rect.y + i*line_height+4))
+
         # Life Points
-        lp_font = pygame.font.SysFont(None, 24)
-        player_lp_text = lp_font.render(f"{self.life_points['play']}", True, (255,255,255))
-        opponent_lp_text = lp_font.render(f"{self.life_points['opp']}", True, (255,255,255))
-        self.screen.blit(player_lp_text, (self.screen_width - 700, self.screen_height//2 + 35))
-        self.screen.blit(opponent_lp_text, (self.screen_width - 115, self.screen_height//2 - 50))
+        player_lp_text = self.text_cache.render(self.lp_font, f"{self.state.life_points['player']}", (255,255,255))
+        opponent_lp_text = self.text_cache.render(self.lp_font, f"{self.state.life_points['opponent']}", (255,255,255))
+        self.screen.blit(player_lp_text, self.lp_rects["player"].topleft)
+        self.screen.blit(opponent_lp_text, self.lp_rects["opponent"].topleft)
 
         if self.context_menu:
             rect = self.context_menu["rect"]
@@ -645,27 +975,27 @@ class YGOSimulator:
             pygame.draw.rect(self.screen, (0, 0, 0), rect, 2)     # border
 
             option_height = rect.height // len(self.context_menu["options"])
-            font = pygame.font.SysFont(None, 24)
             for i, option in enumerate(self.context_menu["options"]):
-                text = font.render(option, True, (0, 0, 0))
+                text = self.text_cache.render(self.menu_font, option, (0, 0, 0))
                 self.screen.blit(text, (rect.x + 5, rect.y + i * option_height + 5))
 
-        pygame.display.flip()
-
     # -----------------------------
     # Select cards from current game state (hand + field) using Tkinter list
     # returns list of uids via callback
     # -----------------------------
-    def select_cards_from_game_state(self, callback):
+    def select_cards_from_game_state(self, callback, locations=("hand", "field")):
         # build display strings unique per instance (owner + name + uid)
         available = []
         display_map = {}
-        for c in self.cards:
-            if c["location"] in ("hand", "field"):
-                owner_label = "Player" if c["owner"] == "player" else "Opponent"
-                disp = f"{owner_label}: {c['name']} (uid:{c['uid']})"
-                available.append(disp)
-                display_map[disp] = c["uid"]
+        for owner in ("player", "opponent"):
+            if not self.controls(owner):
+                continue  # a network game only offers this side's cards
+            owner_label = "Player" if owner == "player" else "Opponent"
+            for location in locations:
+                for c in self.cards_at(owner, location):
+                    disp = f"{owner_label}: {c['name']} (uid:{c['uid']})"
+                    available.append(disp)
+                    display_map[disp] = c["uid"]
 
         if not available:
             return  # nothing to select
@@ -689,7 +1019,7 @@ class YGOSimulator:
     # Add cards from main deck to hand using GUI (for addhand play/opp)
     # -----------------------------
     def open_draw_window(self, side):
-        deck_list = self.player_deck if side == "player" else self.opponent_deck
+        deck_list = self.deck_names(side)
         if not deck_list:
             tk.messagebox.showinfo("Empty Deck", f"{side.capitalize()} deck is empty!")
             return
@@ -744,31 +1074,9 @@ class YGOSimulator:
                 self.callback(self.selected_cards)
 
         def add_cards_to_hand(selected_names):
-            hand_slots = [
-                (padding_x + i*(CARD_WIDTH+SPACING), self.screen_height-CARD_HEIGHT if side=="player" else 0)
-                for i in range(17)
-            ]
-
-            occupied_indices = [
-                min(range(17), key=lambda i: abs(card["rect"].x - hand_slots[i][0]))
-                for card in self.cards if card["owner"]==side and card["location"]=="hand"
-            ]
-
+            # The engine gives each card the leftmost free hand slot
             for name in selected_names:
-                if name in deck_list:
-                    deck_list.remove(name)
-                free_index = next((i for i in range(17) if i not in occupied_indices), None)
-                if free_index is None:
-                    free_index = max(occupied_indices)+1 if occupied_indices else 0
-                    if free_index >= 17:
-                        free_index = 16
-                slot_pos = hand_slots[free_index]
-                inst = self._create_card_instance(name, owner=side, location="hand")
-                inst["rect"].topleft = slot_pos
-                self.cards.append(inst)
-                occupied_indices.append(free_index)
-
-            self.load_cards()
+                self.state.take(side, YGOProDeck_Card_Info[name]["id"], "deck", "hand")
 
         root = tk.Tk()
         root.withdraw()
@@ -778,7 +1086,7 @@ class YGOSimulator:
 
     def open_field_window(self, side):
         # --- Select the correct deck ---
-        deck_cards = self.player_deck if side == "player" else self.opponent_deck
+        deck_cards = self.deck_names(side)
         if not deck_cards:
             tk.messagebox.showinfo("Info", f"No cards in {side}'s deck to place.")
             return
@@ -833,31 +1141,17 @@ class YGOSimulator:
         # Callback to place the card on the field
         # -----------------------------
         def place_card_callback(name, slot_num, side):
-            # Determine the correct zones array
-            zones = self.player_field_zones if side == "player" else self.opponent_field_zones
             zone_index = slot_num - 1  # slot_num 1-10 -> index 0-9
+            if not self.state.zones[side].field_free(zone_index):
+                tk.messagebox.showerror("Error", f"Field slot {slot_num} is already occupied.")
+                return
 
-            # Find the card in the deck
-            for idx, card in enumerate(deck_cards):
-                if card == name:
-                    deck_card = deck_cards.pop(idx)
-                    break
-            else:
+            # Take the card out of the deck (the observer creates its view)
+            card = self.state.take(side, YGOProDeck_Card_Info[name]["id"], "deck", "field", zone=zone_index)
+            if card is None:
                 tk.messagebox.showerror("Error", f"Card {name} not found in deck.")
                 return
 
-            # Create the card instance
-            inst = self._create_card_instance(deck_card, owner=side, location="field")
-
-            # Set the card rect to the correct field position
-            target_zone = zones[zone_index]
-            inst["rect"] = pygame.Rect(target_zone.x, target_zone.y, CARD_WIDTH, CARD_HEIGHT)
-            inst["rect"].topleft = (target_zone.x, target_zone.y)
-            inst["placed"] = True
-
-            self.cards.append(inst)
-            self.load_cards()  # updates hover and display
-
         # -----------------------------
         # Launch Tk window
         # -----------------------------
@@ -871,19 +1165,95 @@ class YGOSimulator:
     # Move cards by uid to a new location
     # -----------------------------
     def move_cards_by_uid(self, uids, new_location):
-        uid_set = set(uids)
-        for c in self.cards:
-            if c["uid"] in uid_set:
-                c["location"] = new_location
+        for uid in uids:
+            self.state.move(uid, new_location)
 
-                # Rotate if moving to banished
-                if new_location == "banished":
-                    c["surface"] = pygame.transform.rotate(c["surface_orig"], 90)
-                else:
-                    # Reset to normal for other locations
-                    c["surface"] = c["surface_orig"]
+    # -----------------------------
+    # Add cards back to their owner's deck (top, bottom or shuffled in)
+    # -----------------------------
+    def return_cards_to_deck(self, uids, position="shuffle"):
+        for uid in uids:
+            card = self.state.card(uid)
+            card_type = YGOProDeck_Card_Info[CARD_NAMES_BY_ID[card.card_id]]["type"]
+            location = "extra" if card_type in EXTRA_DECK_TYPES else "deck"
+            self.state.return_to_deck(uid, position, location)
 
-        self.load_cards()
+    # -----------------------------
+    # Draw odds: odds [draws] A | B & 2 of C   /   odds clear
+    # -----------------------------
+    def odds_command(self, args):
+        if args and args[0].lower() == "clear":
+            self.draw_odds.clear()
+            return
+        draws = 1
+        if args and args[0].isdigit():
+            draws, args = int(args[0]), args[1:]
+        spec = " ".join(args)
+        groups, minimums = parse_query(spec)
+        unknown = [name for group in groups for name in group if name not in YGOProDeck_Card_Info]
+        if not args or unknown:
+            print(f"Unknown cards: {', '.join(unknown)}" if unknown else "Usage: odds [draws] A | B & 2 of C")
+            return
+        id_groups = [{YGOProDeck_Card_Info[name]["id"] for name in group} for group in groups]
+        try:
+            self.draw_odds.add_query(f"{spec} in {draws}", id_groups, minimums, draws)
+        except ValueError as e:
+            print(f"Invalid odds query: {e}")
+
+    def save_game(self, name):
+        """Write the table to saves/<name>.ygosave (see savegame.py)."""
+        os.makedirs(SAVE_DIR, exist_ok=True)
+        path = os.path.join(SAVE_DIR, os.path.basename(name) + ".ygosave")
+        try:
+            size = save_game(path, self.state, self.console_history)
+        except OSError as e:
+            print(f"Could not save {path}: {e}")
+            return
+        self.console_history.append(f"saved {path} ({size} bytes)")
+        self.mark_dirty(self.console_rect)
+
+    def poll_network(self):
+        """Apply the other player's moves and show where they are dragging cards."""
+        if self.net.poll() is False:
+            self.console_history.append("Connection to the server lost")
+            self.mark_dirty(self.console_rect)
+            self.net.close()
+            self.net = None
+            return
+        for uid, pos in self.net.remote_drags.items():
+            view = self.cards.get(uid)
+            if view is None:
+                continue
+            if pos is None:  # dropped: back to its place in this screen's layout
+                rect = self._layout_rect(view)
+            else:
+                rect = view["rect"].copy()
+                rect.topleft = (round(pos[0] * self.screen_width), round(pos[1] * self.screen_height))
+            if view["rect"] != rect:
+                self.mark_dirty(self._card_draw_rect(view))
+                view["rect"] = rect
+                self._index_card(view)
+                self.mark_dirty(self._card_draw_rect(view))
+        self.net.remote_drags.clear()
+
+    def undo(self, steps=1):
+        self._step_history(self.history.undo, steps, "undone", "Nothing to undo")
+
+    def redo(self, steps=1):
+        self._step_history(self.history.redo, steps, "redone", "Nothing to redo")
+
+    def _step_history(self, step, steps, done_text, none_text):
+        if self.dragged_card_uid is not None:
+            return  # the dragged card's view is mid-move; finish the drop first
+        if self.net is not None:
+            self.console_history.append("No undo in network games")
+            self.mark_dirty(self.console_rect)
+            return
+        done = 0
+        while done < steps and step():
+            done += 1
+        self.console_history.append(f"{done} step{'s' if done != 1 else ''} {done_text}" if done else none_text)
+        self.mark_dirty(self.console_rect)
 
     # -----------------------------
     # Main loop
@@ -892,32 +1262,45 @@ class YGOSimulator:
         running = True
         clock = pygame.time.Clock()
         while running:
-            hover_index = None
-            mouse_pos = pygame.mouse.get_pos()
-            # find hover index by checking card rects (top-most first)
-            for i in range(len(self.card_rects)-1, -1, -1):
-                if self.card_rects[i].collidepoint(mouse_pos):
-                    hover_index = i
-                    break
+            # Swap in any card images that finished loading since last frame
+            self.image_loader.poll()
+            if self.net is not None:
+                self.poll_network()
+
+            # Topmost card under the mouse (grid lookup, same order as drawing)
+            hover_card = self.card_index.hit(pygame.mouse.get_pos())
+            hover_uid = hover_card["uid"] if hover_card is not None else None
+            if hover_uid != self.hover_uid:
+                self.hover_uid = hover_uid
+                self.mark_dirty(self.preview_rect)
 
-            self.draw_field(hover_index)
+            self.draw_field(hover_card)
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
 
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+                    self.mark_all_dirty()
+
                 elif event.type == pygame.KEYDOWN:
+                    self.mark_dirty(self.console_rect)
                     if event.key == pygame.K_ESCAPE:
                         running = False
+                    elif event.key == pygame.K_z and event.mod & pygame.KMOD_CTRL:
+                        self.undo()
+                    elif event.key == pygame.K_y and event.mod & pygame.KMOD_CTRL:
+                        self.redo()
                     elif event.key == pygame.K_BACKSPACE:
-                        self.console_text = self.console_text[:-1]
+                        self.console_line.backspace()
                     elif event.key == pygame.K_RETURN:
-                        command = self.console_text.strip().split()
+                        command = self.console_line.text.strip().split()
                         if not command:
                             continue
 
                         cmd = command[0].lower()
                         self.console_history.append(cmd)
+                        self.action_log.command(" ".join(command))
                         arg = int(command[1]) if len(command) > 1 and command[1].isdigit() else 1
                         if cmd == "drawplay":
                             self.drawplay(arg)
@@ -927,21 +1310,58 @@ class YGOSimulator:
                             arg = 'player'
                             if command[1] == 'opp':
                                 arg = 'opponent'
-                            self.open_draw_window(arg)
+                            if self._allow(arg):
+                                self.open_draw_window(arg)
+                                self.mark_all_dirty()  # Tk window was on top
                         elif cmd == "field":
                             arg = 'player'
                             if command[1] == 'opp':
                                 arg = 'opponent'
-                            self.open_field_window(arg)
+                            if self._allow(arg):
+                                self.open_field_window(arg)
+                                self.mark_all_dirty()
                         elif cmd in ("gy", "graveyard"):
                             # open selection and move selected uids to graveyard
                             self.select_cards_from_game_state(lambda uids: self.move_cards_by_uid(uids, "graveyard"))
+                            self.mark_all_dirty()
                         elif cmd in ("bz", "banish"):
                             self.select_cards_from_game_state(lambda uids: self.move_cards_by_uid(uids, "banished"))
-                        elif cmd.startswith("lp "):
-                            parts = cmd.split()
-                            if len(parts) == 3:
-                                target, change = parts[1], parts[2]
+                            self.mark_all_dirty()
+                        elif cmd == "deck":
+                            # deck [top|bottom|shuffle]: return selected table cards to their owner's deck
+                            position = command[1].lower() if len(command) > 1 else "shuffle"
+                            if position in DECK_POSITIONS:
+                                self.select_cards_from_game_state(
+                                    lambda uids: self.return_cards_to_deck(uids, position),
+                                    locations=("hand", "field", "graveyard", "banished"))
+                                self.mark_all_dirty()
+                            else:
+                                print("Usage: deck [top|bottom|shuffle]")
+                        elif cmd == "shuffle":
+                            owner = OWNER_ARGS.get(command[1].lower()) if len(command) > 1 else None
+                            if owner is not None:
+                                if self._allow(owner):
+                                    self.state.shuffle(owner)
+                                    self.console_history.append(f"{owner} deck shuffled")
+                            else:
+                                print("Usage: shuffle [play|opp]")
+                        elif cmd == "save":
+                            self.save_game(command[1] if len(command) > 1 else time.strftime("%Y%m%d-%H%M%S"))
+                        elif cmd == "undo":
+                            self.undo(arg)
+                        elif cmd == "redo":
+                            self.redo(arg)
+                        elif cmd == "odds":
+                            self.odds_command(command[1:])
+                            self.mark_dirty(self.odds_rect)
+                        elif cmd == "cache":
+                            stats = surface_cache.stats()
+                            self.console_history.append(
+                                f"surf {stats['entries']} hit {stats['hits']} miss {stats['misses']} "
+                                f"{stats['bytes'] // 1024}KB")
+                        elif cmd == "lp":
+                            if len(command) == 3:
+                                target, change = command[1].lower(), command[2]
                                 if target in ("play", "opp") and (change.startswith("+") or change.startswith("-")):
                                     try:
                                         amount = int(change)
@@ -954,25 +1374,24 @@ class YGOSimulator:
                                 print("Usage: lp [play|opp] [+/-number]")
                         else:
                             print(f"Unknown command: {cmd}")
-                        self.console_text = ""
+                        self.console_line.clear()
                     else:
                         # add typed char
-                        self.console_text += event.unicode
+                        self.console_line.type(event.unicode)
 
                 elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                    for card in reversed(self.cards):  # topmost first
-                        if card["rect"].collidepoint(event.pos):
-                            self.dragged_card_uid = card["uid"]
-                            self.drag_offset = (event.pos[0] - card["rect"].x, event.pos[1] - card["rect"].y)
-                            self.dragged_card_pos = (card["rect"].x, card["rect"].y)
-                            break
+                    card = self.card_index.hit(event.pos)  # topmost first
+                    if card is not None and self.controls(card["owner"]):
+                        self.dragged_card_uid = card["uid"]
+                        self.drag_offset = (event.pos[0] - card["rect"].x, event.pos[1] - card["rect"].y)
+                        self.dragged_card_pos = (card["rect"].x, card["rect"].y)
                     mx, my = event.pos
                     px, py = self.player_deck_pos
-                    if px <= mx <= px + CARD_WIDTH and py <= my <= py + CARD_HEIGHT and self.player_deck:
+                    if px <= mx <= px + CARD_WIDTH and py <= my <= py + CARD_HEIGHT and self.state.count("player", "deck"):
                         self.drawplay(1)
 
                     ox, oy = self.opponent_deck_pos
-                    if ox <= mx <= ox + CARD_WIDTH and oy <= my <= oy + CARD_HEIGHT and self.opponent_deck:
+                    if ox <= mx <= ox + CARD_WIDTH and oy <= my <= oy + CARD_HEIGHT and self.state.count("opponent", "deck"):
                         self.drawopp(1)
                     
                     if self.context_menu:
@@ -986,90 +1405,115 @@ class YGOSimulator:
 
                             if option == "Declare":
                                 self.console_history.append(f"{self.context_menu['card']['name']} declared")
+                                self.mark_dirty(self.console_rect)
                             # either way, close menu after click
-                            self.context_menu = None
+                            self.close_context_menu()
                         else:
                             # click outside menu closes it
-                            self.context_menu = None
+                            self.close_context_menu()
                 
                 elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 3:  # right click
                     mouse_pos = pygame.mouse.get_pos()
-                    for card in reversed(self.cards):  # reversed so topmost card gets priority
-                        if card["rect"].collidepoint(mouse_pos):
-                            self.open_context_menu(card, mouse_pos)
-                            break
+                    card = self.card_index.hit(mouse_pos)  # topmost card gets priority
+                    if card is not None:
+                        self.open_context_menu(card, mouse_pos)
 
                 elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
                     if self.dragged_card_uid is not None:
-                        card = next(c for c in self.cards if c["uid"] == self.dragged_card_uid)
+                        card = self.cards[self.dragged_card_uid]
+                        self.mark_dirty(self._card_draw_rect(card, self.dragged_card_pos), self.highlight_zone)
                         snapped = False
 
-                        # Snap to hand slots if dropped near them
-                        if not snapped:
+                        # A drop on an occupied or foreign field zone sends the card back where it was
+                        target = self._drop_target(card, event.pos)
+                        blocked = target is None and self.drop_index.hit(event.pos) is not None
+
+                        # Snap to the nearest free hand slot (or the card's own slot) if dropped near them
+                        if not snapped and not blocked:
                             slots = self.player_hand_slots if card["owner"]=="player" else self.opponent_hand_slots
+                            free_slots = self.state.zones[card["owner"]].free_hand_slots()
+                            if card["location"] == "hand" and card["zone"] is not None:
+                                free_slots.append(card["zone"])
 
-                            # Only pick free slots
-                            occupied = [c["rect"].topleft for c in self.cards if c["location"]=="hand" and c["owner"]==card["owner"] and c["uid"]!=card["uid"]]
-                            free_slots = [s for s in slots if s not in occupied]
-                            
                             if free_slots:
-                                # Snap to the nearest free slot
-                                nearest_slot = min(free_slots, key=lambda s: (card["rect"].centerx - (s[0]+CARD_WIDTH//2))**2 +
-                                                                        (card["rect"].centery - (s[1]+CARD_HEIGHT//2))**2)
-                                card["rect"].topleft = nearest_slot
-                                card["location"] = "hand"
+                                nearest_slot = min(free_slots, key=lambda i: (card["rect"].centerx - (slots[i][0]+CARD_WIDTH//2))**2 +
+                                                                        (card["rect"].centery - (slots[i][1]+CARD_HEIGHT//2))**2)
+                                location, zone_index = "hand", nearest_slot
                                 snapped = True
 
-                        # Snap to field
-                        for zone in self.zones:
-                            if zone.collidepoint(event.pos):
-                                card["location"] = "field"
-                                card["rect"].topleft = (zone.x, zone.y)
-                                snapped = True
-                                break
-
-                        # When snapping to graveyard
-                        for gy in self.graveyard_zones:
-                            if gy.collidepoint(event.pos):
-                                card["location"] = "graveyard"
-                                card["rect"].topleft = gy.topleft
-                                card["surface"] = card["surface_orig"]  # reset rotation
-                                snapped = True
-                                break
-
-                        # When snapping to banish
-                        for bz in self.banish_zones:
-                            if bz.collidepoint(event.pos):
-                                card["location"] = "banished"
-                                card["rect"].topleft = bz.topleft
-                                card["surface"] = pygame.transform.rotate(card["surface_orig"], 90)
-                                snapped = True
-                                break
+                        # Snap to a free field zone, graveyard or banish zone under the cursor
+                        if target is not None:
+                            location, _, zone_index, _ = target
+                            snapped = True
 
-                        # If moving to a normal zone (hand/field), reset rotation
-                        if snapped and card["location"] != "banished":
-                            card["surface"] = card["surface_orig"]
+                        # The observer rotates for the banish zone and resets rotation everywhere else
+                        if snapped:
+                            self.state.move(card["uid"], location, zone_index)
+                        card["rect"] = self._layout_rect(card)
+                        self._index_card(card)
+                        if self.net is not None:
+                            self.net.release(card["uid"])
 
-                        # Mark as placed manually
-                        card["placed"] = True
                         self.dragged_card_uid = None
+                        self.highlight_zone = None
+                        self.mark_dirty(self._card_draw_rect(card))
 
                 elif event.type == pygame.MOUSEMOTION:
                     if self.dragged_card_uid is not None:
-                        card = next(c for c in self.cards if c["uid"] == self.dragged_card_uid)
+                        card = self.cards[self.dragged_card_uid]
+                        old_rect = self._card_draw_rect(card, self.dragged_card_pos)
                         new_x = event.pos[0] - self.drag_offset[0]
                         new_y = event.pos[1] - self.drag_offset[1]
                         self.dragged_card_pos = (new_x, new_y)
                         card["rect"].topleft = self.dragged_card_pos  # optional live update
+                        self._index_card(card)
+                        self.mark_dirty(old_rect, self._card_draw_rect(card))
+                        if self.net is not None:
+                            self.net.drag(card["uid"], new_x / self.screen_width, new_y / self.screen_height)
+
+                        target = self._drop_target(card, event.pos)
+                        zone = target[1] if target is not None and target[0] == "field" else None
+                        if zone != self.highlight_zone:
+                            self.mark_dirty(self.highlight_zone, zone)
+                            self.highlight_zone = zone
+
+            # Everything this frame's input did is one undo step (a drag ends on release)
+            if self.dragged_card_uid is None:
+                self.history.checkpoint()
 
             clock.tick(30)
 
+        self.save_game(AUTOSAVE_NAME)
+        self.image_loader.shutdown()
+        self.action_log.close()
+        if self.net is not None:
+            self.net.close()
         pygame.quit()
 
 from deckbuilder import build_deck_interactively
 from sim import YGOSimulator  # your simulator class
 
 def main():
+    parser = argparse.ArgumentParser(description="Yu-Gi-Oh! dueling simulator")
+    parser.add_argument("--resume", help="continue a game saved with the save command (or on quit)")
+    parser.add_argument("--connect", metavar="HOST:PORT", help="join a game hosted with netplay.py serve")
+    parser.add_argument("--side", choices=OWNER_ARGS, default="play", help="side to play when connecting")
+    args = parser.parse_args()
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        client = NetClient(OWNER_ARGS[args.side])
+        try:
+            client.start(host or "127.0.0.1", int(port))
+        except (OSError, ValueError, ConnectionError) as e:
+            raise SystemExit(f"Could not connect to {args.connect}: {e}")
+        sim = YGOSimulator(None, None, net=client)
+        sim.run()
+        return
+    if args.resume:
+        sim = YGOSimulator(None, None, resume=args.resume)
+        sim.run()
+        return
+
     # Build/load decks
     print("Select Player Deck")
     player_deck_data = build_deck_interactively()
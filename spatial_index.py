@@ -0,0 +1,119 @@
+from collections import defaultdict
+
+import pygame
+
+GRID_CELL_SIZE = 128
+
+
+# -----------------------------
+# Uniform-grid spatial index for hit tests
+# -----------------------------
+class SpatialGrid:
+    """Maps screen cells to the items whose rects overlap them.
+
+    Every item has a z value; ``hit`` returns the topmost item under a point,
+    matching draw order (items drawn later get a higher z).  A point lookup only
+    looks at the handful of items sharing its cell.
+    """
+
+    def __init__(self, cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells = defaultdict(dict)  # (cx, cy) -> {key: None}, used as an ordered set
+        self._rects = {}                 # key -> Rect (copy of the indexed rect)
+        self._values = {}                # key -> payload returned by hit()
+        self._z = {}                     # key -> draw order
+        self._next_z = 0
+
+    def __contains__(self, key):
+        return key in self._rects
+
+    def __len__(self):
+        return len(self._rects)
+
+    def _cells_for(self, rect):
+        cs = self.cell_size
+        x0, y0 = rect.left // cs, rect.top // cs
+        x1, y1 = (rect.right - 1) // cs, (rect.bottom - 1) // cs
+        return [(cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1)]
+
+    def insert(self, key, rect, value=None, z=None):
+        """Index key at rect; without z it goes on top of everything indexed so far."""
+        if key in self._rects:
+            self.remove(key)
+        if z is None:
+            z = self._next_z
+        self._next_z = max(self._next_z, z + 1)
+        rect = pygame.Rect(rect)
+        self._rects[key] = rect
+        self._values[key] = key if value is None else value
+        self._z[key] = z
+        for cell in self._cells_for(rect):
+            self._cells[cell][key] = None
+
+    def update(self, key, rect):
+        """Move an indexed key to rect, keeping its z; inserts it if missing."""
+        old = self._rects.get(key)
+        if old is None:
+            self.insert(key, rect)
+            return
+        if old == rect:
+            return
+        rect = pygame.Rect(rect)
+        old_cells = self._cells_for(old)
+        new_cells = self._cells_for(rect)
+        if old_cells != new_cells:
+            for cell in old_cells:
+                members = self._cells[cell]
+                members.pop(key, None)
+                if not members:
+                    del self._cells[cell]
+            for cell in new_cells:
+                self._cells[cell][key] = None
+        self._rects[key] = rect
+
+    def raise_to_top(self, key):
+        self._z[key] = self._next_z
+        self._next_z += 1
+
+    def remove(self, key):
+        rect = self._rects.pop(key, None)
+        if rect is None:
+            return
+        for cell in self._cells_for(rect):
+            members = self._cells.get(cell)
+            if members is not None:
+                members.pop(key, None)
+                if not members:
+                    del self._cells[cell]
+        del self._values[key]
+        del self._z[key]
+
+    def clear(self):
+        self._cells.clear()
+        self._rects.clear()
+        self._values.clear()
+        self._z.clear()
+        self._next_z = 0
+
+    def hits(self, pos):
+        """Values of every item containing pos, topmost first."""
+        cs = self.cell_size
+        members = self._cells.get((pos[0] // cs, pos[1] // cs))
+        if not members:
+            return []
+        keys = [k for k in members if self._rects[k].collidepoint(pos)]
+        keys.sort(key=self._z.__getitem__, reverse=True)
+        return [self._values[k] for k in keys]
+
+    def hit(self, pos):
+        """Value of the topmost item containing pos, or None."""
+        cs = self.cell_size
+        members = self._cells.get((pos[0] // cs, pos[1] // cs))
+        if not members:
+            return None
+        best_key, best_z = None, -1
+        for key in members:
+            z = self._z[key]
+            if z > best_z and self._rects[key].collidepoint(pos):
+                best_key, best_z = key, z
+        return None if best_key is None else self._values[best_key]
@@ -0,0 +1,550 @@
+"""Read-only spectators for a live duel: one asyncio server fans the table out to many viewers.
+
+    python spectator.py serve decks/a.json decks/b.json --port 7777 --watch-port 7778
+    python spectator.py watch 127.0.0.1:7778
+    python spectator.py bench --clients 500   # local viewers: broadcast latency and memory
+
+Players connect to the netplay server as usual (python sim.py --connect);
+viewers connect to a watch port and only ever receive.  Each watch port
+serves one audience, which decides what its viewers may see: deck, extra
+and side deck piles are always just card counts (no uids, so not even a
+card put back and shuffled can be followed), and hands are counts too
+unless the audience is that player's (or the caster's, who sees both).
+
+A SpectatorHub watches the GameState, turns every change into records
+for each audience that has viewers and sends everything from one event
+loop turn as one frame, encoded once and shared by every viewer of that
+audience.  Each viewer has a bounded queue; a viewer that falls so far
+behind that its queue fills loses the backlog and gets a fresh snapshot
+of the table instead, then carries on from there.  Joining works the
+same way, so memory per viewer stays at most a queue of shared frames
+plus a capped socket buffer however slow it is.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import struct
+import time
+import tracemalloc
+from array import array
+
+from action_log import LOCATION_CODES, OWNER_CODES, TOP_FLAG
+from card_db import card_db
+from engine import HIDDEN_LOCATIONS, LOCATIONS, OWNERS
+from history import PILE_KEYS
+from netplay import DEFAULT_PORT, FRAME, DuelServer, _no_delay, frame, load_deck_ids, new_duel, read_frame
+
+DEFAULT_WATCH_PORT = DEFAULT_PORT + 1
+QUEUE_SIZE = 64             # frames a viewer may fall behind before it is sent a snapshot instead
+WRITE_BUFFER = 64 * 1024    # bytes buffered per viewer socket before its queue starts to fill
+BACKLOG = 1024              # pending connections, for the rush of viewers when a stream starts
+
+AUDIENCES = {               # audience -> whose hands it sees
+    "public": (),
+    "player": ("player",),
+    "opponent": ("opponent",),
+    "caster": OWNERS,
+}
+
+MSG_SNAPSHOT, MSG_UPDATE = 1, 2
+SNAPSHOT = struct.Struct("<BIii")   # type, seq, life points of each owner; then one pile per PILE_KEYS entry
+PILE_HEAD = struct.Struct("<BH")    # face up, cards; face-up piles list them
+PILE_CARD = struct.Struct("<HIb")   # uid, card id, zone
+UPDATE = struct.Struct("<BIH")      # type, seq, records; records follow
+
+OP_SHOW, OP_HIDE, OP_PILE, OP_LP = range(1, 5)
+SHOW = struct.Struct("<BHIBBbB")    # op, uid, card id, owner, location | TOP_FLAG, zone, from (NEW_CARD: created)
+HIDE = struct.Struct("<BHBBB")      # op, uid (NO_UID if it came from a hidden pile), owner, from, location
+PILE = struct.Struct("<BBB")        # op, owner, location; PILE_HEAD and cards follow
+LP = struct.Struct("<BBi")          # op, owner, life points
+NEW_CARD = 0xFF
+NO_UID = 0xFFFF
+
+
+def sees(hands, owner, location):
+    """Whether an audience seeing hands' hands sees the cards of pile (owner, location)."""
+    if location in HIDDEN_LOCATIONS:
+        return False
+    return location != "hand" or owner in hands
+
+
+def encode_pile(state, hands, owner, location):
+    pile = state.pile(owner, location)
+    if not sees(hands, owner, location):
+        return PILE_HEAD.pack(0, len(pile))
+    return PILE_HEAD.pack(1, len(pile)) + b"".join(
+        PILE_CARD.pack(card.uid, card.card_id, -1 if card.zone is None else card.zone) for card in pile)
+
+
+# -----------------------------
+# Server
+# -----------------------------
+class Viewer:
+    __slots__ = ("audience", "writer", "queue", "lagging")
+
+    def __init__(self, audience, writer, queue_size):
+        self.audience = audience
+        self.writer = writer
+        self.queue = asyncio.Queue(queue_size)
+        self.lagging = True          # owed a snapshot (None in the queue) and skipped by broadcasts
+        self.queue.put_nowait(None)
+
+
+class SpectatorHub:
+    """Sends a GameState's changes to read-only viewers, filtered per audience.
+
+    The state must only change on the hub's event loop (as it does under a
+    DuelServer running there).
+    """
+
+    def __init__(self, state, queue_size=QUEUE_SIZE, write_buffer=WRITE_BUFFER):
+        self.state = state
+        self.queue_size = queue_size
+        self.write_buffer = write_buffer
+        self.seq = 0                 # frames broadcast so far (to any audience)
+        self.viewers = {audience: set() for audience in AUDIENCES}
+        self.snapshots_sent = 0      # joins plus catch-ups
+        self.catch_ups = 0           # viewers that fell behind and got a snapshot instead
+        self._pending = {audience: [] for audience in AUDIENCES}
+        self._flush_scheduled = False
+        self._snapshots = {}         # audience -> snapshot frame of the current state
+        self._servers = []
+        self._handlers = set()
+        state.add_observer(self._on_game_event)
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_WATCH_PORT, audience="public"):
+        """Accept viewers of one audience on host:port; returns the bound port."""
+        if audience not in AUDIENCES:
+            raise ValueError(f"unknown audience {audience!r}")
+        server = await asyncio.start_server(lambda r, w: self._handle(r, w, audience), host, port, backlog=BACKLOG)
+        self._servers.append(server)
+        return server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        for viewers in self.viewers.values():
+            for viewer in viewers:
+                viewer.writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+
+    def viewer_count(self):
+        return sum(len(viewers) for viewers in self.viewers.values())
+
+    # Viewers
+    async def _handle(self, reader, writer, audience):
+        _no_delay(writer)
+        # Cap what the kernel and the transport hold for a viewer; past that its queue fills
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.write_buffer)
+        writer.transport.set_write_buffer_limits(high=self.write_buffer)
+        viewer = Viewer(audience, writer, self.queue_size)
+        self.viewers[audience].add(viewer)
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        sender = asyncio.create_task(self._send(viewer))
+        try:
+            while await reader.read(1024):
+                pass  # viewers have nothing to say; this just waits for them to leave
+        except ConnectionError:
+            pass
+        finally:
+            self.viewers[audience].discard(viewer)
+            self._handlers.discard(handler)
+            sender.cancel()
+            writer.close()
+
+    async def _send(self, viewer):
+        try:
+            while True:
+                message = await viewer.queue.get()
+                if message is None:
+                    message = self.snapshot_frame(viewer.audience)
+                    viewer.lagging = False  # everything broadcast from here on follows the snapshot
+                    self.snapshots_sent += 1
+                viewer.writer.write(message)
+                await viewer.writer.drain()
+        except ConnectionError:
+            pass
+
+    def snapshot_frame(self, audience):
+        self._flush()  # so the snapshot's seq covers every change already in the state
+        message = self._snapshots.get(audience)
+        if message is None:
+            hands = AUDIENCES[audience]
+            lp = self.state.life_points
+            parts = [SNAPSHOT.pack(MSG_SNAPSHOT, self.seq, lp["player"], lp["opponent"])]
+            for owner, location in PILE_KEYS:
+                parts.append(encode_pile(self.state, hands, owner, location))
+            message = self._snapshots[audience] = frame(*parts)
+        return message
+
+    # Changes
+    def _on_game_event(self, event, *args):
+        self._snapshots.clear()
+        for audience, viewers in self.viewers.items():
+            if viewers:
+                self._pending[audience].extend(self._records(AUDIENCES[audience], event, args))
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+
+    def _records(self, hands, event, args):
+        state = self.state
+        if event in ("move", "create"):
+            card = args[0]
+            if event == "move":
+                source = args[1]
+                was_seen = sees(hands, card.owner, source)
+                source = LOCATION_CODES[source]
+            else:
+                source, was_seen = NEW_CARD, False
+            if not sees(hands, card.owner, card.location):
+                return [HIDE.pack(OP_HIDE, card.uid if was_seen else NO_UID, OWNER_CODES[card.owner],
+                                  source, LOCATION_CODES[card.location])]
+            flags = LOCATION_CODES[card.location]
+            pile = state.pile(card.owner, card.location)
+            if len(pile) > 1 and next(iter(pile)) is card:
+                flags |= TOP_FLAG
+            return [SHOW.pack(OP_SHOW, card.uid, card.card_id, OWNER_CODES[card.owner], flags,
+                              -1 if card.zone is None else card.zone, source)]
+        if event == "shuffle":
+            owner, location, _ = args  # the seed would give away the new deck order
+            if not sees(hands, owner, location):
+                return []
+            return [PILE.pack(OP_PILE, OWNER_CODES[owner], LOCATION_CODES[location])
+                    + encode_pile(state, hands, owner, location)]
+        if event == "lp":
+            owner, _, new = args
+            return [LP.pack(OP_LP, OWNER_CODES[owner], new)]
+        if event == "restore":
+            records = [PILE.pack(OP_PILE, OWNER_CODES[owner], LOCATION_CODES[location])
+                       + encode_pile(state, hands, owner, location) for owner, location in PILE_KEYS]
+            records.extend(LP.pack(OP_LP, OWNER_CODES[owner], state.life_points[owner]) for owner in OWNERS)
+            return records
+        return []
+
+    def _flush(self):
+        self._flush_scheduled = False
+        if not any(self._pending.values()):
+            return
+        self.seq += 1
+        for audience, records in self._pending.items():
+            if not records:
+                continue
+            message = frame(UPDATE.pack(MSG_UPDATE, self.seq, len(records)), *records)
+            self._pending[audience] = []
+            for viewer in self.viewers[audience]:
+                if viewer.lagging:
+                    continue  # its snapshot will include this
+                transport = viewer.writer.transport
+                if viewer.queue.empty() and transport.get_write_buffer_size() < self.write_buffer:
+                    transport.write(message)  # keeping up: no need to wake its sender
+                    continue
+                try:
+                    viewer.queue.put_nowait(message)
+                except asyncio.QueueFull:
+                    while not viewer.queue.empty():
+                        viewer.queue.get_nowait()
+                    viewer.queue.put_nowait(None)
+                    viewer.lagging = True
+                    self.catch_ups += 1
+
+
+# -----------------------------
+# Viewer side
+# -----------------------------
+class SpectatorView:
+    """What one viewer knows of the table: face-up piles card by card, the rest as counts."""
+
+    def __init__(self):
+        self.seq = 0
+        self.life_points = {}
+        self.piles = {}   # (owner, location) -> {uid: (card id, zone)} in pile order, or a count
+
+    def apply(self, payload):
+        """Apply one frame from the hub."""
+        if payload[0] == MSG_SNAPSHOT:
+            _, self.seq, player_lp, opponent_lp = SNAPSHOT.unpack_from(payload)
+            self.life_points = {"player": player_lp, "opponent": opponent_lp}
+            offset = SNAPSHOT.size
+            for key in PILE_KEYS:
+                offset = self._read_pile(key, payload, offset)
+            return
+        _, self.seq, count = UPDATE.unpack_from(payload)
+        offset = UPDATE.size
+        for _ in range(count):
+            op = payload[offset]
+            if op == OP_SHOW:
+                _, uid, card_id, owner, flags, zone, source = SHOW.unpack_from(payload, offset)
+                offset += SHOW.size
+                owner = OWNERS[owner]
+                self._take(owner, source, uid)
+                pile = self.piles[(owner, LOCATIONS[flags & ~TOP_FLAG])]
+                entry = (card_id, None if zone < 0 else zone)
+                if flags & TOP_FLAG:
+                    self.piles[(owner, LOCATIONS[flags & ~TOP_FLAG])] = {uid: entry, **pile}
+                else:
+                    pile[uid] = entry
+            elif op == OP_HIDE:
+                _, uid, owner, source, location = HIDE.unpack_from(payload, offset)
+                offset += HIDE.size
+                owner = OWNERS[owner]
+                self._take(owner, source, uid)
+                self.piles[(owner, LOCATIONS[location])] += 1
+            elif op == OP_PILE:
+                _, owner, location = PILE.unpack_from(payload, offset)
+                offset = self._read_pile((OWNERS[owner], LOCATIONS[location]), payload, offset + PILE.size)
+            elif op == OP_LP:
+                _, owner, life_points = LP.unpack_from(payload, offset)
+                offset += LP.size
+                self.life_points[OWNERS[owner]] = life_points
+            else:
+                raise ValueError(f"unknown spectator record {op}")
+
+    def _take(self, owner, source, uid):
+        if source == NEW_CARD:
+            return
+        key = (owner, LOCATIONS[source])
+        if isinstance(self.piles[key], dict):
+            del self.piles[key][uid]
+        else:
+            self.piles[key] -= 1
+
+    def _read_pile(self, key, data, offset):
+        face_up, count = PILE_HEAD.unpack_from(data, offset)
+        offset += PILE_HEAD.size
+        if not face_up:
+            self.piles[key] = count
+            return offset
+        pile = self.piles[key] = {}
+        for _ in range(count):
+            uid, card_id, zone = PILE_CARD.unpack_from(data, offset)
+            offset += PILE_CARD.size
+            pile[uid] = (card_id, None if zone < 0 else zone)
+        return offset
+
+    def summary(self, names=None):
+        names = names or {}
+        lines = [f"[seq {self.seq}]"]
+        for owner in OWNERS:
+            counts = ", ".join(f"{location} {len(self.piles[(owner, location)])}"
+                               if isinstance(self.piles[(owner, location)], dict)
+                               else f"{location} {self.piles[(owner, location)]}"
+                               for location in ("deck", "hand", "graveyard", "banished"))
+            field = ", ".join(names.get(card_id, str(card_id)) for card_id, _ in self.piles[(owner, "field")].values())
+            lines.append(f"  {owner}: {self.life_points[owner]} LP, {counts}; field: {field or '-'}")
+            hand = self.piles[(owner, "hand")]
+            if isinstance(hand, dict):
+                lines.append(f"    hand: {', '.join(names.get(card_id, str(card_id)) for card_id, _ in hand.values()) or '-'}")
+        return "\n".join(lines)
+
+
+# -----------------------------
+# CLI: serve a duel with watch ports, watch one, or benchmark many viewers
+# -----------------------------
+def load_card_names():
+    try:
+        return card_db.names_by_id
+    except (OSError, ValueError, KeyError):
+        return {}  # ids will do
+
+
+async def serve(args):
+    try:
+        decks = [load_deck_ids(path) for path in (args.player_deck, args.opponent_deck)]
+    except (OSError, KeyError, ValueError) as e:
+        raise SystemExit(f"[!] Could not load decks: {e}")
+    duel = DuelServer(new_duel(*decks, seed=args.seed))
+    hub = SpectatorHub(duel.state)
+    port = await duel.start(args.host, args.port)
+    print(f"[*] Players: python sim.py --connect HOST:{port} --side play|opp")
+    for audience, watch_port in (("public", args.watch_port), ("caster", args.caster_port)):
+        if watch_port is not None:
+            watch_port = await hub.start(args.host, watch_port, audience)
+            print(f"[*] {audience.capitalize()} viewers: python spectator.py watch HOST:{watch_port}")
+    await asyncio.Event().wait()
+
+
+async def watch(args):
+    host, _, port = args.address.rpartition(":")
+    try:
+        reader, writer = await asyncio.open_connection(host or "127.0.0.1", int(port))
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"[!] Could not connect to {args.address}: {e}")
+    names = load_card_names()
+    view = SpectatorView()
+    try:
+        while True:
+            view.apply(await read_frame(reader))
+            print(view.summary(names))
+    except (asyncio.IncompleteReadError, ConnectionError):
+        print("[*] The server closed the stream")
+    finally:
+        writer.close()
+
+
+LATENCY_BUCKET = 1e-4  # histogram resolution in seconds
+LATENCY_BUCKETS = 1000
+
+
+def percentile(histogram, fraction):
+    target = fraction * sum(histogram)
+    seen = 0
+    for bucket, count in enumerate(histogram):
+        seen += count
+        if seen >= target:
+            return (bucket + 1) * LATENCY_BUCKET
+    return LATENCY_BUCKETS * LATENCY_BUCKET
+
+
+async def bench_viewer(port, view, sent_at, histogram, stall=None):
+    """One local viewer: reads frames into view and records each update's delay since its action.
+
+    A viewer given a stall event stops reading while it is set (and is left out of the latencies).
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if stall is not None:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)  # before connecting, so the window stays small
+    sock.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(sock, ("127.0.0.1", port))
+    # A stalled viewer must stop taking data off the socket too, not just stop looking at it
+    reader, writer = await asyncio.open_connection(sock=sock, limit=1024 if stall is not None else 2 ** 16)
+    try:
+        while True:
+            payload = await read_frame(reader)
+            view.apply(payload)
+            if stall is None and payload[0] == MSG_UPDATE and view.seq in sent_at:
+                delay = time.perf_counter() - sent_at[view.seq]
+                histogram[min(int(delay / LATENCY_BUCKET), LATENCY_BUCKETS - 1)] += 1
+            while stall is not None and stall.is_set():
+                await asyncio.sleep(0.01)
+    except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+def bench_action(state, rng):
+    """One random table change of the kind a duel makes."""
+    owner = rng.choice(OWNERS)
+    hand, field, graveyard = (state.pile(owner, location) for location in ("hand", "field", "graveyard"))
+    roll = rng.random()
+    if roll < 0.3 and state.count(owner, "deck"):
+        state.draw(owner)
+    elif roll < 0.55 and len(hand) and state.zones[owner].free_field_zones():
+        state.move(rng.choice(list(hand)).uid, "field")
+    elif roll < 0.75 and len(field):
+        state.move(rng.choice(list(field)).uid, "graveyard")
+    elif roll < 0.85 and len(graveyard):
+        for card in list(graveyard):
+            state.move(card.uid, "deck")
+        state.shuffle(owner)
+    elif roll < 0.9 and len(hand):
+        state.move(rng.choice(list(hand)).uid, "deck", top=True)
+    else:
+        state.adjust_life_points(owner, -rng.randrange(100, 1000, 100))
+
+
+async def bench(args):
+    deck = ([1000 + i % 14 for i in range(40)], [2000, 2001], [3000])
+    state = new_duel(deck, deck, seed=args.seed)
+    hub = SpectatorHub(state, write_buffer=args.write_buffer)
+    ports = {audience: await hub.start("127.0.0.1", 0, audience) for audience in AUDIENCES}
+    audiences = ["player", "opponent", "caster"] + ["public"] * (args.clients - 3)
+    sent_at = {}
+    histogram = array("I", [0]) * LATENCY_BUCKETS
+    stall = asyncio.Event()
+    views = [SpectatorView() for _ in audiences]
+    tasks = [asyncio.create_task(bench_viewer(ports[audience], view, sent_at, histogram,
+                                              stall if i >= len(views) - args.slow else None))
+             for i, (audience, view) in enumerate(zip(audiences, views))]
+    while hub.snapshots_sent < len(views):
+        await asyncio.sleep(0.01)
+    print(f"[*] {len(views)} viewers joined ({args.slow} of them slow readers with a 4 KiB receive buffer)")
+
+    rng = random.Random(args.seed)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    checkpoints = {args.actions * i // 4 for i in range(1, 5)}
+    start = time.perf_counter()
+    for i in range(1, args.actions + 1):
+        if i == args.actions // 5:
+            stall.set()       # the slow viewers stop reading ...
+        elif i == 4 * args.actions // 5:
+            stall.clear()     # ... and pick up again later
+        bench_action(state, rng)
+        sent_at[hub.seq + 1] = time.perf_counter()
+        await asyncio.sleep(args.interval)
+        if len(sent_at) > 256:
+            sent_at.pop(next(iter(sent_at)))
+        if i in checkpoints:
+            current, peak = tracemalloc.get_traced_memory()
+            print(f"[*] after {i:>5,} actions: {(current - baseline) / 1024:8.1f} KiB above the start "
+                  f"(peak {(peak - baseline) / 1024:.1f} KiB), {hub.catch_ups} catch-ups")
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+
+    # A last visible change so every viewer ends on the same seq, then compare every view with the table
+    state.adjust_life_points("player", -100)
+    final = hub.seq + 1
+    deadline = time.perf_counter() + 10
+    while any(view.seq < final for view in views) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    expected = {}
+    for audience in AUDIENCES:
+        expected[audience] = SpectatorView()
+        expected[audience].apply(hub.snapshot_frame(audience)[FRAME.size:])
+    matching = sum(view.piles == expected[audience].piles and view.life_points == expected[audience].life_points
+                   for view, audience in zip(views, audiences))
+    public = expected["public"].piles
+    leaks = sum(isinstance(public[(owner, location)], dict)
+                for owner in OWNERS for location in ("deck", "extra", "side", "hand"))
+
+    print(f"[*] {args.actions:,} actions in {elapsed:.1f} s, {hub.seq:,} broadcasts to {len(views)} viewers")
+    print(f"[*] Action-to-viewer latency: p50 {percentile(histogram, 0.5) * 1e3:.1f} ms, "
+          f"p99 {percentile(histogram, 0.99) * 1e3:.1f} ms over {sum(histogram):,} deliveries "
+          f"(everything in one process on {os.cpu_count()} CPU(s))")
+    print(f"[*] Slow viewers caught up by snapshot {hub.catch_ups} times; "
+          f"views matching the table: {matching}/{len(views)}; hidden piles shown to the public: {leaks}")
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks)
+    await hub.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read-only spectators for networked duels.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="host a duel with watch ports")
+    serve_parser.add_argument("player_deck")
+    serve_parser.add_argument("opponent_deck")
+    serve_parser.add_argument("--host", default="0.0.0.0")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port for the two players")
+    serve_parser.add_argument("--watch-port", type=int, default=DEFAULT_WATCH_PORT, help="port for public viewers")
+    serve_parser.add_argument("--caster-port", type=int, help="port for viewers who see both hands (off by default)")
+    serve_parser.add_argument("--seed", type=int)
+    watch_parser = commands.add_parser("watch", help="print a live duel as it happens")
+    watch_parser.add_argument("address", metavar="HOST:PORT")
+    bench_parser = commands.add_parser("bench", help="many local viewers of one table")
+    bench_parser.add_argument("--clients", type=int, default=500)
+    bench_parser.add_argument("--slow", type=int, default=10, help="viewers that stop reading for a while")
+    bench_parser.add_argument("--actions", type=int, default=1500)
+    bench_parser.add_argument("--interval", type=float, default=0.05, help="seconds between actions")
+    bench_parser.add_argument("--write-buffer", type=int, default=4096,
+                              help="per-viewer socket buffer; small so the slow viewers overflow during the run")
+    bench_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    try:
+        asyncio.run({"serve": serve, "watch": watch, "bench": bench}[args.command](args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import threading
+from collections import OrderedDict
+
+SURFACE_CACHE_BUDGET_BYTES = 256 * 1024 * 1024
+
+
+# -----------------------------
+# Process-wide surface cache
+# -----------------------------
+class SurfaceCache:
+    """Bounded LRU of pygame surfaces keyed by (card_id, width, height, variant).
+
+    Card instances hold references to the cached surfaces instead of their own
+    copies, so every "Pot of Greed" on the table shares one thumbnail and one
+    preview.  Evicting an entry only drops the cache's reference; instances that
+    still use the surface keep it alive.
+    """
+
+    def __init__(self, budget_bytes=SURFACE_CACHE_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._entries = OrderedDict()  # key -> (surface, nbytes), oldest first
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def surface_bytes(surface):
+        return surface.get_pitch() * surface.get_height()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, surface):
+        nbytes = self.surface_bytes(surface)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (surface, nbytes)
+            self.bytes += nbytes
+            while self.bytes > self.budget_bytes and len(self._entries) > 1:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.bytes -= evicted_bytes
+                self.evictions += 1
+        return surface
+
+    def get_or_create(self, key, factory):
+        surface = self.get(key)
+        if surface is None:
+            surface = self.put(key, factory())
+        return surface
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+surface_cache = SurfaceCache()
@@ -0,0 +1,264 @@
+"""Many headless duels in one process, sharing the card data and card images.
+
+    python table_manager.py serve pairings.json --port 7800 --watch --boards boards
+    python table_manager.py bench --tables 64 --deck decks/goat.json
+
+pairings.json lists the tables to open, each a pair of deck JSONs:
+
+    [{"player": "decks/a.json", "opponent": "decks/b.json"}, ...]
+
+Every table is a netplay DuelServer on its own port (players connect with
+python sim.py --connect HOST:PORT --side play|opp), optionally with a
+public spectator port next to it.  A table holds only its GameState and
+its connections: card names and stats come from the process-wide card_db,
+and the board pictures written with --boards are built from thumbnails in
+the process-wide surface_cache (filled from the image archive or the
+image cache), so a card that appears on forty tables is decoded once.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import time
+import tracemalloc
+
+import pygame
+
+from card_db import card_db
+from engine import FIELD_ZONES, OWNERS
+from image_archive import THUMB_SIZE, open_default_archive
+from image_cache import get_card_image_bytes
+from image_pipeline import decode_card_surfaces
+from netplay import DuelServer, load_deck_ids, new_duel
+from spectator import SpectatorHub, bench_action
+from surface_cache import surface_cache
+
+DEFAULT_PORT = 7800
+BOARD_GAP = 4
+BOARD_BACKGROUND = (20, 60, 30)
+EMPTY_ZONE = (40, 90, 50)
+BOARD_INTERVAL = 5.0  # seconds between board pictures
+
+
+# -----------------------------
+# Tables
+# -----------------------------
+class Table:
+    """One headless duel: its server, an optional spectator hub and their ports."""
+    __slots__ = ("table_id", "duel", "hub", "port", "watch_port")
+
+    def __init__(self, table_id, duel, port, hub=None, watch_port=None):
+        self.table_id = table_id
+        self.duel = duel
+        self.port = port
+        self.hub = hub
+        self.watch_port = watch_port
+
+    @property
+    def state(self):
+        return self.duel.state
+
+
+class TableManager:
+    """Opens, renders and closes tables on one event loop."""
+
+    def __init__(self, host="127.0.0.1"):
+        self.host = host
+        self.tables = {}   # table id -> Table
+        self._next_id = 1
+        self.image_archive = open_default_archive()
+
+    async def open_table(self, player_deck, opponent_deck, seed=None, port=0, watch_port=None):
+        """Start a duel between two (main, extra, side) card id lists; watch_port adds spectators."""
+        duel = DuelServer(new_duel(player_deck, opponent_deck, seed))
+        hub = SpectatorHub(duel.state) if watch_port is not None else None
+        port = await duel.start(self.host, port)
+        if hub is not None:
+            watch_port = await hub.start(self.host, watch_port)
+        table = Table(self._next_id, duel, port, hub, watch_port)
+        self.tables[table.table_id] = table
+        self._next_id += 1
+        return table
+
+    async def close_table(self, table_id):
+        table = self.tables.pop(table_id)
+        if table.hub is not None:
+            await table.hub.close()
+        await table.duel.close()
+
+    async def close(self):
+        for table_id in list(self.tables):
+            await self.close_table(table_id)
+
+    # Board pictures
+    def _thumbnail(self, card_id):
+        """The shared thumbnail for card_id (blocking on a cache miss), or None if there is no image."""
+        key = (card_id, THUMB_SIZE[0], THUMB_SIZE[1], "face")
+        surface = surface_cache.get(key)
+        if surface is None and self.image_archive is not None and self.image_archive.thumb_size == THUMB_SIZE:
+            surfaces = self.image_archive.surfaces(card_id)
+            if surfaces is not None:
+                surface = surface_cache.put(key, surfaces[0])
+        if surface is None:
+            try:
+                data = get_card_image_bytes(card_id)
+            except Exception as e:
+                print(f"[!] No image for card {card_id}: {e}")
+                return None
+            surface = surface_cache.put(key, decode_card_surfaces(data, [THUMB_SIZE])[0])
+        return surface
+
+    async def render(self, table_id):
+        """A picture of a table's field and graveyards (opponent on top), as a pygame Surface."""
+        state = self.tables[table_id].state
+        columns = FIELD_ZONES // 2 + 1  # five zones and the graveyard
+        cards = {}                      # (row, column) -> card id
+        for side, owner in enumerate(reversed(OWNERS)):
+            for card in state.pile(owner, "field"):
+                row = card.zone // 5 if owner == "player" else 1 - card.zone // 5
+                cards[(2 * side + row, card.zone % 5)] = card.card_id
+            top = state.pile(owner, "graveyard").last()
+            if top is not None:
+                cards[(2 * side + (1 if owner == "player" else 0), columns - 1)] = top.card_id
+
+        # Fetch and decode any card not in the shared cache off the event loop
+        thumbnails = {card_id: surface_cache.get((card_id, THUMB_SIZE[0], THUMB_SIZE[1], "face"))
+                      for card_id in set(cards.values())}
+        missing = [card_id for card_id, surface in thumbnails.items() if surface is None]
+        loop = asyncio.get_running_loop()
+        thumbnails.update(zip(missing, await asyncio.gather(
+            *(loop.run_in_executor(None, self._thumbnail, card_id) for card_id in missing))))
+
+        width, height = THUMB_SIZE
+        board = pygame.Surface((columns * (width + BOARD_GAP) + BOARD_GAP, 4 * (height + BOARD_GAP) + BOARD_GAP))
+        board.fill(BOARD_BACKGROUND)
+        for row in range(4):
+            for column in range(columns):
+                pos = (BOARD_GAP + column * (width + BOARD_GAP), BOARD_GAP + row * (height + BOARD_GAP))
+                surface = thumbnails.get(cards.get((row, column)))
+                if surface is not None:
+                    board.blit(surface, pos)
+                else:
+                    board.fill(EMPTY_ZONE, (pos, THUMB_SIZE))
+        return board
+
+    async def save_boards(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for table_id in list(self.tables):
+            pygame.image.save(await self.render(table_id), os.path.join(directory, f"table-{table_id}.png"))
+
+
+# -----------------------------
+# CLI: serve a list of pairings, or measure what each table costs
+# -----------------------------
+async def serve(args):
+    try:
+        with open(args.pairings, "r", encoding="utf-8") as f:
+            pairings = json.load(f)
+        decks = [(load_deck_ids(pairing["player"]), load_deck_ids(pairing["opponent"])) for pairing in pairings]
+    except (OSError, KeyError, ValueError, TypeError) as e:
+        raise SystemExit(f"[!] Could not load pairings: {e}")
+    manager = TableManager(args.host)
+    step = 2 if args.watch else 1
+    for i, (player, opponent) in enumerate(decks):
+        port = args.port + step * i
+        try:
+            seed = None if args.seed is None else f"{args.seed}:{i}"  # same event seed, different shuffles
+            table = await manager.open_table(player, opponent, seed=seed,
+                                             port=port, watch_port=port + 1 if args.watch else None)
+        except OSError as e:
+            raise SystemExit(f"[!] Could not open table {i + 1} on port {port}: {e}")
+        watch = f", viewers on {table.watch_port}" if table.watch_port else ""
+        print(f"[*] Table {table.table_id}: players on {table.port}{watch}")
+    while True:
+        if args.boards:
+            await manager.save_boards(args.boards)
+        await asyncio.sleep(BOARD_INTERVAL)
+
+
+def traced():
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+async def bench(args):
+    rng = random.Random(args.seed)
+    tracemalloc.start()
+    before = traced()
+    if args.deck:
+        print(f"[*] Card database: {len(card_db.by_name):,} cards, {(traced() - before) / 1024:,.0f} KiB, "
+              f"loaded once for every table")
+        deck = load_deck_ids(args.deck)
+    else:
+        deck = ([1000 + i % 14 for i in range(40)], [], [])
+
+    manager = TableManager()
+    costs = {}
+    for label, watch in (("plain", False), ("with a watch port", True)):
+        sizes = []
+        for _ in range(args.tables):
+            before = traced()
+            await manager.open_table(deck, deck, seed=rng.getrandbits(32), watch_port=0 if watch else None)
+            sizes.append(traced() - before)
+        costs[label] = sizes
+
+    # Play the tables for a while: a table's state settles at a fixed size however long its game runs
+    before = traced()
+    for _ in range(args.actions):
+        for table in manager.tables.values():
+            bench_action(table.state, rng)
+        await asyncio.sleep(0)
+    played = (traced() - before) / len(manager.tables)
+
+    for label, sizes in costs.items():
+        rest = sizes[1:] or sizes
+        print(f"[*] {args.tables} tables {label}: first {sizes[0] / 1024:.1f} KiB, "
+              f"then {sum(rest) / len(rest) / 1024:.1f} KiB each (min {min(rest) / 1024:.1f}, "
+              f"max {max(rest) / 1024:.1f})")
+    print(f"[*] After {args.actions} actions per table: {played / 1024:+.1f} KiB per table")
+
+    if args.deck:
+        renders = []
+        for table_id in manager.tables:
+            before = traced()
+            await manager.render(table_id)
+            renders.append(traced() - before)
+        later = renders[1:] or renders
+        print(f"[*] Board pictures: first {renders[0] / 1024:.1f} KiB (decodes the thumbnails), "
+              f"then {sum(later) / len(later) / 1024:.1f} KiB each; "
+              f"{len(surface_cache)} shared thumbnails, {surface_cache.bytes / 1024:.0f} KiB")
+    tracemalloc.stop()
+    if args.deck:
+        start = time.perf_counter()
+        for table_id in manager.tables:
+            await manager.render(table_id)
+        print(f"[*] Rendering every board again: {(time.perf_counter() - start) / len(manager.tables) * 1e3:.2f} ms each")
+    await manager.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host many headless duels in one process.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="open a table per pairing")
+    serve_parser.add_argument("pairings", help='JSON list of {"player": deck.json, "opponent": deck.json}')
+    serve_parser.add_argument("--host", default="0.0.0.0")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="first table's port; the rest follow")
+    serve_parser.add_argument("--watch", action="store_true", help="give every table a spectator port after its own")
+    serve_parser.add_argument("--boards", metavar="DIR", help=f"write each table's board to DIR every {BOARD_INTERVAL:g} s")
+    serve_parser.add_argument("--seed", type=int)
+    bench_parser = commands.add_parser("bench", help="measure what each extra table costs")
+    bench_parser.add_argument("--tables", type=int, default=64)
+    bench_parser.add_argument("--deck", help="deck JSON for every table (also times board pictures)")
+    bench_parser.add_argument("--actions", type=int, default=300)
+    bench_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args) if args.command == "serve" else bench(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+from collections import OrderedDict
+from functools import lru_cache
+
+import pygame
+
+TEXT_CACHE_ENTRIES = 512
+
+
+@lru_cache(maxsize=None)
+def get_font(name, size):
+    """SysFont lookups scan the system font list; do each one once per process."""
+    return pygame.font.SysFont(name, size)
+
+
+# -----------------------------
+# Rendered text cache
+# -----------------------------
+class TextCache:
+    """LRU of rendered text surfaces keyed by (font, text, color)."""
+
+    def __init__(self, max_entries=TEXT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._advances = {}  # (font, char) -> advance width in pixels
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, color, antialias)
+        surface = self._entries.get(key)
+        if surface is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self._entries[key] = surface
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return surface
+
+    def advance(self, font, char):
+        """Horizontal advance of one character in pixels (cached, fractional)."""
+        key = (font, char)
+        width = self._advances.get(key)
+        if width is None:
+            # Hinted advances are fractional; measure a run to get sub-pixel precision
+            width = font.size(char * 16)[0] / 16
+            self._advances[key] = width
+        return width
+
+
+# -----------------------------
+# Console input line that keeps its visible tail fitted incrementally
+# -----------------------------
+class FittedLine:
+    """Text plus the index of its first visible character for a fixed pixel width.
+
+    Typing or deleting a character adjusts the visible window by the widths of
+    the characters that scroll in or out, instead of re-measuring the string.
+    """
+
+    def __init__(self, font, max_width, text_cache):
+        self.font = font
+        self.max_width = max_width
+        self.text_cache = text_cache
+        self.clear()
+
+    def clear(self):
+        self.text = ""
+        self.start = 0
+        self._advances = []
+        self._width = 0  # width of text[start:]
+
+    def type(self, chars):
+        for char in chars:
+            advance = self.text_cache.advance(self.font, char)
+            self.text += char
+            self._advances.append(advance)
+            self._width += advance
+        while self._width > self.max_width and self.start < len(self.text):
+            self._width -= self._advances[self.start]
+            self.start += 1
+        self._correct()
+
+    def backspace(self):
+        if not self.text:
+            return
+        self.text = self.text[:-1]
+        advance = self._advances.pop()
+        if self.start > len(self.text):
+            self.start = len(self.text)
+            self._width = 0
+        else:
+            self._width -= advance
+        # Scroll hidden characters back into view while they fit
+        while self.start > 0 and self._width + self._advances[self.start - 1] <= self.max_width:
+            self.start -= 1
+            self._width += self._advances[self.start]
+        self._correct()
+
+    def _correct(self):
+        # Summed advances can be off by a pixel; settle it with one real measurement
+        while self.start < len(self.text) and self.font.size(self.text[self.start:])[0] > self.max_width:
+            self._width -= self._advances[self.start]
+            self.start += 1
+
+    @property
+    def visible(self):
+        return self.text[self.start:]
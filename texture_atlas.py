@@ -0,0 +1,97 @@
+import pygame
+
+ATLAS_MAX_WIDTH = 2048
+
+
+# -----------------------------
+# Texture atlas
+# -----------------------------
+class TextureAtlas:
+    """Packs many small surfaces into one source surface (shelf packing).
+
+    Regions are reserved up front with ``reserve`` and filled later with
+    ``store``, so a card's slot exists before its image has loaded.  Drawing
+    blits a sub-rect of ``surface``:
+
+        screen.blit(atlas.surface, pos, atlas.region(key))
+    """
+
+    def __init__(self, max_width=ATLAS_MAX_WIDTH):
+        self.max_width = max_width
+        self.surface = None
+        self._regions = {}     # key -> Rect
+        self._filled = set()
+        self._shelves = []     # [y, height, next_x]
+        self._height = 0
+
+    def __contains__(self, key):
+        return key in self._regions
+
+    def region(self, key):
+        return self._regions.get(key)
+
+    def is_filled(self, key):
+        return key in self._filled
+
+    def reserve(self, key, size):
+        """Reserve a width x height region for key (idempotent) and return it."""
+        rect = self._regions.get(key)
+        if rect is not None:
+            return rect
+        width, height = size
+        for shelf in self._shelves:
+            if shelf[1] == height and shelf[2] + width <= self.max_width:
+                rect = pygame.Rect(shelf[2], shelf[0], width, height)
+                shelf[2] += width
+                break
+        else:
+            rect = pygame.Rect(0, self._height, width, height)
+            self._shelves.append([self._height, height, width])
+            self._height += height
+        self._regions[key] = rect
+        if self.surface is not None and (rect.right > self.surface.get_width() or
+                                         rect.bottom > self.surface.get_height()):
+            self._grow()
+        return rect
+
+    def build(self):
+        """Allocate the atlas surface once the initial reservations are made."""
+        self._grow()
+
+    def _grow(self):
+        width = max((shelf[2] for shelf in self._shelves), default=1)
+        if self.surface is not None:
+            width = max(width, self.surface.get_width())
+            # Grow geometrically so late reservations don't reallocate every time
+            height = max(self._height, self.surface.get_height() * 3 // 2)
+        else:
+            height = max(self._height, 1)
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+        surface.fill((0, 0, 0, 0))
+        if self.surface is not None:
+            surface.blit(self.surface, (0, 0), special_flags=pygame.BLEND_RGBA_ADD)
+        self.surface = surface
+
+    def store(self, key, image):
+        """Copy image into key's region (reserving one if needed)."""
+        rect = self.reserve(key, image.get_size())
+        if self.surface is None:
+            self.build()
+        # Adding onto cleared pixels copies RGBA exactly instead of alpha-blending
+        region = self.surface.subsurface(rect)
+        region.fill((0, 0, 0, 0))
+        region.blit(image, (0, 0), special_flags=pygame.BLEND_RGBA_ADD)
+        self._filled.add(key)
+        return rect
+
+    def stats(self):
+        if self.surface is None:
+            return {"regions": len(self._regions), "filled": len(self._filled), "bytes": 0}
+        return {
+            "regions": len(self._regions),
+            "filled": len(self._filled),
+            "size": self.surface.get_size(),
+            "bytes": self.surface.get_pitch() * self.surface.get_height(),
+        }